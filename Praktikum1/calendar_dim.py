@@ -0,0 +1,128 @@
+"""
+Kalenderdimension für beide ETL-Skripte und den Sales Mart.
+
+Die Datumstabelle wird einmal für einen konfigurierbaren Zeitraum erzeugt,
+lückenlos (ein Eintrag je Tag) und vektorisiert über alle Tage. Der Schlüssel
+ist der sprechende Datumsschlüssel YYYYMMDD als Ganzzahl - wie dateID in
+Praktikum1 und HubDate.date in Praktikum2. Die ETLs schlagen den Schlüssel
+über die Ordinalzahl des Datums nach, statt ihn je Zeile mit strftime zu
+formatieren, und der Mart lädt die Tabelle als Ganzes (Tabelle Calendar),
+statt die Attribute je Zeile mit TO_DATE/TO_CHAR/EXTRACT zu berechnen.
+
+Aufruf als Skript schreibt die Tabelle als CSV, z.B. für psql \\copy:
+    python calendar_dim.py --start 2000-01-01 --end 2035-12-31 --output calendar.csv
+"""
+
+import argparse
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_START = date(2000, 1, 1)
+DEFAULT_END = date(2035, 12, 31)
+
+# Namen wie TO_CHAR(..., 'Month') / 'Day' in Postgres, ohne dessen Auffüllung mit Leerzeichen
+MONTH_NAMES = ('January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September',
+               'October', 'November', 'December')
+# Index = Wochentag nach EXTRACT(DOW ...): 0 = Sonntag ... 6 = Samstag
+DAY_NAMES = ('Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday')
+
+# Spalten der Kalendertabelle (gleiche Namen und Reihenfolge wie DimDate im Mart)
+COLUMNS = ['DateKey', 'Date', 'Year', 'Month', 'Day', 'Quarter', 'MonthName', 'DayOfWeek', 'DayName', 'IsWeekend']
+
+
+def date_key(value):
+    """Datumsschlüssel YYYYMMDD eines date/datetime (None bleibt None)"""
+    if value is None:
+        return None
+    return value.year * 10000 + value.month * 100 + value.day
+
+
+def date_keys(values):
+    """
+    Datumsschlüssel YYYYMMDD einer datetime-Spalte als Int64, vektorisiert.
+    Fehlende Werte (NaT) ergeben <NA>.
+    """
+    parts = pd.Series(values).dt
+    return (parts.year * 10000 + parts.month * 100 + parts.day).astype('Int64')
+
+
+def calendar_frame(start=DEFAULT_START, end=DEFAULT_END):
+    """Kalendertabelle mit allen Attributen, ein Eintrag je Tag von start bis end (einschließlich)"""
+    days = pd.Series(pd.date_range(start, end, freq='D'))
+    parts = days.dt
+    month = parts.month.to_numpy()
+    day_of_week = (parts.dayofweek.to_numpy() + 1) % 7   # pandas: 0 = Montag
+    return pd.DataFrame({
+        'DateKey': date_keys(days).astype('int32'),
+        'Date': days.dt.date,
+        'Year': parts.year.astype('int16'),
+        'Month': month.astype('int8'),
+        'Day': parts.day.astype('int8'),
+        'Quarter': ((month - 1) // 3 + 1).astype('int8'),
+        'MonthName': np.asarray(MONTH_NAMES, dtype=object)[month - 1],
+        'DayOfWeek': day_of_week.astype('int8'),
+        'DayName': np.asarray(DAY_NAMES, dtype=object)[day_of_week],
+        'IsWeekend': np.isin(day_of_week, (0, 6)),
+    }, columns=COLUMNS)
+
+
+class Calendar:
+    """
+    Vorberechnete Kalendertabelle mit Nachschlagen je Datum.
+
+    key() und record() indizieren über die Ordinalzahl des Datums direkt in
+    die vorberechneten Listen. Daten außerhalb des Zeitraums werden einzeln
+    berechnet, das Ergebnis ist dasselbe.
+    """
+
+    def __init__(self, start=DEFAULT_START, end=DEFAULT_END):
+        self.start = start
+        self.end = end
+        self.frame = calendar_frame(start, end)
+        self._first = start.toordinal()
+        self._keys = self.frame['DateKey'].tolist()
+        self._dates = self.frame['Date'].tolist()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _position(self, value):
+        position = value.toordinal() - self._first
+        return position if 0 <= position < len(self._keys) else None
+
+    def key(self, value):
+        """Datumsschlüssel YYYYMMDD eines date/datetime"""
+        if value is None:
+            return None
+        position = self._position(value)
+        return self._keys[position] if position is not None else date_key(value)
+
+    def record(self, value):
+        """Zeile der Date-Dimension von Praktikum1 (dateID, date, year, month, day)"""
+        position = self._position(value)
+        day = self._dates[position] if position is not None else date(value.year, value.month, value.day)
+        return {
+            'dateID': self._keys[position] if position is not None else date_key(value),
+            'date': day,
+            'year': day.year,
+            'month': day.month,
+            'day': day.day,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kalendertabelle als CSV erzeugen')
+    parser.add_argument('--start', type=date.fromisoformat, default=DEFAULT_START, help='Erster Tag (YYYY-MM-DD)')
+    parser.add_argument('--end', type=date.fromisoformat, default=DEFAULT_END, help='Letzter Tag (YYYY-MM-DD)')
+    parser.add_argument('--output', default='calendar.csv', help='Zieldatei')
+    args = parser.parse_args()
+
+    frame = calendar_frame(args.start, args.end)
+    frame.to_csv(args.output, index=False)
+    print(f"✓ {len(frame):,} Tage ({args.start} bis {args.end}) nach {args.output} geschrieben")
+
+
+if __name__ == '__main__':
+    main()
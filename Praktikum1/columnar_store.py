@@ -0,0 +1,502 @@
+"""
+Kompakte spaltenweise Puffer für die Dimensionen und Fakten des ETL-Prozesses.
+
+Statt eines Dictionaries pro Datensatz werden die Werte spaltenweise gehalten:
+Dimensionen als Listen mit internierten Strings und einem Schlüsselindex,
+Fakten als typisierte Arrays (int64, skalierte Dezimalzahlen, kodierte Strings).
+Nach außen verhalten sich die Puffer wie die bisherigen dicts bzw. die Liste,
+Datensätze werden beim Lesen als kurzlebige dicts erzeugt.
+"""
+
+import sys
+from array import array
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+# Platzhalter für NULL in int64-Spalten
+NULL_INT = -2 ** 63
+_INT_MAX = 2 ** 63 - 1
+
+# Namenszusätze der Spalten in to_frame() (Decimal als Text, Decimal-Fakten als Koeffizient/Exponent)
+DECIMAL_SUFFIX = ':decimal'
+COEFFICIENT_SUFFIX = ':coef'
+EXPONENT_SUFFIX = ':exp'
+
+
+def _intern(value):
+    """Interniert Strings, damit gleiche Werte nur einmal im Speicher liegen"""
+    return sys.intern(value) if type(value) is str else value
+
+
+def _python_values(series):
+    """Spaltenwerte als Python-Objekte, fehlende Werte als None"""
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _encode_column(name, values):
+    """
+    (Spaltenname, Series) einer Objektspalte für Parquet: Decimal-Werte als Text
+    (verlustfrei, Name mit DECIMAL_SUFFIX), reine int-Spalten als Int64
+    """
+    types = {type(v) for v in values if v is not None}
+    if types == {Decimal}:
+        return name + DECIMAL_SUFFIX, pd.Series([None if v is None else str(v) for v in values], dtype=object)
+    if types == {int}:
+        return name, pd.Series(values, dtype='Int64')
+    return name, pd.Series(values, dtype=object)
+
+
+def _decode_column(frame, name):
+    """Umkehrung von _encode_column: Werteliste der Spalte 'name'"""
+    if name + DECIMAL_SUFFIX in frame.columns:
+        return [None if v is None else Decimal(v) for v in _python_values(frame[name + DECIMAL_SUFFIX])]
+    return _python_values(frame[name])
+
+
+def _deep_size(containers, values):
+    """Speicherbedarf der Container plus aller verschiedenen referenzierten Objekte"""
+    size = sum(sys.getsizeof(c) for c in containers)
+    seen = set()
+    for value in values:
+        if value is None or id(value) in seen:
+            continue
+        seen.add(id(value))
+        size += sys.getsizeof(value)
+    return size
+
+
+class DimensionStore:
+    """
+    Dimensionspuffer mit dict-ähnlicher API (in, [], []=, len, values, items).
+
+    Jede Spalte ist eine Liste, der Schlüssel verweist auf die Zeilenposition.
+    Strings werden interniert, so teilen sich z.B. alle Kunden eines Landes
+    dasselbe String-Objekt für den Ländercode.
+    """
+
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self._index = {}
+        self._columns = {f: [] for f in self.fields}
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def _row(self, pos):
+        return {f: self._columns[f][pos] for f in self.fields}
+
+    def __getitem__(self, key):
+        return self._row(self._index[key])
+
+    def get(self, key, default=None):
+        pos = self._index.get(key)
+        return default if pos is None else self._row(pos)
+
+    def __setitem__(self, key, record):
+        pos = self._index.get(key)
+        if pos is None:
+            self._index[_intern(key)] = len(self._index)
+            for f in self.fields:
+                self._columns[f].append(_intern(record.get(f)))
+        else:
+            for f in self.fields:
+                self._columns[f][pos] = _intern(record.get(f))
+
+    def keys(self):
+        return self._index.keys()
+
+    def values(self):
+        for pos in range(len(self._index)):
+            yield self._row(pos)
+
+    def items(self):
+        for key, pos in self._index.items():
+            yield key, self._row(pos)
+
+    def rows_since(self, start):
+        """Datensätze ab Position 'start' (in Einfügereihenfolge)"""
+        for pos in range(start, len(self._index)):
+            yield self._row(pos)
+
+    def add_new(self, keys, columns):
+        """
+        Übernimmt die noch unbekannten Schlüssel eines Batches, wie 'if key not in store:
+        store[key] = ...' je Zeile (erstes Vorkommen gewinnt). keys: Schlüssel je Zeile,
+        None überspringt die Zeile; columns: Feld -> Werte je Zeile (Python-Objekte).
+        """
+        keys = pd.Series(keys, dtype=object)
+        first = np.flatnonzero((keys.notna() & ~keys.duplicated()).to_numpy())
+        keys = keys.to_numpy()
+        for pos in first:
+            key = keys[pos]
+            if key in self._index:
+                continue
+            self._index[_intern(key)] = len(self._index)
+            for f in self.fields:
+                self._columns[f].append(_intern(columns[f][pos]))
+
+    def update(self, other):
+        """Übernimmt Schlüssel aus einem anderen Puffer, vorhandene Schlüssel bleiben (first-seen-wins)"""
+        for key, record in other.items():
+            if key not in self._index:
+                self[key] = record
+
+    def clear(self):
+        self._index.clear()
+        for column in self._columns.values():
+            column.clear()
+
+    def memory_usage(self):
+        """Geschätzter Speicherbedarf in Bytes"""
+        containers = [self._index, *self._columns.values()]
+        values = [*self._index.keys()]
+        for column in self._columns.values():
+            values.extend(column)
+        return _deep_size(containers, values)
+
+    def to_frame(self):
+        """Inhalt als DataFrame (Schlüssel in '_key', ein Datensatz je Zeile), z.B. für den Parse-Cache"""
+        columns = dict([_encode_column('_key', list(self._index))])
+        for f in self.fields:
+            name, values = _encode_column(f, self._columns[f])
+            columns[name] = values
+        return pd.DataFrame(columns)
+
+    def load_frame(self, frame):
+        """Ersetzt den Inhalt durch einen mit to_frame() erzeugten DataFrame"""
+        self.clear()
+        self._index.update((_intern(key), pos) for pos, key in enumerate(_decode_column(frame, '_key')))
+        for f in self.fields:
+            self._columns[f].extend(_intern(v) for v in _decode_column(frame, f))
+
+    def __getstate__(self):
+        return {'fields': self.fields, 'index': self._index, 'columns': self._columns}
+
+    def __setstate__(self, state):
+        self.fields = state['fields']
+        self._index = {_intern(k): pos for k, pos in state['index'].items()}
+        self._columns = {f: [_intern(v) for v in column] for f, column in state['columns'].items()}
+
+
+class FactStore:
+    """
+    Faktenpuffer mit typisierten Spalten und listenähnlicher API (append, len, Iteration).
+
+    Spaltentypen:
+      'int'      - array('q'), NULL als NULL_INT
+      'decimal'  - Koeffizient in array('q') plus Exponent in array('b'), verlustfrei;
+                   Werte außerhalb von int64 landen in einem Überlauf-dict
+      'category' - Codes in array('i') auf eine Liste verschiedener (internierter) Werte
+      'str'      - Liste internierter Strings (für nahezu eindeutige Werte)
+    """
+
+    def __init__(self, columns):
+        self.columns = dict(columns)
+        self._data = {}
+        self._overflow = {}
+        self._categories = {}
+        for name, kind in self.columns.items():
+            if kind == 'int':
+                self._data[name] = array('q')
+            elif kind == 'decimal':
+                self._data[name] = (array('q'), array('b'))
+            elif kind == 'category':
+                self._data[name] = array('i')
+                self._categories[name] = ([], {})
+            elif kind == 'str':
+                self._data[name] = []
+            else:
+                raise ValueError(f"Unbekannter Spaltentyp '{kind}' für {name}")
+            self._overflow[name] = {}
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def append(self, record):
+        pos = self._length
+        for name, kind in self.columns.items():
+            value = record.get(name)
+            data = self._data[name]
+            if kind == 'int':
+                if value is None:
+                    data.append(NULL_INT)
+                elif type(value) is int and NULL_INT < value <= _INT_MAX:
+                    data.append(value)
+                else:
+                    data.append(NULL_INT)
+                    self._overflow[name][pos] = value
+            elif kind == 'decimal':
+                coefficients, exponents = data
+                encoded = self._encode_decimal(value)
+                if encoded is None:
+                    coefficients.append(NULL_INT)
+                    exponents.append(0)
+                    if value is not None:
+                        self._overflow[name][pos] = value
+                else:
+                    coefficients.append(encoded[0])
+                    exponents.append(encoded[1])
+            elif kind == 'category':
+                values, codes = self._categories[name]
+                code = codes.get(value)
+                if code is None:
+                    code = codes[value] = len(values)
+                    values.append(_intern(value))
+                data.append(code)
+            else:
+                data.append(_intern(value))
+        self._length += 1
+
+    def extend_columns(self, columns):
+        """
+        Hängt einen Batch spaltenweise an: columns bildet jede Spalte auf ihre Werte
+        je Zeile ab (Python-Objekte, None = NULL). Ergibt dieselben Daten wie append()
+        je Zeile; enthält eine int-/decimal-Spalte Werte, die nicht in die Arrays passen
+        (Überlaufwerte), wird der Batch zeilenweise angehängt.
+        """
+        values = {name: np.asarray(columns[name], dtype=object) for name in self.columns}
+        length = len(next(iter(values.values()))) if values else 0
+        encoded = {}
+        for name, kind in self.columns.items():
+            column = values[name]
+            if kind == 'int':
+                missing = pd.isna(column)
+                if pd.api.types.infer_dtype(column[~missing], skipna=True) not in ('integer', 'empty'):
+                    break
+                try:
+                    ints = np.where(missing, NULL_INT, column).astype(np.int64)
+                except OverflowError:
+                    break
+                if (ints[~missing] == NULL_INT).any():
+                    break
+                encoded[name] = ints
+            elif kind == 'decimal':
+                # Gleiche Werte sind aus der Validierung meist dasselbe Objekt: einmal je Objekt kodieren
+                codes, _ = pd.factorize(np.fromiter(map(id, column), dtype=np.uint64, count=length))
+                _, first = np.unique(codes, return_index=True)
+                pairs = [(NULL_INT, 0) if value is None else self._encode_decimal(value) for value in column[first]]
+                if None in pairs:
+                    break
+                encoded[name] = (np.array([c for c, _ in pairs], dtype=np.int64)[codes],
+                                 np.array([e for _, e in pairs], dtype=np.int8)[codes])
+        else:
+            for name, kind in self.columns.items():
+                data = self._data[name]
+                if kind == 'decimal':
+                    data[0].frombytes(encoded[name][0].tobytes())
+                    data[1].frombytes(encoded[name][1].tobytes())
+                elif kind == 'category':
+                    # Kategorien je eindeutigem Wert nachschlagen, dann die Codes übertragen
+                    codes, uniques = pd.factorize(values[name], use_na_sentinel=False)
+                    categories, lookup = self._categories[name]
+                    remap = np.empty(len(uniques), dtype=np.int32)
+                    for position, value in enumerate(uniques):
+                        value = None if pd.isna(value) else value
+                        code = lookup.get(value)
+                        if code is None:
+                            code = lookup[value] = len(categories)
+                            categories.append(_intern(value))
+                        remap[position] = code
+                    data.frombytes(remap[codes].tobytes())
+                elif kind == 'str':
+                    data.extend(map(_intern, values[name]))
+                else:
+                    data.frombytes(encoded[name].tobytes())
+            self._length += length
+            return
+        # Überlaufwerte: wie append() je Zeile
+        names = list(self.columns)
+        for row in zip(*(values[name] for name in names)):
+            self.append(dict(zip(names, row)))
+
+    @staticmethod
+    def _encode_decimal(value):
+        """(Koeffizient, Exponent) oder None, wenn der Wert nicht in int64/int8 passt"""
+        if not isinstance(value, Decimal) or not value.is_finite():
+            return None
+        exponent = value.as_tuple().exponent
+        if not -128 <= exponent <= 127 or (value.is_zero() and value.is_signed()):
+            return None
+        coefficient = int(value.scaleb(-exponent))
+        if not NULL_INT < coefficient <= _INT_MAX:
+            return None
+        return coefficient, exponent
+
+    def _value(self, name, pos):
+        kind = self.columns[name]
+        data = self._data[name]
+        if kind == 'int':
+            value = data[pos]
+            return self._overflow[name].get(pos) if value == NULL_INT else value
+        if kind == 'decimal':
+            coefficient = data[0][pos]
+            if coefficient == NULL_INT:
+                return self._overflow[name].get(pos)
+            return Decimal(coefficient).scaleb(data[1][pos])
+        if kind == 'category':
+            return self._categories[name][0][data[pos]]
+        return data[pos]
+
+    def __getitem__(self, pos):
+        if pos < 0:
+            pos += self._length
+        if not 0 <= pos < self._length:
+            raise IndexError('FactStore index out of range')
+        return {name: self._value(name, pos) for name in self.columns}
+
+    def __iter__(self):
+        for pos in range(self._length):
+            yield {name: self._value(name, pos) for name in self.columns}
+
+    def rows_since(self, start):
+        """Datensätze ab Position 'start'"""
+        for pos in range(start, self._length):
+            yield self[pos]
+
+    def extend(self, other):
+        """
+        Hängt alle Datensätze eines anderen Puffers an. Bei gleichem Spaltenschema
+        werden die Arrays direkt aneinandergehängt und nur die Kategorie-Codes umgeschlüsselt.
+        """
+        if not isinstance(other, FactStore) or other.columns != self.columns:
+            for record in other:
+                self.append(record)
+            return
+        offset = self._length
+        for name, kind in self.columns.items():
+            data, other_data = self._data[name], other._data[name]
+            if kind == 'decimal':
+                data[0].extend(other_data[0])
+                data[1].extend(other_data[1])
+            elif kind == 'category':
+                values, codes = self._categories[name]
+                remap = []
+                for value in other._categories[name][0]:
+                    code = codes.get(value)
+                    if code is None:
+                        code = codes[value] = len(values)
+                        values.append(_intern(value))
+                    remap.append(code)
+                data.extend(array('i', (remap[code] for code in other_data)))
+            elif kind == 'str':
+                data.extend(_intern(v) for v in other_data)
+            else:
+                data.extend(other_data)
+            for pos, value in other._overflow[name].items():
+                self._overflow[name][offset + pos] = value
+        self._length += other._length
+
+    def clear(self):
+        self.__init__(self.columns)
+
+    def to_frame(self):
+        """
+        Spalten als DataFrame in der internen Kodierung (int64 mit NULL_INT,
+        Decimal als Koeffizient/Exponent, Kategorien als pandas-Categorical).
+        Überlaufwerte lassen sich so nicht abbilden (ValueError).
+        """
+        if any(self._overflow.values()):
+            raise ValueError('FactStore mit Überlaufwerten kann nicht als DataFrame abgelegt werden')
+        columns = {}
+        for name, kind in self.columns.items():
+            data = self._data[name]
+            if kind == 'int':
+                columns[name] = np.frombuffer(data, dtype=np.int64).copy()
+            elif kind == 'decimal':
+                columns[name + COEFFICIENT_SUFFIX] = np.frombuffer(data[0], dtype=np.int64).copy()
+                columns[name + EXPONENT_SUFFIX] = np.frombuffer(data[1], dtype=np.int8).copy()
+            elif kind == 'category':
+                uniques = self._categories[name][0]
+                # None ist keine gültige Kategorie: Code -1
+                remap = np.full(len(uniques), -1, dtype=np.int32)
+                categories = []
+                for code, value in enumerate(uniques):
+                    if value is not None:
+                        remap[code] = len(categories)
+                        categories.append(value)
+                codes = remap[np.frombuffer(data, dtype=np.int32)] if len(data) else np.empty(0, dtype=np.int32)
+                columns[name] = pd.Categorical.from_codes(codes, categories)
+            else:
+                columns[name] = pd.Series(data, dtype=object)
+        return pd.DataFrame(columns, index=pd.RangeIndex(self._length))
+
+    def load_frame(self, frame):
+        """Ersetzt den Inhalt durch einen mit to_frame() erzeugten DataFrame"""
+        self.clear()
+        for name, kind in self.columns.items():
+            if kind == 'int':
+                self._data[name].frombytes(frame[name].to_numpy(dtype=np.int64).tobytes())
+            elif kind == 'decimal':
+                self._data[name][0].frombytes(frame[name + COEFFICIENT_SUFFIX].to_numpy(dtype=np.int64).tobytes())
+                self._data[name][1].frombytes(frame[name + EXPONENT_SUFFIX].to_numpy(dtype=np.int8).tobytes())
+            elif kind == 'category':
+                column = frame[name].astype('category')
+                uniques = [_intern(v) for v in column.cat.categories.tolist()]
+                codes = column.cat.codes.to_numpy(dtype=np.int32)
+                if (codes < 0).any():
+                    codes = np.where(codes < 0, len(uniques), codes).astype(np.int32)
+                    uniques.append(None)
+                self._categories[name] = (uniques, {v: i for i, v in enumerate(uniques)})
+                self._data[name].frombytes(codes.tobytes())
+            else:
+                self._data[name] = [_intern(v) for v in _python_values(frame[name])]
+        self._length = len(frame)
+
+    def memory_usage(self):
+        """Geschätzter Speicherbedarf in Bytes"""
+        containers, values = [], []
+        for name, kind in self.columns.items():
+            data = self._data[name]
+            containers.extend(data if kind == 'decimal' else [data])
+            containers.append(self._overflow[name])
+            values.extend(self._overflow[name].values())
+            if kind == 'category':
+                uniques, codes = self._categories[name]
+                containers.extend([uniques, codes])
+                values.extend(uniques)
+            elif kind == 'str':
+                values.extend(data)
+        return _deep_size(containers, values)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for name, kind in self.columns.items():
+            if kind == 'str':
+                self._data[name] = [_intern(v) for v in self._data[name]]
+            elif kind == 'category':
+                uniques = [_intern(v) for v in self._categories[name][0]]
+                self._categories[name] = (uniques, {v: i for i, v in enumerate(uniques)})
+
+
+def format_bytes(size):
+    """Bytes lesbar formatieren"""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def memory_report(stores):
+    """
+    Speicherbedarf je Puffer als Textzeilen, z.B. zur Dimensionierung der ETL-Hosts.
+    stores: dict Bezeichnung -> DimensionStore/FactStore
+    """
+    lines = []
+    total = 0
+    for label, store in stores.items():
+        size = store.memory_usage()
+        total += size
+        per_row = size / len(store) if len(store) else 0
+        lines.append(f"  • {label}: {len(store):,} Datensätze, {format_bytes(size)} ({per_row:.0f} B/Datensatz)")
+    lines.append(f"  • Gesamt: {format_bytes(total)}")
+    return lines
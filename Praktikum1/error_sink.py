@@ -0,0 +1,190 @@
+"""
+Streamendes Fehlerprotokoll mit begrenztem Speicherbedarf.
+
+Jeder Fehlereintrag {'row_num', 'data', 'errors', 'rules'} wird sofort als
+eine JSON-Zeile in das Protokoll (JSONL) geschrieben. Im Speicher bleiben nur
+Zähler je Regel und die ersten N Einträge je Regel als Beispiele - auch eine
+Datei, in der fast jede Zeile automatisch korrigiert wird, hält also nicht
+den halben Datenbestand ein zweites Mal im Speicher.
+
+Überschreitet das Protokoll max_bytes, wird es mit gzip komprimiert als
+<name>.<nr>.jsonl.gz abgelegt und ein neues begonnen. records() liest alle
+Teile in Schreibreihenfolge zurück.
+"""
+
+import glob
+import gzip
+import json
+import os
+import shutil
+import threading
+
+DEFAULT_PATH = 'fehlerhafte_datensaetze.jsonl'
+DEFAULT_SAMPLE_SIZE = 5
+DEFAULT_MAX_BYTES = 64 * 1024 ** 2     # 64 MB je Teil
+COMPRESS_LEVEL = 6
+
+# Regel-id für Einträge ohne 'rules' (z.B. aus älteren Aufrufern)
+UNKNOWN_RULE = 'unbekannt'
+
+# Abgeleitete Felder der Validierung; sie folgen aus den Rohwerten und werden nicht protokolliert
+DERIVED_PREFIX = 'parsed_'
+
+_encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+
+
+def encode_entry(entry):
+    """Fehlereintrag als JSON-Zeile; Datum, Decimal u.ä. werden als Text geschrieben"""
+    data = entry['data']
+    if isinstance(data, dict):
+        data = {name: value for name, value in data.items()
+                if not (isinstance(name, str) and name.startswith(DERIVED_PREFIX))}
+    return _encoder.encode({
+        'row_num': entry['row_num'],
+        'rules': entry.get('rules') or [UNKNOWN_RULE] * len(entry['errors']),
+        'errors': entry['errors'],
+        'data': data,
+    }) + '\n'
+
+
+class ErrorSink:
+    """
+    Fehlerprotokoll mit Zählern und Beispielen je Regel.
+
+    Verhält sich für die ETL-Skripte wie die bisherige Fehlerliste: append(),
+    extend(), len() und clear(). Die Datei wird erst beim ersten Eintrag
+    angelegt (und damit ein Protokoll des vorigen Laufs ersetzt). path=None
+    schreibt keine Datei, es bleiben nur Zähler und Beispiele.
+    Alle Methoden sind threadsicher (Lade-Thread im Pipeline-Modus).
+    """
+
+    def __init__(self, path=DEFAULT_PATH, sample_size=DEFAULT_SAMPLE_SIZE, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.sample_size = sample_size
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._file = None
+        self._reset()
+
+    def _reset(self):
+        self.total = 0              # Fehlereinträge (Zeilen)
+        self.counts = {}            # Regel-id -> Meldungen
+        self.samples = {}           # Regel-id -> erste sample_size Einträge
+        self.segments = []          # komprimierte Teile, älteste zuerst
+        self._opened = False
+        self._written = 0
+
+    def __len__(self):
+        return self.total
+
+    def _stem(self):
+        return self.path[:-len('.jsonl')] if self.path.endswith('.jsonl') else self.path
+
+    def _segment_path(self, number):
+        return f'{self._stem()}.{number:03d}.jsonl.gz'
+
+    def _open(self):
+        # Teile eines früheren Laufs gehören nicht zu diesem Protokoll
+        for stale in glob.glob(glob.escape(self._stem()) + '.[0-9][0-9][0-9].jsonl.gz'):
+            os.remove(stale)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'wb')
+        self._opened = True
+        self._written = 0
+
+    def _rotate(self):
+        """Aktuellen Teil komprimieren und einen neuen beginnen"""
+        self._file.close()
+        target = self._segment_path(len(self.segments) + 1)
+        with open(self.path, 'rb') as source:
+            with gzip.open(target, 'wb', compresslevel=COMPRESS_LEVEL) as compressed:
+                shutil.copyfileobj(source, compressed)
+        self.segments.append(target)
+        self._file = open(self.path, 'wb')
+        self._written = 0
+
+    def append(self, entry):
+        rules = entry.get('rules') or [UNKNOWN_RULE] * len(entry['errors'])
+        with self._lock:
+            self.total += 1
+            for rule in rules:
+                self.counts[rule] = self.counts.get(rule, 0) + 1
+            for rule in dict.fromkeys(rules):
+                samples = self.samples.setdefault(rule, [])
+                if len(samples) < self.sample_size:
+                    samples.append(entry)
+            if self.path is None:
+                return
+            if not self._opened:
+                self._open()
+            elif self._file is None:
+                self._file = open(self.path, 'ab')    # nach close() weiterschreiben
+            line = encode_entry(entry).encode('utf-8')
+            self._file.write(line)
+            self._written += len(line)
+            if self._written >= self.max_bytes:
+                self._rotate()
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def clear(self):
+        """Zähler, Beispiele und Protokolldateien verwerfen"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._opened and os.path.exists(self.path):
+                os.remove(self.path)
+            for segment in self.segments:
+                os.remove(segment)
+            self._reset()
+
+    def files(self):
+        """Alle Teile des Protokolls in Schreibreihenfolge"""
+        return self.segments + ([self.path] if self._opened else [])
+
+    def describe(self):
+        """Protokolldatei und Anzahl der komprimierten Teile, z.B. für Berichte"""
+        if not self.segments:
+            return self.path
+        return f"{self.path} (+{len(self.segments)} komprimierte Teile {self._stem()}.NNN.jsonl.gz)"
+
+    def records(self):
+        """Liest alle Einträge aus dem Protokoll zurück (Iterator, ein Eintrag nach dem anderen)"""
+        self.flush()
+        for path in self.files():
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+
+    def summary(self):
+        """[(Regel-id, Meldungen, Beispielzeilen)] absteigend nach Anzahl"""
+        return [
+            (rule, count, [sample['row_num'] for sample in self.samples.get(rule, [])])
+            for rule, count in sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+        ]
+
+    def format_summary(self):
+        """Übersichtstabelle je Regel als Text"""
+        lines = [f"{'Regel':<28}{'Anzahl':>10}  Beispielzeilen", '-' * 80]
+        for rule, count, rows in self.summary():
+            lines.append(f"{rule:<28}{count:>10,}  {', '.join(str(row) for row in rows)}")
+        lines.append('-' * 80)
+        lines.append(f"{'Datensätze gesamt':<28}{self.total:>10,}")
+        return '\n'.join(lines)
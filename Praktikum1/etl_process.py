@@ -5,10 +5,27 @@ Lädt Daten aus SalesData.csv in das normalisierte Data Warehouse
 
 import bonobo
 import csv
-from datetime import datetime
+import io
+import multiprocessing
+import queue
+import threading
+import time
 from collections import defaultdict
-import psycopg2
-from decimal import Decimal, InvalidOperation
+from contextlib import nullcontext
+from functools import partial
+import numpy as np
+import pandas as pd
+
+from validation_rules import RULES_VERSION, UNEXPECTED_RULE, validate_record, validate_columns
+from calendar_dim import Calendar
+from columnar_store import DimensionStore, FactStore, memory_report
+from error_sink import DEFAULT_MAX_BYTES as ERROR_LOG_MAX_BYTES, DEFAULT_PATH as ERROR_LOG_PATH, \
+    DEFAULT_SAMPLE_SIZE as ERROR_SAMPLE_SIZE, ErrorSink
+from instrumentation import RunMetrics
+from load_checkpoint import LoadCheckpoint, batches, chain_digest, checkpoint_key
+from parse_cache import DEFAULT_CACHE_DIR, ParseCache, errors_from_frame, errors_to_frame
+from reference_data import COUNTRIES, format_corrections, merge_counts, reset_counts, snapshot_counts
+from storage_backend import connect, is_local, run_script
 
 # Datenbank-Konfiguration
 DB_CONFIG = {
@@ -17,124 +34,119 @@ DB_CONFIG = {
     'user': '',         # ausfüllen
     'password': '',     # wird in konsole abgefragt
     'port': 5432
+    # 'url': 'duckdb:///sales.duckdb' lädt stattdessen in eine lokale DuckDB-Datei (--database-url)
 }
 
-# Globale Dictionaries für die Dimensionstabellen (um Duplikate zu vermeiden)
-countries = {}
-customers = {}
-dates = {}
-sales_orgs = {}
-orders = {}
-product_categories = {}
-products = {}
-fact_sales = []
-errors = []
+CREBAS_PATH = 'crebas2.sql'
+
+CSV_PATH = 'SalesData.csv'
+
+# Batch-Größe für die spaltenweise Validierung (0 = zeilenweise)
+BATCH_SIZE = 0
+
+# Datensätze je Commit im Bulk-Import (0 = alles in einer Transaktion) und Datei des Ladefortschritts
+COMMIT_SIZE = 0
+CHECKPOINT_PATH = 'ladefortschritt.json'
+
+# Messwerte des Laufs (RunMetrics), nur gesetzt mit --metrics-report / --profile-stage
+metrics = None
+PROFILE_STAGES = ('extract_csv', 'extract_csv_batches', 'validate_and_transform',
+                  'validate_and_transform_batch', 'load_dimension_tables', 'load_dimension_tables_batch',
+                  'merge_shards', 'parse_cache',
+                  'pipeline_parse', 'run_parallel', 'write_to_database')
+
+# Namensraum der Einträge im Parse-Cache
+CACHE_NAMESPACE = 'etl_process'
+
+# Spaltentypen der Faktenzeilen im kompakten Faktenpuffer
+FACT_COLUMNS = {
+    'orderItem': 'str',
+    'productID': 'category',
+    'customerID': 'int',
+    'orderNumber': 'int',
+    'dateID': 'int',
+    'salesQuantity': 'int',
+    'unitOfMeasure': 'category',
+    'revenueUSD': 'decimal',
+    'discountUSD': 'decimal',
+    'costsUSD': 'decimal',
+}
+
+# Globale Puffer für die Dimensionstabellen (um Duplikate zu vermeiden), spaltenweise gespeichert
+countries = DimensionStore(['countryCode', 'countryName'])
+customers = DimensionStore(['customerID', 'countryCode', 'custDescr', 'city'])
+dates = DimensionStore(['dateID', 'date', 'year', 'month', 'day'])
+sales_orgs = DimensionStore(['salesOrgID', 'salesOrgCode'])
+orders = DimensionStore(['orderNumber', 'salesOrgID', 'currency', 'revenue', 'discount'])
+product_categories = DimensionStore(['prodCatID', 'catDescr'])
+products = DimensionStore(['productID', 'prodCatID', 'prodDescr', 'divisionCode'])
+fact_sales = FactStore(FACT_COLUMNS)
+
+# Fehlereinträge werden sofort ins JSONL-Protokoll geschrieben, im Speicher bleiben Zähler und Beispiele je Regel
+errors = ErrorSink(ERROR_LOG_PATH)
+
+# Vorberechnete Kalendertabelle: Datumsschlüssel werden nachgeschlagen statt je Zeile formatiert
+calendar = Calendar()
 
 
 def extract_csv():
     """Extrahiert Daten aus der CSV-Datei"""
-    with open('SalesData.csv', 'r', encoding='utf-8-sig') as f:
+    with open(CSV_PATH, 'r', encoding='utf-8-sig') as f:
         reader = csv.DictReader(f, delimiter=';')
         for row_num, row in enumerate(reader, start=2):
             row['_row_num'] = row_num
             yield row
 
 
+def extract_csv_batches(batch_size):
+    """
+    Extrahiert die CSV-Datei in Batches von Rohwerten (DataFrame mit Spalte '_row_num').
+    Zu kurze Zeilen werden wie beim DictReader mit None aufgefüllt, überzählige Felder verworfen.
+    """
+    with open(CSV_PATH, 'r', encoding='utf-8-sig') as f:
+        reader = csv.reader(f, delimiter=';')
+        header = next(reader)
+        width = len(header)
+        rows = []
+        row_nums = []
+        row_num = 1
+        for values in reader:
+            if not values:
+                continue
+            row_num += 1
+            if len(values) < width:
+                values = values + [None] * (width - len(values))
+            rows.append(values[:width])
+            row_nums.append(row_num)
+            if len(rows) >= batch_size:
+                yield _batch_frame(rows, row_nums, header)
+                rows, row_nums = [], []
+        if rows:
+            yield _batch_frame(rows, row_nums, header)
+
+
+def _batch_frame(rows, row_nums, header):
+    frame = pd.DataFrame(rows, columns=header, dtype=object)
+    frame['_row_num'] = row_nums
+    return frame
+
+
 def validate_and_transform(row):
     """Validiert und transformiert die Daten"""
     row_num = row['_row_num']
-    error_messages = []
     
     try:
-        # Datenbereinigung: Währungen korrigieren
-        currency_mapping = {
-            '€': 'EUR',
-            '$': 'USD',
-            '£': 'GBP'
-        }
-        currency = row.get('Currency', '').strip()
-        if currency in currency_mapping:
-            original = currency
-            row['Currency'] = currency_mapping[currency]
-            error_messages.append(f"Zeile {row_num}: Währung '{original}' automatisch zu '{row['Currency']}' korrigiert")
-        
-        # Datenbereinigung: Ländercodes korrigieren
-        country_mapping = {
-            'GER': 'DE',
-            'USA': 'US',
-            'UK': 'GB',
-            'FRA': 'FR'
-        }
-        country = row.get('Country', '').strip()
-        if country in country_mapping:
-            original = country
-            row['Country'] = country_mapping[country]
-            error_messages.append(f"Zeile {row_num}: Ländercode '{original}' automatisch zu '{row['Country']}' korrigiert")
-        
-        # Pflichtfelder prüfen
-        if not row.get('OrderNumber'):
-            error_messages.append(f"Zeile {row_num}: OrderNumber fehlt")
+        # Regeln aus der gemeinsamen Regeltabelle anwenden
+        rule_ids = []
+        error_messages = validate_record(row, rule_ids)
         
-        if not row.get('OrderItem'):
-            error_messages.append(f"Zeile {row_num}: OrderItem fehlt")
-        
-        if not row.get('Country'):
-            error_messages.append(f"Zeile {row_num}: Country fehlt")
-        
-        # Datum parsen und validieren
-        date_str = row.get('Date', '')
-        try:
-            # Format: DD.MM.YY
-            date_obj = datetime.strptime(date_str, '%d.%m.%y')
-            row['parsed_date'] = date_obj
-        except ValueError:
-            error_messages.append(f"Zeile {row_num}: Ungültiges Datumsformat '{date_str}'")
-            row['parsed_date'] = None
-        
-        # Numerische Felder validieren und konvertieren
-        numeric_fields = {
-            'Customer': int,
-            'OrderNumber': int,
-            'SalesQuantity': int,
-            'Revenue': Decimal,
-            'Discount': Decimal,
-            'RevenueUSD': Decimal,
-            'DiscountUSD': Decimal,
-            'CostsUSD': Decimal
-        }
-        
-        for field, dtype in numeric_fields.items():
-            try:
-                value = row.get(field, '').strip()
-                if value:
-                    # Ersetze Komma durch Punkt für Dezimalzahlen
-                    if dtype == Decimal:
-                        value = value.replace(',', '.')
-                    row[f'parsed_{field}'] = dtype(value)
-                else:
-                    row[f'parsed_{field}'] = None
-                    if field in ['Customer', 'OrderNumber']:
-                        error_messages.append(f"Zeile {row_num}: {field} fehlt oder ist leer")
-            except (ValueError, InvalidOperation) as e:
-                error_messages.append(f"Zeile {row_num}: {field} hat ungültigen Wert '{row.get(field)}'")
-                row[f'parsed_{field}'] = None
-        
-        # Währung validieren
-        currency = row.get('Currency', '').strip()
-        if currency and len(currency) != 3:
-            error_messages.append(f"Zeile {row_num}: Ungültige Währung '{currency}' (sollte 3-stelliger Code sein)")
-        
-        # Ländercode validieren
-        country_code = row.get('Country', '').strip()
-        if country_code and len(country_code) != 2:
-            error_messages.append(f"Zeile {row_num}: Ungültiger Ländercode '{country_code}' (sollte 2-stellig sein)")
-        
-        # Wenn Fehler gefunden wurden, speichern
+        # Wenn Fehler gefunden wurden, protokollieren
         if error_messages:
             errors.append({
                 'row_num': row_num,
                 'data': row,
-                'errors': error_messages
+                'errors': error_messages,
+                'rules': rule_ids
             })
         
         yield row
@@ -143,11 +155,19 @@ def validate_and_transform(row):
         errors.append({
             'row_num': row_num,
             'data': row,
-            'errors': [f"Unerwarteter Fehler: {str(e)}"]
+            'errors': [f"Unerwarteter Fehler: {str(e)}"],
+            'rules': [UNEXPECTED_RULE]
         })
         yield row
 
 
+def validate_and_transform_batch(frame):
+    """Validiert und transformiert einen Batch spaltenweise und gibt ihn als DataFrame weiter"""
+    validated, batch_errors = validate_columns(frame.drop(columns='_row_num'), frame['_row_num'])
+    errors.extend(batch_errors)
+    yield validated
+
+
 def load_dimension_tables(row):
     """Lädt Daten in die Dimensionstabellen (in Memory)"""
     
@@ -156,7 +176,7 @@ def load_dimension_tables(row):
     if country_code and country_code not in countries:
         countries[country_code] = {
             'countryCode': country_code,
-            'countryName': None  # Wird nicht in den Quelldaten geliefert
+            'countryName': COUNTRIES.name_of(country_code)  # nicht in den Quelldaten, aus den Referenzdaten
         }
     
     # Customer
@@ -171,16 +191,9 @@ def load_dimension_tables(row):
     
     # Date
     date_obj = row.get('parsed_date')
-    if date_obj:
-        date_id = int(date_obj.strftime('%Y%m%d'))
-        if date_id not in dates:
-            dates[date_id] = {
-                'dateID': date_id,
-                'date': date_obj.date(),
-                'year': date_obj.year,
-                'month': date_obj.month,
-                'day': date_obj.day
-            }
+    date_id = calendar.key(date_obj) if date_obj else None
+    if date_id and date_id not in dates:
+        dates[date_id] = calendar.record(date_obj)
     
     # SalesOrg
     sales_org_id = row.get('SalesOrg', '').strip()
@@ -227,7 +240,7 @@ def load_dimension_tables(row):
             'productID': product_id if product_id else None,
             'customerID': customer_id,
             'orderNumber': order_number,
-            'dateID': int(date_obj.strftime('%Y%m%d')) if date_obj else None,
+            'dateID': date_id,
             'salesQuantity': row.get('parsed_SalesQuantity'),
             'unitOfMeasure': row.get('UnitOfMeasure', '').strip() or None,
             'revenueUSD': row.get('parsed_RevenueUSD'),
@@ -238,87 +251,759 @@ def load_dimension_tables(row):
     yield row
 
 
-def write_to_database():
-    """Schreibt alle Daten in die PostgreSQL-Datenbank"""
+def _text(frame, field):
+    """Getrimmte Werte einer CSV-Spalte als Objekt-Array ('' für fehlende Felder), je verschiedenem Wert getrimmt"""
+    codes, uniques = pd.factorize(frame[field].to_numpy(dtype=object))
+    stripped = np.array([value.strip() for value in uniques] + [''], dtype=object)
+    return stripped[codes]
+
+
+def _present(values):
+    """Maske der Werte, die als Schlüssel taugen (wie 'if value:' im zeilenweisen Ablauf)"""
+    return (pd.notna(values) & (values != '') & (values != 0)).astype(bool)
+
+
+def _or_none(values):
+    """Leere Strings als None (wie "... or None")"""
+    return np.where(values == '', None, values)
+
+
+def load_dimension_tables_batch(frame):
+    """
+    Lädt einen validierten Batch (validate_columns) spaltenweise in die Puffer,
+    mit demselben Ergebnis wie load_dimension_tables je Zeile: Dimensionen nach
+    dem ersten Vorkommen je Schlüssel, Fakten für alle Zeilen mit OrderItem.
+    """
+    country = _text(frame, 'Country')
+    customer = frame['parsed_Customer'].to_numpy(dtype=object)
+    date_obj = frame['parsed_date'].to_numpy(dtype=object)
+    sales_org = _text(frame, 'SalesOrg')
+    order_number = frame['parsed_OrderNumber'].to_numpy(dtype=object)
+    prod_cat = _text(frame, 'ProdCat')
+    product = _text(frame, 'Product')
+    order_item = _text(frame, 'OrderItem')
+
+    countries.add_new(np.where(country != '', country, None), {
+        'countryCode': country,
+        'countryName': COUNTRIES.names_for(country).to_numpy(dtype=object),
+    })
+    customers.add_new(np.where(_present(customer), customer, None), {
+        'customerID': customer,
+        'countryCode': _or_none(country),
+        'custDescr': _or_none(_text(frame, 'CustDescr')),
+        'city': _or_none(_text(frame, 'City')),
+    })
+
+    # Datumsschlüssel und Kalenderzeilen je verschiedenem Datum
+    codes, uniques = pd.factorize(date_obj)
+    uniques = np.asarray(uniques, dtype=object)
+    known = np.append(_present(uniques), False)     # Code -1 (kein Datum) -> kein Schlüssel
+    records = [calendar.record(value) if ok else {} for value, ok in zip(uniques, known)] + [{}]
+    date_id = np.array([record.get('dateID') for record in records], dtype=object)[codes]
+    dates.add_new(np.where(known[codes], date_id, None), {
+        field: np.array([record.get(field) for record in records], dtype=object)[codes] for field in dates.fields
+    })
+
+    sales_orgs.add_new(np.where(sales_org != '', sales_org, None), {
+        'salesOrgID': sales_org,
+        'salesOrgCode': sales_org,  # In den Daten ist nur der Code vorhanden
+    })
+    orders.add_new(np.where(_present(order_number), order_number, None), {
+        'orderNumber': order_number,
+        'salesOrgID': _or_none(sales_org),
+        'currency': _or_none(_text(frame, 'Currency')),
+        'revenue': frame['parsed_Revenue'].to_numpy(dtype=object),
+        'discount': frame['parsed_Discount'].to_numpy(dtype=object),
+    })
+    product_categories.add_new(np.where(prod_cat != '', prod_cat, None), {
+        'prodCatID': prod_cat,
+        'catDescr': _or_none(_text(frame, 'CatDescr')),
+    })
+    products.add_new(np.where(product != '', product, None), {
+        'productID': product,
+        'prodCatID': _or_none(prod_cat),
+        'prodDescr': _or_none(_text(frame, 'ProdDescr')),
+        'divisionCode': _or_none(_text(frame, 'Division')),
+    })
+
+    # FactSales: Zeilen mit OrderItem, kombinierter Key "<OrderNumber>-<OrderItem>"
+    rows = order_item != ''
+    numbers, number_values = pd.factorize(order_number[rows], use_na_sentinel=False)
+    number_text = np.array(['None' if pd.isna(v) else str(v) for v in number_values], dtype=object)
+    fact_sales.extend_columns({
+        'orderItem': number_text[numbers] + '-' + order_item[rows],
+        'productID': _or_none(product)[rows],
+        'customerID': customer[rows],
+        'orderNumber': order_number[rows],
+        'dateID': np.where(known[codes], date_id, None)[rows],
+        'salesQuantity': frame['parsed_SalesQuantity'].to_numpy(dtype=object)[rows],
+        'unitOfMeasure': _or_none(_text(frame, 'UnitOfMeasure'))[rows],
+        'revenueUSD': frame['parsed_RevenueUSD'].to_numpy(dtype=object)[rows],
+        'discountUSD': frame['parsed_DiscountUSD'].to_numpy(dtype=object)[rows],
+        'costsUSD': frame['parsed_CostsUSD'].to_numpy(dtype=object)[rows],
+    })
+
+    yield frame
+
+
+def extract_csv_shards(shard_size):
+    """
+    Liest die CSV-Datei in Shards aus Rohwerten: (Shard-Nr., Kopfzeile, Werte, Zeilennummern).
+    Leere Zeilen werden wie beim DictReader übersprungen und nicht mitgezählt.
+    """
+    with open(CSV_PATH, 'r', encoding='utf-8-sig') as f:
+        reader = csv.reader(f, delimiter=';')
+        header = next(reader)
+        rows = []
+        row_nums = []
+        row_num = 1
+        shard = 0
+        for values in reader:
+            if not values:
+                continue
+            row_num += 1
+            rows.append(values)
+            row_nums.append(row_num)
+            if len(rows) >= shard_size:
+                yield shard, header, rows, row_nums
+                shard += 1
+                rows, row_nums = [], []
+        if rows:
+            yield shard, header, rows, row_nums
+
+
+def _dict_row(header, values):
+    """Baut einen Datensatz wie csv.DictReader (fehlende Felder None, überzählige unter None)"""
+    row = dict(zip(header, values))
+    if len(values) > len(header):
+        row[None] = values[len(header):]
+    elif len(values) < len(header):
+        for key in header[len(values):]:
+            row[key] = None
+    return row
+
+
+def process_shard(task):
+    """
+    Worker-Prozess: validiert einen Shard und baut Teil-Puffer für Dimensionen und Fakten.
+    Gibt (Shard-Nr., Puffer) zurück; die Puffer werden im Hauptprozess zusammengeführt.
+    Die Fehlereinträge des Shards werden gesammelt zurückgegeben und erst im
+    Hauptprozess protokolliert, der allein in das Fehlerprotokoll schreibt.
+    """
+    global errors
+    shard, header, rows, row_nums, batch_size = task
+    for store in get_stores().values():
+        store.clear()
+    sink, errors = errors, []
+    reset_counts()
+    try:
+        _process_rows(header, rows, row_nums, batch_size)
+        return shard, {'stores': _buffers(), 'errors': errors, 'corrections': snapshot_counts()}
+    finally:
+        errors = sink
+
+
+def _process_rows(header, rows, row_nums, batch_size):
+    if batch_size:
+        for start in range(0, len(rows), batch_size):
+            frame = _batch_frame(
+                [(values + [None] * (len(header) - len(values)))[:len(header)] for values in rows[start:start + batch_size]],
+                row_nums[start:start + batch_size], header
+            )
+            for validated in validate_and_transform_batch(frame):
+                for _ in load_dimension_tables_batch(validated):
+                    pass
+    else:
+        for values, row_num in zip(rows, row_nums):
+            row = _dict_row(header, values)
+            row['_row_num'] = row_num
+            for validated in validate_and_transform(row):
+                for _ in load_dimension_tables(validated):
+                    pass
+
+
+def _buffers():
+    """Die Modul-Puffer nach Namen (Dimensionen in Ladereihenfolge, zuletzt die Fakten)"""
+    return {
+        'countries': countries,
+        'customers': customers,
+        'dates': dates,
+        'sales_orgs': sales_orgs,
+        'orders': orders,
+        'product_categories': product_categories,
+        'products': products,
+        'fact_sales': fact_sales,
+    }
+
+
+def merge_shard(part):
+    """
+    Führt die Teil-Puffer eines Shards in die Modul-Puffer zusammen.
+    Shards werden in Dateireihenfolge gemischt, vorhandene Schlüssel bleiben bestehen
+    (first-seen-wins) - das Ergebnis entspricht dem sequentiellen Lauf.
+    """
+    buffers = _buffers()
+    for name, buffer in part['stores'].items():
+        if name == 'fact_sales':
+            buffers[name].extend(buffer)
+        else:
+            buffers[name].update(buffer)
+    errors.extend(part['errors'])
+    merge_counts(part['corrections'])
+
+
+def run_parallel(workers, shard_size=50000, batch_size=0):
+    """
+    Paralleler Modus statt des bonobo-Graphen: die Zeilen werden in Shards auf
+    'workers' Prozesse verteilt, jeder Prozess validiert und baut Teil-Puffer,
+    der Hauptprozess mischt die Ergebnisse in Shard-Reihenfolge.
+    """
+    tasks = (
+        (shard, header, rows, row_nums, batch_size)
+        for shard, header, rows, row_nums in extract_csv_shards(shard_size)
+    )
+    with multiprocessing.Pool(workers) as pool:
+        # imap liefert die Ergebnisse in Shard-Reihenfolge, auch wenn spätere Shards früher fertig sind
+        for shard, part in pool.imap(process_shard, tasks):
+            with _stage('merge_shards'):
+                merge_shard(part)
+
+
+def _load_validated(batch_size=0):
+    """
+    Extrahiert, validiert und puffert die Datensätze wie der bonobo-Graph, ohne bonobo.
+    Gibt nach jedem Datensatz bzw. Batch die Anzahl der verarbeiteten Datensätze aus.
+    """
+    if batch_size:
+        for frame in extract_csv_batches(batch_size):
+            for validated in validate_and_transform_batch(frame):
+                for _ in load_dimension_tables_batch(validated):
+                    pass
+                yield len(validated)
+    else:
+        for row in extract_csv():
+            for validated in validate_and_transform(row):
+                for _ in load_dimension_tables(validated):
+                    pass
+                yield 1
+
+
+class PipelineLoader(threading.Thread):
+    """
+    Lade-Thread des Pipeline-Modus: nimmt Batches (Tabelle -> Datensätze) aus
+    einer begrenzten Queue und schreibt sie per COPY und Merge (merge_staging)
+    in Ladereihenfolge, also die Dimensionen eines Batches vor seinen Fakten.
+    Jeder Batch wird einzeln committet.
+
+    Nach einem Fehler wird die Queue weiter geleert, aber nichts mehr geladen,
+    damit der Producer nicht blockiert; der Fehler steht in 'failure'.
+    """
+
+    def __init__(self, queue_size):
+        super().__init__(name='db-loader', daemon=True)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.specs = get_bulk_tables()
+        self.inserted = defaultdict(int)
+        self.rejected = defaultdict(int)
+        self.batches = 0
+        self.seconds = 0.0
+        self.failure = None
+
+    def run(self):
+        conn = cur = None
+        try:
+            conn = connect(DB_CONFIG)
+            cur = conn.cursor()
+        except Exception as e:
+            self.failure = e
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                break
+            if self.failure is not None:
+                continue
+            started = time.perf_counter()
+            try:
+                for spec in self.specs:
+                    rows = batch.get(spec['table'])
+                    if not rows:
+                        continue
+                    table_started = time.perf_counter()
+                    _, inserted, rejected = merge_staging(cur, dict(spec, rows=rows))
+                    _db_time(spec['table'].strip('"'), table_started, inserted)
+                    self.inserted[spec['table']] += inserted
+                    self.rejected[spec['table']] += rejected
+                conn.commit()
+                self.batches += 1
+            except Exception as e:
+                self.failure = e
+                conn.rollback()
+            self.seconds += time.perf_counter() - started
+        if cur is not None:
+            cur.close()
+        if conn is not None:
+            conn.close()
+
+
+def run_pipelined(flush_size=50000, queue_size=4, batch_size=0):
+    """
+    Pipeline-Modus: Parsen/Validieren (dieser Thread) und Laden (PipelineLoader)
+    laufen überlappend. Alle 'flush_size' Datensätze (mit batch_size nach dem Batch,
+    der flush_size erreicht) gehen die seit dem letzten Batch neuen Dimensionszeilen
+    und die Fakten als Batch in die Queue. Die
+    Fakten werden danach aus dem Puffer entfernt, die Dimensionspuffer behalten
+    nur ihre Schlüssel für die Duplikatprüfung - der Speicherbedarf bleibt
+    durch flush_size und queue_size begrenzt.
+    Gibt die Kennzahlen des Laufs als dict zurück.
+    """
+    loader = PipelineLoader(queue_size)
+    loader.start()
+    stores = {spec['table']: spec['store'] for spec in loader.specs}
+    flushed = {table: 0 for table in stores}
+    counts = {'rows': 0, 'facts': 0, 'wait_seconds': 0.0}
+
+    def flush():
+        batch = {}
+        for table, store in stores.items():
+            if store is fact_sales:
+                # Fakten als kompakte Kopie (typisierte Arrays), Datensätze entstehen erst beim COPY
+                facts = FactStore(FACT_COLUMNS)
+                facts.extend(fact_sales)
+                batch[table] = facts
+                counts['facts'] += len(facts)
+                fact_sales.clear()
+            else:
+                batch[table] = list(store.rows_since(flushed[table]))
+                flushed[table] = len(store)
+        # Blockiert, wenn der Lade-Thread zurückliegt (Gegendruck)
+        waiting = time.perf_counter()
+        loader.queue.put(batch)
+        counts['wait_seconds'] += time.perf_counter() - waiting
+
+    started = time.perf_counter()
+    pending = 0
+    with _stage('pipeline_parse'):
+        for loaded in _load_validated(batch_size):
+            pending += loaded
+            if pending >= flush_size:
+                counts['rows'] += pending
+                pending = 0
+                flush()
+                if loader.failure is not None:
+                    break
+        counts['rows'] += pending
+        if loader.failure is None:
+            flush()
+    parse_done = time.perf_counter()
+    loader.queue.put(None)
+    loader.join()
+
+    return dict(counts,
+                parse_seconds=parse_done - started - counts['wait_seconds'],
+                load_seconds=loader.seconds,
+                wall_seconds=time.perf_counter() - started,
+                batches=loader.batches,
+                inserted=dict(loader.inserted),
+                rejected=dict(loader.rejected),
+                failure=loader.failure)
+
+
+def print_pipeline_report(result):
+    """Ausgabe des Pipeline-Modus: geladene Zeilen und Überlappung von Parsen und Laden"""
+    print("\n" + "="*80)
+    print("PIPELINE: PARSEN UND DATENBANK-IMPORT ÜBERLAPPEND")
+    print("="*80)
+    for table, inserted in result['inserted'].items():
+        name = table.strip('"')
+        print(f"  • {name}: {inserted} geladen, {result['rejected'].get(table, 0)} abgelehnt")
+    print(f"\n  {result['rows']} Datensätze in {result['batches']} Batches")
+    print(f"  Parsen: {result['parse_seconds']:.2f}s, Laden: {result['load_seconds']:.2f}s, "
+          f"Gesamt: {result['wall_seconds']:.2f}s (Wartezeit auf den Lade-Thread: {result['wait_seconds']:.2f}s)")
+    if result['failure'] is not None:
+        print(f"\n✗ FEHLER beim Datenbankzugriff: {result['failure']} - bereits committete Batches bleiben erhalten")
+
+
+def cache_frames():
+    """Puffer und Fehlereinträge nach Extraktion und Validierung als DataFrames (für den Parse-Cache)"""
+    frames = {name: store.to_frame() for name, store in _buffers().items()}
+    frames['errors'] = errors_to_frame(errors.records())
+    # Zähler der Referenzdaten-Korrekturen, damit die Zusammenfassung nicht vom Cache abhängt
+    counts = [(mapping, raw, code, rows) for mapping, corrections in snapshot_counts().items()
+              for (raw, code), rows in corrections.items()]
+    frames['corrections'] = pd.DataFrame({
+        'mapping': pd.Series([c[0] for c in counts], dtype=object),
+        'raw': pd.Series([c[1] for c in counts], dtype=object),
+        'code': pd.Series([c[2] for c in counts], dtype=object),
+        'rows': pd.Series([c[3] for c in counts], dtype='int64'),
+    })
+    return frames
+
+
+def restore_cache_frames(frames):
+    """Füllt Puffer, Fehlerliste und Korrekturzähler aus einem Parse-Cache-Eintrag (Gegenstück zu cache_frames)"""
+    for name, store in _buffers().items():
+        store.load_frame(frames[name])
+    errors.clear()
+    errors.extend(errors_from_frame(frames['errors']))
+    counts = {}
+    corrections = frames['corrections']
+    for mapping, raw, code, rows in zip(corrections['mapping'], corrections['raw'],
+                                        corrections['code'], corrections['rows']):
+        counts.setdefault(mapping, {})[(raw, code)] = int(rows)
+    reset_counts()
+    merge_counts(counts)
+
+
+def get_stores():
+    """Alle In-Memory-Puffer mit Bezeichnung (für Speicherbericht)"""
+    return {
+        'Länder': countries,
+        'Kunden': customers,
+        'Datumswerte': dates,
+        'Vertriebsorganisationen': sales_orgs,
+        'Bestellungen': orders,
+        'Produktkategorien': product_categories,
+        'Produkte': products,
+        'Verkaufstransaktionen': fact_sales,
+    }
+
+
+def get_bulk_tables():
+    """
+    Beschreibt die Zieltabellen für den Bulk-Import in Ladereihenfolge.
+    Jede Tabelle: Puffer ('store'), SQL-Spalten, zugehörige Schlüssel der In-Memory-Datensätze,
+    Primärschlüssel und Fremdschlüssel (Spalte, Referenztabelle, Referenzspalte).
+    """
+    return [
+        {
+            'table': 'Country', 'label': 'Länder', 'rows': countries.values(), 'store': countries,
+            'columns': ['countryCode', 'countryName'],
+            'fields': ['countryCode', 'countryName'],
+            'key': 'countryCode', 'foreign_keys': []
+        },
+        {
+            'table': 'SalesOrg', 'label': 'Vertriebsorganisationen', 'rows': sales_orgs.values(), 'store': sales_orgs,
+            'columns': ['salesOrgID', 'salesOrgCode'],
+            'fields': ['salesOrgID', 'salesOrgCode'],
+            'key': 'salesOrgID', 'foreign_keys': []
+        },
+        {
+            'table': 'Customer', 'label': 'Kunden', 'rows': customers.values(), 'store': customers,
+            'columns': ['customerID', 'countryCode', 'custDescr', 'city'],
+            'fields': ['customerID', 'countryCode', 'custDescr', 'city'],
+            'key': 'customerID',
+            'foreign_keys': [('countryCode', 'Country', 'countryCode')]
+        },
+        {
+            'table': '"Date"', 'label': 'Datumswerte', 'rows': dates.values(), 'store': dates,
+            'columns': ['dateID', '"date"', 'year', 'month', 'day'],
+            'fields': ['dateID', 'date', 'year', 'month', 'day'],
+            'key': 'dateID', 'foreign_keys': []
+        },
+        {
+            'table': '"Order"', 'label': 'Bestellungen', 'rows': orders.values(), 'store': orders,
+            'columns': ['orderNumber', 'salesOrgID', 'currency', 'revenue', 'discount'],
+            'fields': ['orderNumber', 'salesOrgID', 'currency', 'revenue', 'discount'],
+            'key': 'orderNumber',
+            'foreign_keys': [('salesOrgID', 'SalesOrg', 'salesOrgID')]
+        },
+        {
+            'table': 'ProductCategory', 'label': 'Produktkategorien', 'rows': product_categories.values(), 'store': product_categories,
+            'columns': ['prodCatID', 'catDescr'],
+            'fields': ['prodCatID', 'catDescr'],
+            'key': 'prodCatID', 'foreign_keys': []
+        },
+        {
+            'table': 'Product', 'label': 'Produkte', 'rows': products.values(), 'store': products,
+            'columns': ['productID', 'prodCatID', 'prodDescr', 'divisionCode'],
+            'fields': ['productID', 'prodCatID', 'prodDescr', 'divisionCode'],
+            'key': 'productID',
+            'foreign_keys': [('prodCatID', 'ProductCategory', 'prodCatID')]
+        },
+        {
+            'table': 'FactSales', 'label': 'Verkaufstransaktionen', 'rows': fact_sales, 'store': fact_sales,
+            'columns': ['orderItem', 'productID', 'customerID', 'orderNumber', 'dateID',
+                        'salesQuantity', 'unitOfMeasure', 'revenueUSD', 'discountUSD', 'costsUSD'],
+            'fields': ['orderItem', 'productID', 'customerID', 'orderNumber', 'dateID',
+                       'salesQuantity', 'unitOfMeasure', 'revenueUSD', 'discountUSD', 'costsUSD'],
+            'key': 'orderItem',
+            'foreign_keys': [
+                ('dateID', '"Date"', 'dateID'),
+                ('orderNumber', '"Order"', 'orderNumber'),
+                ('productID', 'Product', 'productID'),
+                ('customerID', 'Customer', 'customerID'),
+            ]
+        },
+    ]
+
+
+def copy_rows(cur, staging, columns, fields, rows, chunk_size=100000):
+    """Streamt Datensätze blockweise per COPY FROM STDIN in eine Staging-Tabelle"""
+    copy_sql = f"COPY {staging} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '')"
+    staged = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    pending = 0
+    for row in rows:
+        writer.writerow(['' if row[f] is None else row[f] for f in fields])
+        pending += 1
+        if pending >= chunk_size:
+            buffer.seek(0)
+            cur.copy_expert(copy_sql, buffer)
+            staged += pending
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            pending = 0
+    if pending:
+        buffer.seek(0)
+        cur.copy_expert(copy_sql, buffer)
+        staged += pending
+    return staged
+
+
+def merge_staging(cur, spec):
+    """
+    Lädt eine Tabelle über COPY in eine temporäre Staging-Tabelle und führt
+    sie mit einem einzigen INSERT ... SELECT ... ON CONFLICT DO NOTHING zusammen.
+    Zeilen mit fehlendem Primärschlüssel oder unbekanntem Fremdschlüssel werden
+    nicht eingefügt, sondern in 'errors' gemeldet.
+    Gibt (bereitgestellt, eingefügt, abgelehnt) zurück.
+    """
+    table = spec['table']
+    columns = ', '.join(spec['columns'])
+    staging = 'stg_' + table.strip('"').lower()
+
+    cur.execute(f'CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA')
+    staged = copy_rows(cur, staging, spec['columns'], spec['fields'], spec['rows'])
+
+    # Bedingung für gültige Zeilen: Primärschlüssel vorhanden, Fremdschlüssel NULL oder referenziert
+    conditions = [f"s.{spec['key']} IS NOT NULL"]
+    for fk_column, ref_table, ref_column in spec['foreign_keys']:
+        conditions.append(
+            f"(s.{fk_column} IS NULL OR EXISTS (SELECT 1 FROM {ref_table} r WHERE r.{ref_column} = s.{fk_column}))"
+        )
+    valid = ' AND '.join(conditions)
+
+    # Abgelehnte Zeilen vor dem Merge ermitteln, damit sie nicht verloren gehen;
+    # je Fremdschlüssel ein Flag, damit nur die tatsächlich verletzten gemeldet werden
+    select_columns = ', '.join(f's.{c}' for c in spec['columns'])
+    fk_flags = ''.join(f', {condition}' for condition in conditions[1:])
+    cur.execute(f'SELECT {select_columns}{fk_flags} FROM {staging} s WHERE NOT ({valid})')
+    width = len(spec['columns'])
+    rejected = 0
+    for values in cur.fetchall():
+        data = dict(zip(spec['fields'], values[:width]))
+        fk_ok = values[width:]
+        messages = []
+        rule_ids = []
+        if data[spec['key']] is None:
+            messages.append(f"Fehler beim Einfügen: Primärschlüssel {spec['key']} fehlt")
+            rule_ids.append('load_primary_key')
+        for (fk_column, ref_table, ref_column), ok in zip(spec['foreign_keys'], fk_ok):
+            if not ok:
+                messages.append(
+                    f"Fehler beim Einfügen: {fk_column} '{data[fk_column]}' nicht in {ref_table} vorhanden oder ungültig"
+                )
+                rule_ids.append(f'load_foreign_key_{fk_column}')
+        errors.append({
+            'row_num': table.strip('"'),
+            'data': data,
+            'errors': messages,
+            'rules': rule_ids
+        })
+        rejected += 1
+
+    cur.execute(
+        f'INSERT INTO {table} ({columns}) SELECT {select_columns} FROM {staging} s '
+        f'WHERE {valid} ON CONFLICT ({spec["key"]}) DO NOTHING'
+    )
+    inserted = cur.rowcount
+    return staged, inserted, rejected
+
+
+def _stage(name):
+    """Misst einen Block, wenn der Lauf instrumentiert wird"""
+    return metrics.stage(name) if metrics is not None else nullcontext()
+
+
+def _db_time(table, started, rows):
+    """Datenbankzeit einer Tabelle seit 'started' erfassen"""
+    if metrics is not None:
+        metrics.db_time(table, time.perf_counter() - started, rows)
+
+
+def write_to_database_bulk(cur):
+    """Bulk-Import: pro Tabelle ein COPY in eine Staging-Tabelle und ein mengenbasierter Merge"""
+    for spec in get_bulk_tables():
+        print(f"\nLade {spec['label']} per COPY...")
+        started = time.perf_counter()
+        staged, inserted, rejected = merge_staging(cur, spec)
+        _db_time(spec['table'].strip('"'), started, inserted)
+        skipped = staged - inserted - rejected
+        print(f"✓ {inserted} {spec['label']} geladen ({skipped} bereits vorhanden, {rejected} abgelehnt)")
+
+
+def write_to_database_batched(conn, cur, commit_size, checkpoint):
+    """
+    Bulk-Import in Batches zu commit_size Datensätzen je Tabelle. Jeder Batch
+    wird einzeln committet und danach im Ladefortschritt vermerkt; ein
+    erneuter Lauf überspringt die committeten Batches (siehe load_checkpoint).
+    Abgelehnte Zeilen übersprungener Batches stehen im Fehlerprotokoll des
+    früheren Laufs.
+    """
+    for spec in get_bulk_tables():
+        table = spec['table'].strip('"')
+        key = spec['key']
+        if checkpoint.done(table):
+            print(f"\n✓ {spec['label']}: bereits in einem früheren Lauf geladen "
+                  f"({checkpoint.counts(table).get('inserted', 0)} eingefügt)")
+            continue
+        keys = ([row[key] for row in batch] for batch in batches(spec['store'].rows_since(0), commit_size))
+        skipped, digest = checkpoint.resume(table, keys)
+        if skipped:
+            print(f"\nLade {spec['label']} per COPY ab Batch {skipped + 1} "
+                  f"({skipped} Batches zu {commit_size} bereits committet)...")
+        else:
+            print(f"\nLade {spec['label']} per COPY in Batches zu {commit_size}...")
+        started = time.perf_counter()
+        number = skipped
+        staged = inserted = rejected = 0
+        for batch in batches(spec['store'].rows_since(skipped * commit_size), commit_size):
+            batch_staged, batch_inserted, batch_rejected = merge_staging(cur, dict(spec, rows=batch))
+            conn.commit()
+            number += 1
+            digest = chain_digest(digest, [row[key] for row in batch])
+            checkpoint.record(table, number, digest, inserted=batch_inserted, rejected=batch_rejected)
+            staged += batch_staged
+            inserted += batch_inserted
+            rejected += batch_rejected
+        checkpoint.complete(table)
+        _db_time(table, started, inserted)
+        print(f"✓ {inserted} {spec['label']} geladen in {number - skipped} Batches "
+              f"({staged - inserted - rejected} bereits vorhanden, {rejected} abgelehnt)")
+
+
+def write_to_database(bulk=False, commit_size=0, checkpoint=None):
+    """
+    Schreibt alle Daten in die PostgreSQL-Datenbank. Mit commit_size wird
+    per COPY in einzeln committeten Batches geladen und der Fortschritt in
+    'checkpoint' festgehalten, sonst alles in einer Transaktion.
+    """
     print("\n" + "="*80)
     print("DATENBANK-IMPORT STARTET")
     print("="*80)
     
-    if not DB_CONFIG['password']:
+    if not DB_CONFIG['password'] and not is_local(DB_CONFIG.get('url')):
         print("\nFEHLER: Passwort wurde nicht eingegeben!")
         return
     
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = connect(DB_CONFIG)
         cur = conn.cursor()
         
         print("\n✓ Verbindung zur Datenbank hergestellt")
         
+        if commit_size:
+            write_to_database_batched(conn, cur, commit_size, checkpoint)
+            # Lauf vollständig: der nächste Lauf beginnt wieder von vorn (die Merges sind idempotent)
+            checkpoint.clear()
+            print("\n✓ Alle Daten erfolgreich in die Datenbank geschrieben!")
+            print("="*80)
+            return
+        
+        if not bulk and is_local(DB_CONFIG.get('url')):
+            # DuckDB hält jede Einzelzeilen-Anweisung einer Transaktion in eigenen Blöcken;
+            # zeilenweise läuft der Import bei großen Dateien in den Speicher
+            print("Lokale DuckDB-Datei: Tabellen werden per COPY geladen (--bulk)")
+            bulk = True
+        
+        if bulk:
+            write_to_database_bulk(cur)
+            conn.commit()
+            print("\n✓ Alle Daten erfolgreich in die Datenbank geschrieben!")
+            print("="*80)
+            return
+        
         # Country
         print(f"\nLade {len(countries)} Länder...")
+        started = time.perf_counter()
         for country in countries.values():
             cur.execute(
                 'INSERT INTO Country (countryCode, countryName) VALUES (%s, %s) ON CONFLICT (countryCode) DO NOTHING',
                 (country['countryCode'], country['countryName'])
             )
+        _db_time('Country', started, len(countries))
         print(f"✓ {len(countries)} Länder geladen")
         
         # SalesOrg
         print(f"\nLade {len(sales_orgs)} Vertriebsorganisationen...")
+        started = time.perf_counter()
         for org in sales_orgs.values():
             cur.execute(
                 'INSERT INTO SalesOrg (salesOrgID, salesOrgCode) VALUES (%s, %s) ON CONFLICT (salesOrgID) DO NOTHING',
                 (org['salesOrgID'], org['salesOrgCode'])
             )
+        _db_time('SalesOrg', started, len(sales_orgs))
         print(f"✓ {len(sales_orgs)} Vertriebsorganisationen geladen")
         
         # Customer
         print(f"\nLade {len(customers)} Kunden...")
+        started = time.perf_counter()
         for customer in customers.values():
             cur.execute(
                 'INSERT INTO Customer (customerID, countryCode, custDescr, city) VALUES (%s, %s, %s, %s) ON CONFLICT (customerID) DO NOTHING',
                 (customer['customerID'], customer['countryCode'], customer['custDescr'], customer['city'])
             )
+        _db_time('Customer', started, len(customers))
         print(f"✓ {len(customers)} Kunden geladen")
         
         # Date
         print(f"\nLade {len(dates)} Datumswerte...")
+        started = time.perf_counter()
         for date in dates.values():
             cur.execute(
                 'INSERT INTO "Date" (dateID, "date", year, month, day) VALUES (%s, %s, %s, %s, %s) ON CONFLICT (dateID) DO NOTHING',
                 (date['dateID'], date['date'], date['year'], date['month'], date['day'])
             )
+        _db_time('Date', started, len(dates))
         print(f"✓ {len(dates)} Datumswerte geladen")
         
         # Order
         print(f"\nLade {len(orders)} Bestellungen...")
+        started = time.perf_counter()
         for order in orders.values():
             cur.execute(
                 'INSERT INTO "Order" (orderNumber, salesOrgID, currency, revenue, discount) VALUES (%s, %s, %s, %s, %s) ON CONFLICT (orderNumber) DO NOTHING',
                 (order['orderNumber'], order['salesOrgID'], order['currency'], order['revenue'], order['discount'])
             )
+        _db_time('Order', started, len(orders))
         print(f"✓ {len(orders)} Bestellungen geladen")
         
         # ProductCategory
         print(f"\nLade {len(product_categories)} Produktkategorien...")
+        started = time.perf_counter()
         for cat in product_categories.values():
             cur.execute(
                 'INSERT INTO ProductCategory (prodCatID, catDescr) VALUES (%s, %s) ON CONFLICT (prodCatID) DO NOTHING',
                 (cat['prodCatID'], cat['catDescr'])
             )
+        _db_time('ProductCategory', started, len(product_categories))
         print(f"✓ {len(product_categories)} Produktkategorien geladen")
         
         # Product
         print(f"\nLade {len(products)} Produkte...")
+        started = time.perf_counter()
         for product in products.values():
             cur.execute(
                 'INSERT INTO Product (productID, prodCatID, prodDescr, divisionCode) VALUES (%s, %s, %s, %s) ON CONFLICT (productID) DO NOTHING',
                 (product['productID'], product['prodCatID'], product['prodDescr'], product['divisionCode'])
             )
+        _db_time('Product', started, len(products))
         print(f"✓ {len(products)} Produkte geladen")
         
         # FactSales
         print(f"\nLade {len(fact_sales)} Verkaufstransaktionen...")
+        started = time.perf_counter()
         inserted = 0
         for fact in fact_sales:
             try:
@@ -333,8 +1018,10 @@ def write_to_database():
                 errors.append({
                     'row_num': 'FactSales',
                     'data': fact,
-                    'errors': [f"Fehler beim Einfügen: {str(e)}"]
+                    'errors': [f"Fehler beim Einfügen: {str(e)}"],
+                    'rules': ['load_insert']
                 })
+        _db_time('FactSales', started, inserted)
         print(f"✓ {inserted} Verkaufstransaktionen geladen")
         
         conn.commit()
@@ -345,6 +1032,9 @@ def write_to_database():
         print(f"\n✗ FEHLER beim Datenbankzugriff: {str(e)}")
         if 'conn' in locals():
             conn.rollback()
+        if commit_size and checkpoint.resumed:
+            print(f"  Committete Batches sind in '{checkpoint.path}' vermerkt - "
+                  f"ein erneuter Aufruf mit --commit-size {commit_size} setzt dort fort")
     finally:
         if 'cur' in locals():
             cur.close()
@@ -352,8 +1042,24 @@ def write_to_database():
             conn.close()
 
 
+def create_schema(path):
+    """Führt das Schema-Skript (crebas2.sql) aus; löscht und legt alle Tabellen neu an"""
+    with open(path, encoding='utf-8') as f:
+        sql_text = f.read()
+    conn = connect(DB_CONFIG)
+    try:
+        run_script(conn, sql_text)
+    finally:
+        conn.close()
+    print(f"✓ Schema aus '{path}' angelegt")
+
+
 def write_error_report():
-    """Schreibt einen Fehlerbericht"""
+    """
+    Schreibt den Fehlerbericht: Übersicht je Regel und die ersten Beispiele je Regel.
+    Alle Einträge stehen im JSONL-Fehlerprotokoll, das während des Laufs geschrieben wurde.
+    """
+    errors.close()
     print("\n" + "="*80)
     print("FEHLERBERICHT")
     print("="*80)
@@ -361,22 +1067,31 @@ def write_error_report():
     if not errors:
         print("\n✓ Keine Fehler gefunden!")
     else:
+        summary = errors.format_summary()
         print(f"\n{len(errors)} fehlerhafte Datensätze gefunden:\n")
+        print(summary)
         
         with open('fehlerhafte_datensaetze.txt', 'w', encoding='utf-8') as f:
             f.write("FEHLERBERICHT - Global Bike Sales Data ETL\n")
             f.write("="*80 + "\n\n")
             f.write(f"Anzahl fehlerhafter Datensätze: {len(errors)}\n\n")
+            f.write(summary + "\n\n")
+            if errors.path:
+                f.write(f"Alle Einträge (JSONL): {errors.describe()}\n\n")
             
-            for error in errors:
-                f.write(f"\nZeile {error['row_num']}:\n")
-                f.write("-" * 40 + "\n")
-                for err_msg in error['errors']:
-                    f.write(f"  • {err_msg}\n")
-                    print(f"  • {err_msg}")
-                f.write(f"  Daten: {error['data']}\n\n")
+            for rule, count, _ in errors.summary():
+                f.write(f"\nRegel {rule} - erste {len(errors.samples[rule])} von {count:,} Meldungen:\n")
+                f.write("=" * 40 + "\n")
+                for error in errors.samples[rule]:
+                    f.write(f"\nZeile {error['row_num']}:\n")
+                    f.write("-" * 40 + "\n")
+                    for err_msg in error['errors']:
+                        f.write(f"  • {err_msg}\n")
+                    f.write(f"  Daten: {error['data']}\n\n")
         
-        print(f"\n✓ Vollständiger Fehlerbericht wurde in 'fehlerhafte_datensaetze.txt' gespeichert")
+        print(f"\n✓ Fehlerbericht (Übersicht und Beispiele) wurde in 'fehlerhafte_datensaetze.txt' gespeichert")
+        if errors.path:
+            print(f"✓ Alle Einträge im Fehlerprotokoll: {errors.describe()}")
     
     print("="*80)
 
@@ -386,12 +1101,18 @@ def get_graph(**options):
     Erstellt den Bonobo ETL-Graph
     """
     graph = bonobo.Graph()
+    batch_size = options.get('batch_size') or BATCH_SIZE
     
-    graph.add_chain(
-        extract_csv,
-        validate_and_transform,
-        load_dimension_tables,
-    )
+    if batch_size:
+        nodes = [partial(extract_csv_batches, batch_size), validate_and_transform_batch, load_dimension_tables_batch]
+    else:
+        nodes = [extract_csv, validate_and_transform, load_dimension_tables]
+    
+    # Knoten instrumentieren: Laufzeit und Datensätze rein/raus je Knoten
+    if metrics is not None:
+        nodes = [metrics.node(node) for node in nodes]
+    
+    graph.add_chain(*nodes)
     
     return graph
 
@@ -410,21 +1131,134 @@ if __name__ == '__main__':
     print("\nDieser ETL-Prozess lädt die Daten aus SalesData.csv")
     print("in das normalisierte Data Warehouse.\n")
     
-    # Passwort abfragen wenn nicht gesetzt
-    if not DB_CONFIG['password']:
-        import getpass
-        DB_CONFIG['password'] = getpass.getpass("Datenbank-Passwort eingeben: ")
-    
     # Bonobo ETL ausführen
     parser = bonobo.get_argument_parser()
+    parser.add_argument('--bulk', action='store_true',
+                        help='Tabellen per COPY und mengenbasiertem Merge statt zeilenweise laden')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help='Datensätze spaltenweise in Batches dieser Größe validieren (0 = zeilenweise)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Zeilen in Shards auf so viele Prozesse verteilen (0 = bonobo-Graph, ein Kern)')
+    parser.add_argument('--shard-size', type=int, default=50000,
+                        help='Datensätze pro Shard im parallelen Modus')
+    parser.add_argument('--metrics-report', default=None,
+                        help='JSON-Laufbericht schreiben (Zeit, Datensätze, RSS je Stufe, DB-Zeit je Tabelle)')
+    parser.add_argument('--profile-stage', default=None, choices=PROFILE_STAGES,
+                        help='Diese Stufe mit cProfile aufzeichnen (<stufe>.prof)')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Parsen und Datenbank-Import überlappend (Lade-Thread, begrenzte Queue, immer per COPY)')
+    parser.add_argument('--flush-size', type=int, default=50000,
+                        help='Datensätze pro Batch an den Lade-Thread im Pipeline-Modus')
+    parser.add_argument('--queue-size', type=int, default=4,
+                        help='Maximal wartende Batches im Pipeline-Modus (Gegendruck auf das Parsen)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse-Cache nicht verwenden (CSV immer neu parsen und validieren)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help='Verzeichnis des Parse-Caches (Parquet, Schlüssel: SHA-256 der CSV + Regelversion)')
+    parser.add_argument('--error-log', default=ERROR_LOG_PATH,
+                        help='Fehlerprotokoll (JSONL, ein Eintrag je fehlerhaftem Datensatz)')
+    parser.add_argument('--error-samples', type=int, default=ERROR_SAMPLE_SIZE,
+                        help='Beispiele je Regel im Fehlerbericht')
+    parser.add_argument('--error-log-max-mb', type=int, default=ERROR_LOG_MAX_BYTES // 1024 ** 2,
+                        help='Größe, ab der das Fehlerprotokoll komprimiert (gzip) und neu begonnen wird')
+    parser.add_argument('--database-url', default=None,
+                        help='Lokale DuckDB-Datei statt Postgres, z.B. duckdb:///sales.duckdb (ohne Server und Passwort)')
+    parser.add_argument('--run-crebas', action='store_true',
+                        help=f'{CREBAS_PATH} vor dem Import ausführen (Tabellen neu anlegen)')
+    parser.add_argument('--commit-size', type=int, default=COMMIT_SIZE,
+                        help='Per COPY in Batches dieser Größe laden, jeder Batch einzeln committet und '
+                             'im Ladefortschritt vermerkt; ein erneuter Lauf setzt nach dem letzten Batch fort '
+                             '(0 = eine Transaktion)')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH,
+                        help='Datei des Ladefortschritts für --commit-size')
     with bonobo.parse_args(parser) as options:
-        bonobo.run(
-            get_graph(**options),
-            services=get_services(**options)
-        )
+        bulk = options.pop('bulk', False)
+        metrics_report = options.pop('metrics_report', None)
+        profile_stage = options.pop('profile_stage', None)
+        workers = options.pop('workers', 0)
+        shard_size = options.pop('shard_size', 50000)
+        pipeline = options.pop('pipeline', False)
+        flush_size = options.pop('flush_size', 50000)
+        queue_size = options.pop('queue_size', 4)
+        if pipeline and workers > 1:
+            parser.error('--pipeline und --workers schließen sich aus')
+        commit_size = options.pop('commit_size', COMMIT_SIZE)
+        checkpoint_path = options.pop('checkpoint', CHECKPOINT_PATH)
+        if commit_size and pipeline:
+            parser.error('--commit-size und --pipeline schließen sich aus (der Pipeline-Modus committet je Batch)')
+        errors.path = options.pop('error_log', ERROR_LOG_PATH)
+        errors.sample_size = options.pop('error_samples', ERROR_SAMPLE_SIZE)
+        errors.max_bytes = options.pop('error_log_max_mb', ERROR_LOG_MAX_BYTES // 1024 ** 2) * 1024 ** 2
+        database_url = options.pop('database_url', None)
+        if database_url:
+            if not is_local(database_url):
+                parser.error('--database-url erwartet eine duckdb:///-URL (Postgres über DB_CONFIG)')
+            DB_CONFIG['url'] = database_url
+        run_crebas = options.pop('run_crebas', False)
+        no_cache = options.pop('no_cache', False)
+        cache = ParseCache(options.pop('cache_dir', DEFAULT_CACHE_DIR), enabled=not no_cache)
+        if not no_cache and not cache.available:
+            print("Parse-Cache: pyarrow ist nicht installiert, der Cache ist abgeschaltet")
+
+        # Passwort abfragen wenn nicht gesetzt (die lokale DuckDB-Datei braucht keins)
+        if not DB_CONFIG['password'] and not is_local(DB_CONFIG.get('url')):
+            import getpass
+            DB_CONFIG['password'] = getpass.getpass("Datenbank-Passwort eingeben: ")
+        checkpoint = None
+        if commit_size:
+            # Der Fortschritt gilt nur für dieselbe CSV, dieselben Regeln, Batches und Zieldatenbank
+            target = DB_CONFIG.get('url') or f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+            checkpoint = LoadCheckpoint(checkpoint_path, checkpoint_key(
+                CSV_PATH, CACHE_NAMESPACE, RULES_VERSION, commit_size=commit_size, database=target))
+            if checkpoint.discarded:
+                print(f"Ladefortschritt '{checkpoint_path}' gehört zu einer anderen Eingabe und wird verworfen")
+        if run_crebas:
+            create_schema(CREBAS_PATH)
+            if checkpoint is not None:
+                checkpoint.clear()   # leere Tabellen: nichts fortzusetzen
+        if checkpoint is not None and checkpoint.resumed:
+            print(f"Ladefortschritt aus '{checkpoint_path}': committete Batches werden übersprungen")
+
+        if metrics_report or profile_stage:
+            metrics = RunMetrics('etl_process', profile_stage=profile_stage)
+
+        # Unveränderte CSV (gleicher Inhalt, gleiche Regelversion): Puffer aus dem Cache,
+        # Extraktion und Validierung entfallen - z.B. beim Wiederholen nach einem DB-Ausfall
+        cache_key = cache.key(CSV_PATH, CACHE_NAMESPACE, RULES_VERSION) if cache.enabled else None
+        with _stage('parse_cache'):
+            cached = cache.load(cache_key) if cache_key else None
+            if cached is not None:
+                restore_cache_frames(cached[0])
+        pipelined = None
+        if cached is not None:
+            print(f"Parse-Cache: '{CSV_PATH}' unverändert, Extraktion und Validierung übersprungen "
+                  f"(Eintrag vom {cached[1]['created']})")
+        elif pipeline:
+            # Die Fakten verlassen den Puffer nach jedem Batch, der Lauf wird daher nicht zwischengespeichert
+            pipelined = run_pipelined(flush_size, queue_size, options.get('batch_size') or BATCH_SIZE)
+            print_pipeline_report(pipelined)
+        else:
+            if workers > 1:
+                with _stage('run_parallel'):
+                    run_parallel(workers, shard_size, options.get('batch_size') or BATCH_SIZE)
+            else:
+                bonobo.run(
+                    get_graph(**options),
+                    services=get_services(**options)
+                )
+            if cache_key:
+                with _stage('parse_cache'):
+                    try:
+                        stored = cache.store(cache_key, cache_frames(), source=CSV_PATH)
+                    except ValueError:
+                        stored = False  # Puffer mit Überlaufwerten
+                if not stored:
+                    print("Parse-Cache: Ergebnis konnte nicht zwischengespeichert werden")
     
-    # Daten in Datenbank schreiben
-    write_to_database()
+    # Daten in Datenbank schreiben (im Pipeline-Modus bereits geschehen)
+    if pipelined is None:
+        with _stage('write_to_database'):
+            write_to_database(bulk=bulk, commit_size=commit_size, checkpoint=checkpoint)
     
     # Fehlerbericht erstellen
     write_error_report()
@@ -441,7 +1275,23 @@ if __name__ == '__main__':
     print(f"  • {len(orders)} Bestellungen")
     print(f"  • {len(product_categories)} Produktkategorien")
     print(f"  • {len(products)} Produkte")
-    print(f"  • {len(fact_sales)} Verkaufstransaktionen")
+    print(f"  • {len(fact_sales) if pipelined is None else pipelined['facts']} Verkaufstransaktionen")
+    print(f"\nSpeicherbedarf der Puffer:")
+    for line in memory_report(get_stores()):
+        print(line)
     print(f"\nFehler: {len(errors)} fehlerhafte Datensätze")
+    corrections = format_corrections()
+    if corrections:
+        print("\nKorrekturen der Referenzdaten (Ländercodes, Währungen):")
+        for line in corrections:
+            print(line)
+    
+    # Laufbericht schreiben
+    if metrics is not None:
+        metrics_report = metrics_report or 'etl_metrics.json'
+        metrics.write(metrics_report)
+        print(f"\nLaufbericht in '{metrics_report}' gespeichert")
+        if profile_stage:
+            print(f"cProfile der Stufe '{profile_stage}' in '{metrics.profile_path}' gespeichert")
     print("="*80 + "\n")
 
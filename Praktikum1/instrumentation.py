@@ -0,0 +1,198 @@
+"""
+Instrumentierung der ETL-Stufen für beide ETL-Skripte.
+
+Erfasst je Stufe Laufzeit, Aufrufe, Datensätze rein/raus, Datensätze pro
+Sekunde und den bisherigen Spitzenwert des Arbeitsspeichers (RSS), dazu die
+Datenbankzeit je Tabelle. Der Bericht wird als JSON geschrieben; optional
+wird eine Stufe mit cProfile aufgezeichnet.
+"""
+
+import cProfile
+import functools
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Bisheriger Spitzenwert des Arbeitsspeichers in MB (None, wenn nicht ermittelbar)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux liefert KB, macOS Bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _count(item):
+    """Anzahl Datensätze in einem Element: DataFrames zählen ihre Zeilen, sonst 1"""
+    return len(item) if hasattr(item, 'columns') else 1
+
+
+class StageRecord:
+    """Messwerte einer Stufe"""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.peak_rss_mb = None
+
+    def as_dict(self):
+        rows = self.rows_out or self.rows_in
+        return {
+            'calls': self.calls,
+            'seconds': round(self.seconds, 6),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'rows_per_second': round(rows / self.seconds, 1) if self.seconds and rows else None,
+            'peak_rss_mb': round(self.peak_rss_mb, 1) if self.peak_rss_mb is not None else None,
+        }
+
+
+class RunMetrics:
+    """
+    Sammelt Messwerte eines ETL-Laufs.
+
+    stage(name)     - Kontextmanager für einen Block (z.B. build_hubs, write_to_database)
+    node(func)      - umhüllt einen bonobo-Knoten (Generatorfunktion) und zählt Ein-/Ausgaben
+    db_time(...)    - Datenbankzeit und Zeilen je Tabelle
+    profile_stage   - Name der Stufe, die mit cProfile aufgezeichnet wird
+    """
+
+    def __init__(self, run_name, profile_stage=None, profile_path=None):
+        self.run_name = run_name
+        self.started = datetime.now()
+        self._start = time.perf_counter()
+        self.stages = {}
+        self.db_tables = {}
+        self.profile_stage = profile_stage
+        self.profile_path = profile_path or (f'{profile_stage}.prof' if profile_stage else None)
+        self._profiler = cProfile.Profile() if profile_stage else None
+        self._lock = threading.Lock()
+
+    def _record(self, name):
+        with self._lock:
+            return self.stages.setdefault(name, StageRecord())
+
+    def _profiling(self, name):
+        return self._profiler if name == self.profile_stage else None
+
+    @contextmanager
+    def stage(self, name, rows_in=0):
+        """Misst einen Block; über record.rows_out kann die Ausgabemenge gesetzt werden"""
+        record = self._record(name)
+        profiler = self._profiling(name)
+        if profiler:
+            profiler.enable()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = time.perf_counter() - started
+            if profiler:
+                profiler.disable()
+            with self._lock:
+                record.calls += 1
+                record.seconds += elapsed
+                record.rows_in += rows_in
+                record.peak_rss_mb = peak_rss_mb()
+
+    def node(self, func, name=None):
+        """
+        Umhüllt einen bonobo-Knoten. Gemessen wird nur die Zeit im Knoten selbst,
+        nicht die Zeit, in der nachfolgende Knoten ein ausgegebenes Element verarbeiten.
+        """
+        name = name or getattr(func, '__name__', None) or func.func.__name__
+        record = self._record(name)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = self._profiling(name)
+            elapsed = 0.0
+            rows_out = 0
+            started = time.perf_counter()
+            if profiler:
+                profiler.enable()
+            try:
+                for item in func(*args, **kwargs):
+                    if profiler:
+                        profiler.disable()
+                    elapsed += time.perf_counter() - started
+                    rows_out += _count(item)
+                    yield item
+                    started = time.perf_counter()
+                    if profiler:
+                        profiler.enable()
+                elapsed += time.perf_counter() - started
+            finally:
+                if profiler:
+                    profiler.disable()
+                with self._lock:
+                    record.calls += 1
+                    record.seconds += elapsed
+                    record.rows_in += sum(_count(a) for a in args)
+                    record.rows_out += rows_out
+                    record.peak_rss_mb = peak_rss_mb()
+
+        return wrapper
+
+    def db_time(self, table, seconds, rows=0):
+        """Datenbankzeit und geschriebene Zeilen für eine Tabelle addieren"""
+        with self._lock:
+            entry = self.db_tables.setdefault(table, {'seconds': 0.0, 'rows': 0})
+            entry['seconds'] += seconds
+            entry['rows'] += rows
+
+    def report(self):
+        """Bericht als dict (JSON-serialisierbar)"""
+        peak = peak_rss_mb()
+        report = {
+            'run': self.run_name,
+            'started': self.started.isoformat(timespec='seconds'),
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'total_seconds': round(time.perf_counter() - self._start, 6),
+            'peak_rss_mb': round(peak, 1) if peak is not None else None,
+            'stages': {name: record.as_dict() for name, record in self.stages.items()},
+            'db_tables': {
+                table: {
+                    'seconds': round(entry['seconds'], 6),
+                    'rows': entry['rows'],
+                    'rows_per_second': round(entry['rows'] / entry['seconds'], 1) if entry['seconds'] else None,
+                }
+                for table, entry in self.db_tables.items()
+            },
+        }
+        if self._profiler is not None:
+            report['profile'] = {'stage': self.profile_stage, 'path': self.profile_path,
+                                 'top': self._profile_summary()}
+        return report
+
+    def _profile_summary(self, limit=15):
+        """Die teuersten Funktionen der aufgezeichneten Stufe (kumulierte Zeit)"""
+        out = io.StringIO()
+        try:
+            stats = pstats.Stats(self._profiler, stream=out)
+        except TypeError:  # Stufe wurde nie ausgeführt
+            return []
+        stats.sort_stats('cumulative').print_stats(limit)
+        return [line for line in out.getvalue().splitlines() if line.strip()]
+
+    def write(self, path):
+        """Schreibt den JSON-Bericht und ggf. die cProfile-Daten"""
+        report = self.report()
+        if self._profiler is not None and report['profile']['top']:
+            self._profiler.dump_stats(self.profile_path)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        return report
@@ -0,0 +1,166 @@
+"""
+Ladefortschritt für lange Datenbank-Importe (Checkpoint/Resume).
+
+Statt alles in einer Transaktion zu laden, committen die ETL-Skripte jede
+Tabelle in Batches fester Größe. Nach jedem Commit wird der Stand in eine
+JSON-Datei geschrieben: je Einheit (Tabelle) die Nummer des letzten
+committeten Batches, die Zähler und eine Prüfsumme über die Schlüssel der
+bisher geladenen Zeilen. Die Datei wird unter einem temporären Namen
+geschrieben, mit fsync gesichert und erst dann umbenannt - nach einem Absturz
+liegt immer ein vollständiger Stand vor.
+
+Ein neuer Lauf mit derselben Eingabe (gleicher Schlüssel aus Dateiinhalt und
+Optionen) überspringt die committeten Batches. Stimmt die Prüfsumme der
+Schlüssel nicht mit der neu gelesenen Eingabe überein (z.B. andere
+Reihenfolge), wird die Tabelle von vorn geladen. Das ist unschädlich, weil
+alle Merges idempotent sind (ON CONFLICT DO NOTHING / Delta-Insert): stürzt
+ein Lauf zwischen Commit und Checkpoint ab, wird nur dieser Batch wiederholt.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from itertools import islice
+
+from parse_cache import file_digest
+
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_key(source_path, namespace, version, **options):
+    """Schlüssel aus Dateiinhalt, Namensraum (Skript), Version und allen Optionen, die die Batches bestimmen"""
+    parts = [namespace, str(CHECKPOINT_VERSION), str(version), file_digest(source_path)]
+    parts += [f'{name}={options[name]}' for name in sorted(options)]
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+
+def chain_digest(previous, keys):
+    """Prüfsumme nach einem Batch: SHA-256 über die Prüfsumme davor und die Schlüssel des Batches"""
+    digest = hashlib.sha256((previous or '').encode())
+    for key in keys:
+        digest.update(str(key).encode())
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def batches(rows, batch_size):
+    """Teilt einen Iterator in Listen zu batch_size Datensätzen"""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class LoadCheckpoint:
+    """
+    Ladefortschritt eines Laufs in einer JSON-Datei.
+
+    Eine vorhandene Datei mit anderem Schlüssel (andere Eingabe, andere
+    Batch-Größe, andere Datenbank) wird verworfen. Alle Methoden sind
+    threadsicher (Praktikum2 schreibt die Tabellen einer Stufe parallel).
+    """
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self._lock = threading.Lock()
+        self.units = {}
+        self.discarded = False
+        state = self._read()
+        if state is not None:
+            if state.get('key') == key:
+                self.units = state.get('units', {})
+            else:
+                self.discarded = True
+
+    def _read(self):
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None  # unlesbar: von vorn beginnen
+
+    def _write(self):
+        if not self.path:
+            return
+        temp = f'{self.path}.tmp-{os.getpid()}'
+        state = {'key': self.key, 'updated': time.strftime('%Y-%m-%dT%H:%M:%S'), 'units': self.units}
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)
+
+    @property
+    def resumed(self):
+        """True, wenn ein früherer Lauf bereits Batches committet hat"""
+        return any(unit['batches'] for unit in self.units.values())
+
+    def committed(self, unit):
+        """Anzahl der committeten Batches einer Einheit (0 = noch nichts geladen)"""
+        return self.units.get(unit, {}).get('batches', 0)
+
+    def digest(self, unit):
+        return self.units.get(unit, {}).get('digest')
+
+    def done(self, unit):
+        return self.units.get(unit, {}).get('done', False)
+
+    def counts(self, unit):
+        """Zähler der committeten Batches, z.B. {'inserted': ..., 'rejected': ...}"""
+        return dict(self.units.get(unit, {}).get('counts', {}))
+
+    def resume(self, unit, key_batches):
+        """
+        Wo eine Einheit fortgesetzt wird: (committete Batches, Prüfsumme).
+        key_batches liefert die Schlüssel der Eingabe batchweise; die ersten
+        Batches werden gegen die gespeicherte Prüfsumme geprüft. Passen sie
+        nicht, beginnt die Einheit von vorn: (0, None).
+        """
+        committed = self.committed(unit)
+        if not committed:
+            return 0, None
+        digest, seen = None, 0
+        for keys in islice(key_batches, committed):
+            digest = chain_digest(digest, keys)
+            seen += 1
+        if seen != committed or digest != self.digest(unit):
+            self.restart(unit)
+            return 0, None
+        return committed, digest
+
+    def record(self, unit, batch, digest, **counts):
+        """Nach dem Commit von Batch Nummer 'batch' (ab 1) aufrufen; die Zähler werden aufsummiert"""
+        with self._lock:
+            state = self.units.setdefault(unit, {'batches': 0, 'digest': None, 'done': False, 'counts': {}})
+            state['batches'] = batch
+            state['digest'] = digest
+            for name, value in counts.items():
+                state['counts'][name] = state['counts'].get(name, 0) + value
+            self._write()
+
+    def complete(self, unit):
+        """Einheit vollständig geladen"""
+        with self._lock:
+            state = self.units.setdefault(unit, {'batches': 0, 'digest': None, 'done': False, 'counts': {}})
+            state['done'] = True
+            self._write()
+
+    def restart(self, unit):
+        """Stand einer Einheit verwerfen (Prüfsumme passt nicht zur Eingabe)"""
+        with self._lock:
+            self.units.pop(unit, None)
+            self._write()
+
+    def clear(self):
+        """Lauf abgeschlossen (oder Schema neu angelegt): Datei entfernen"""
+        with self._lock:
+            self.units = {}
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,193 @@
+"""
+Lokaler Cache für geparste und validierte Eingabedateien (Parquet).
+
+Beide ETL-Skripte parsen und validieren bei jedem Lauf die komplette CSV-Datei,
+auch wenn sich die Datei nicht geändert hat und nur das Laden in die Datenbank
+fehlgeschlagen ist. Der Cache legt das Ergebnis als Parquet-Dateien ab.
+Schlüssel ist der SHA-256 des Dateiinhalts plus die Version der Regeln und
+alle Optionen, die das Ergebnis beeinflussen. Ein erneuter Lauf mit
+unveränderter Datei springt direkt zum Laden.
+
+Ein Eintrag ist ein Verzeichnis <cache_dir>/<schlüssel>/ mit einer
+<name>.parquet je DataFrame und meta.json. Einträge werden unter einem
+temporären Namen geschrieben und erst danach umbenannt, ein abgebrochener Lauf
+hinterlässt also keinen halben Eintrag. Verdrängt wird nach Alter und, wenn
+der Cache zu groß wird, nach letzter Benutzung.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from importlib.util import find_spec
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = '.parse_cache'
+DEFAULT_MAX_BYTES = 1024 ** 3       # 1 GB
+DEFAULT_MAX_AGE_DAYS = 30
+
+_BLOCK_SIZE = 1024 * 1024
+_TEMP_MARKER = '.tmp-'
+
+
+def file_digest(path):
+    """SHA-256 des Dateiinhalts (blockweise gelesen)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _dir_size(path):
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return size
+
+
+def errors_to_frame(errors):
+    """
+    Fehlereinträge {'row_num', 'data', 'errors', 'rules'} als DataFrame.
+    Meldungen, Regel-ids und 'data' werden als JSON abgelegt, Datums- und
+    Decimal-Werte als Text - wie im JSONL-Fehlerprotokoll (error_sink).
+    errors darf ein Iterator sein, er wird nur einmal durchlaufen.
+    """
+    row_nums, messages, rules, data = [], [], [], []
+    for e in errors:
+        row_nums.append(e['row_num'])
+        messages.append(json.dumps(e['errors'], ensure_ascii=False))
+        rules.append(json.dumps(e.get('rules', []), ensure_ascii=False))
+        data.append(json.dumps(e['data'], ensure_ascii=False, default=str))
+    return pd.DataFrame({
+        'row_num': pd.Series(row_nums, dtype='Int64'),
+        'errors': pd.Series(messages, dtype=object),
+        'rules': pd.Series(rules, dtype=object),
+        'data': pd.Series(data, dtype=object),
+    })
+
+
+def errors_from_frame(frame):
+    """Umkehrung von errors_to_frame"""
+    return [
+        {'row_num': int(row_num), 'data': json.loads(data), 'errors': json.loads(messages), 'rules': json.loads(rules)}
+        for row_num, messages, rules, data in zip(frame['row_num'], frame['errors'], frame['rules'], frame['data'])
+    ]
+
+
+class ParseCache:
+    """
+    Parquet-Cache mit inhaltsbasierten Schlüsseln.
+
+    enabled=False (z.B. --no-cache) oder ein fehlendes pyarrow schalten den
+    Cache ab: load() liefert dann immer None, store() schreibt nichts.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age_days=DEFAULT_MAX_AGE_DAYS, enabled=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.available = find_spec('pyarrow') is not None
+        self.enabled = enabled and self.available
+
+    def key(self, source_path, namespace, version, **options):
+        """Schlüssel aus Dateiinhalt, Namensraum (Skript), Regelversion und ergebnisrelevanten Optionen"""
+        parts = [namespace, str(version), file_digest(source_path)]
+        parts += [f'{name}={options[name]}' for name in sorted(options)]
+        digest = hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+        return f'{namespace}-{digest[:32]}'
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, key):
+        """(frames, meta) des Eintrags oder None, wenn er fehlt oder unlesbar ist"""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        meta_path = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            frames = {name: pd.read_parquet(os.path.join(path, f'{name}.parquet')) for name in meta['frames']}
+        except (OSError, ValueError, KeyError):
+            # Beschädigter Eintrag: verwerfen, der Lauf parst neu
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        os.utime(meta_path)  # zuletzt benutzt, für die Verdrängung
+        return frames, meta
+
+    def store(self, key, frames, **meta):
+        """
+        Legt einen Eintrag an (vorhandene mit gleichem Schlüssel werden ersetzt)
+        und verdrängt danach alte Einträge. Gibt False zurück, wenn die Frames
+        nicht geschrieben werden konnten - der Lauf geht dann ohne Cache weiter.
+        """
+        if not self.enabled:
+            return False
+        final = self._path(key)
+        temp = f'{final}{_TEMP_MARKER}{os.getpid()}'
+        try:
+            os.makedirs(temp, exist_ok=True)
+            for name, frame in frames.items():
+                frame.to_parquet(os.path.join(temp, f'{name}.parquet'))
+            meta = dict(meta, frames=list(frames), rows={name: len(frame) for name, frame in frames.items()},
+                        created=time.strftime('%Y-%m-%dT%H:%M:%S'))
+            with open(os.path.join(temp, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+            if os.path.exists(final):
+                shutil.rmtree(final)
+            os.replace(temp, final)
+        except (OSError, ValueError, TypeError):
+            shutil.rmtree(temp, ignore_errors=True)
+            return False
+        self.evict(keep=key)
+        return True
+
+    def entries(self):
+        """[(schlüssel, bytes, zuletzt benutzt)] aller Einträge, älteste zuerst"""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for key in os.listdir(self.directory):
+            path = self._path(key)
+            if not os.path.isdir(path):
+                continue
+            meta_path = os.path.join(path, 'meta.json')
+            used = os.path.getmtime(meta_path if os.path.exists(meta_path) else path)
+            entries.append((key, _dir_size(path), used))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self, keep=None):
+        """
+        Entfernt Einträge, die länger als max_age_days nicht benutzt wurden, und
+        danach die am längsten unbenutzten, bis der Cache unter max_bytes liegt.
+        Gibt die entfernten Schlüssel zurück.
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self.max_age_days * 86400
+        removed = []
+        for key, size, used in entries:
+            if key == keep:
+                continue
+            # Temporäre Verzeichnisse abgebrochener Läufe zählen wie alte Einträge
+            expired = used < cutoff or (_TEMP_MARKER in key and used < time.time() - 3600)
+            if expired or total > self.max_bytes:
+                shutil.rmtree(self._path(key), ignore_errors=True)
+                total -= size
+                removed.append(key)
+        return removed
+
+    def clear(self):
+        """Entfernt alle Einträge"""
+        shutil.rmtree(self.directory, ignore_errors=True)
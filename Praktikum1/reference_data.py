@@ -0,0 +1,179 @@
+"""
+Referenzdaten (Ländercodes, Währungen) für beide ETL-Skripte.
+
+Eine Tabelle je Merkmal: bekannte Schreibweisen -> Code, dazu die Ländernamen.
+Die Regeltabelle (validation_rules) von Praktikum1 und die Data-Vault-ETL von
+Praktikum2 normalisieren mit denselben Tabellen, vorher hatten beide eigene
+und voneinander abweichende Zuordnungen.
+
+Jede Tabelle wird einmal zu einer CodeMapping kompiliert: ein pd.Index der
+bereinigten Schreibweisen (ohne Leerzeichen, Großbuchstaben) und ein Array der
+Zielcodes. Eine Spalte wird faktorisiert, die wenigen eindeutigen Werte werden
+in einem Schritt über den Index nachgeschlagen und das Ergebnis über die
+Faktorisierungs-Codes auf alle Zeilen übertragen. Unbekannte Werte werden nur
+bereinigt. Jede Korrektur (Code weicht vom getrimmten Rohwert ab) wird je
+(Rohwert, Code) gezählt.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Schreibweisen -> ISO-Code. Vergleich ohne Leerzeichen und ohne Groß-/Kleinschreibung
+COUNTRY_ALIASES = {
+    'GER': 'DE',
+    'DEU': 'DE',
+    'USA': 'US',
+    'U.S.': 'US',
+    'UK': 'GB',
+    'FRA': 'FR',
+}
+
+COUNTRY_NAMES = {
+    'DE': 'Germany',
+    'US': 'United States',
+    'GB': 'United Kingdom',
+    'FR': 'France',
+}
+
+CURRENCY_ALIASES = {
+    '€': 'EUR',
+    'EURO': 'EUR',
+    '$': 'USD',
+    '£': 'GBP',
+}
+
+
+class CodeMapping:
+    """
+    Kompilierte Zuordnung Rohwert -> Code mit Zählern der Korrekturen.
+
+    normalize() bereinigt eine ganze Spalte, corrections_for() liefert je Zeile
+    nur die Korrekturen (für die Regeltabelle), correct() prüft einen
+    einzelnen Wert. Die Zähler sind threadsicher.
+    """
+
+    def __init__(self, name, aliases, names=None):
+        self.name = name
+        self.names = dict(names or {})
+        cleaned = {str(alias).strip().upper(): code for alias, code in aliases.items()}
+        self._aliases = pd.Index(list(cleaned), dtype=object)
+        self._targets = np.array(list(cleaned.values()) + [None], dtype=object)
+        self._scalar = {}
+        self._lock = threading.Lock()
+        self.corrections = {}       # (Rohwert, Code) -> Zeilen
+
+    def _canonical(self, uniques):
+        """Bereinigte Codes zu eindeutigen Rohwerten (ohne fehlende Werte)"""
+        cleaned = pd.Index(uniques, dtype=object).astype(str).str.strip().str.upper()
+        positions = self._aliases.get_indexer(cleaned)
+        return np.where(positions >= 0, self._targets[positions], cleaned.to_numpy(dtype=object))
+
+    def _lookup(self, values):
+        """(Faktorisierungs-Codes, eindeutige Rohwerte, Codes, korrigiert je eindeutigem Wert)"""
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        canonical = self._canonical(uniques)
+        stripped = pd.Index(uniques, dtype=object).astype(str).str.strip().to_numpy(dtype=object)
+        return codes, uniques, canonical, canonical != stripped
+
+    def _count(self, codes, uniques, canonical, corrected, rows=None):
+        if not corrected.any():
+            return
+        per_value = np.bincount(codes[codes >= 0] if rows is None else codes[rows & (codes >= 0)],
+                                minlength=len(uniques))
+        with self._lock:
+            for pos in np.flatnonzero(corrected & (per_value > 0)):
+                key = (str(uniques[pos]).strip(), canonical[pos])
+                self.corrections[key] = self.corrections.get(key, 0) + int(per_value[pos])
+
+    def normalize(self, values, count=True):
+        """Ganze Spalte bereinigen (Series oder Array); fehlende Werte bleiben None"""
+        codes, uniques, canonical, corrected = self._lookup(values)
+        if count:
+            self._count(codes, uniques, canonical, corrected)
+        mapped = np.append(canonical, None)     # Code -1 (fehlend) -> None
+        index = values.index if isinstance(values, pd.Series) else None
+        return pd.Series(mapped[codes], index=index, dtype=object)
+
+    def corrections_for(self, values, rows=None, count=True):
+        """
+        Je Zeile der korrigierte Code oder None, wenn der Wert schon stimmt.
+        rows (bool-Array) begrenzt Ergebnis und Zähler auf diese Zeilen,
+        count=False lässt die Zähler unverändert (reine Prüfläufe).
+        """
+        codes, uniques, canonical, corrected = self._lookup(values)
+        if count:
+            self._count(codes, uniques, canonical, corrected, rows)
+        per_value = np.append(np.where(corrected, canonical, None), None)
+        per_row = per_value[codes]
+        if rows is not None:
+            per_row[~np.asarray(rows)] = None
+        return per_row
+
+    def correct(self, value, count=True):
+        """Korrigierter Code eines einzelnen Werts oder None, wenn keine Korrektur nötig ist"""
+        if value is None:
+            return None
+        result = self._scalar.get(value, False)
+        if result is False:
+            stripped = value.strip()
+            code = self._canonical(np.array([value], dtype=object))[0]
+            result = code if code != stripped else None
+            self._scalar[value] = result
+        if result is not None and count:
+            with self._lock:
+                key = (value.strip(), result)
+                self.corrections[key] = self.corrections.get(key, 0) + 1
+        return result
+
+    def name_of(self, code, default=None):
+        """Name zu einem Code (z.B. Ländername)"""
+        return self.names.get(code, default)
+
+    def names_for(self, codes, fallback_to_code=False):
+        """Namen einer Code-Spalte; unbekannte Codes ergeben None bzw. den Code selbst"""
+        codes = pd.Series(codes, dtype=object)
+        names = codes.map(self.names).to_numpy(dtype=object)
+        unknown = pd.isna(names)
+        names[unknown] = codes.to_numpy()[unknown] if fallback_to_code else None
+        return pd.Series(names, index=codes.index, dtype=object)
+
+    def summary(self):
+        """[(Rohwert, Code, Zeilen)] absteigend nach Anzahl"""
+        return [(raw, code, rows) for (raw, code), rows
+                in sorted(self.corrections.items(), key=lambda item: (-item[1], item[0]))]
+
+
+COUNTRIES = CodeMapping('Country', COUNTRY_ALIASES, COUNTRY_NAMES)
+CURRENCIES = CodeMapping('Currency', CURRENCY_ALIASES)
+
+MAPPINGS = (COUNTRIES, CURRENCIES)
+
+
+def reset_counts():
+    for mapping in MAPPINGS:
+        with mapping._lock:
+            mapping.corrections = {}
+
+
+def snapshot_counts():
+    """Zähler aller Tabellen, z.B. aus einem Worker-Prozess an den Hauptprozess"""
+    return {mapping.name: dict(mapping.corrections) for mapping in MAPPINGS}
+
+
+def merge_counts(counts):
+    """Gegenstück zu snapshot_counts: Zähler eines anderen Prozesses aufaddieren"""
+    for mapping in MAPPINGS:
+        with mapping._lock:
+            for key, rows in counts.get(mapping.name, {}).items():
+                mapping.corrections[key] = mapping.corrections.get(key, 0) + rows
+
+
+def format_corrections():
+    """Korrekturen je Tabelle als Textzeilen (leer, wenn nichts korrigiert wurde)"""
+    lines = []
+    for mapping in MAPPINGS:
+        for raw, code, rows in mapping.summary():
+            lines.append(f"  {mapping.name:<10}'{raw}' -> '{code}': {rows:,} Zeilen")
+    return lines
@@ -0,0 +1,326 @@
+"""
+Validierungsregeln für die Global Bike Sales Data
+Regeltabelle und Validierungs-Engine, die von beiden ETL-Skripten genutzt werden:
+zeilenweise (validate_record) und spaltenweise über Datensatz-Batches (validate_columns, validate_batch)
+"""
+
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+import pandas as pd
+
+# Korrekturtabellen für Währungen und Ländercodes, gemeinsam mit Praktikum2
+from reference_data import COUNTRIES, CURRENCIES
+
+DATE_FORMAT = '%d.%m.%y'
+
+# Version der Regeln: bei jeder Änderung an RULES, den Korrekturtabellen (reference_data) oder
+# den Prüffunktionen erhöhen, damit zwischengespeicherte Ergebnisse (parse_cache) verfallen
+RULES_VERSION = 3
+
+# Regeltabelle: wird in dieser Reihenfolge angewendet, die Meldungen je Zeile
+# erscheinen in derselben Reihenfolge wie im zeilenweisen Ablauf
+RULES = [
+    {'id': 'currency_mapping', 'kind': 'mapping', 'field': 'Currency', 'mapping': CURRENCIES,
+     'message': "Zeile {row_num}: Währung '{value}' automatisch zu '{corrected}' korrigiert"},
+    {'id': 'country_mapping', 'kind': 'mapping', 'field': 'Country', 'mapping': COUNTRIES,
+     'message': "Zeile {row_num}: Ländercode '{value}' automatisch zu '{corrected}' korrigiert"},
+    {'id': 'required_ordernumber', 'kind': 'required', 'field': 'OrderNumber',
+     'message': "Zeile {row_num}: OrderNumber fehlt"},
+    {'id': 'required_orderitem', 'kind': 'required', 'field': 'OrderItem',
+     'message': "Zeile {row_num}: OrderItem fehlt"},
+    {'id': 'required_country', 'kind': 'required', 'field': 'Country',
+     'message': "Zeile {row_num}: Country fehlt"},
+    {'id': 'date_format', 'kind': 'date', 'field': 'Date', 'format': DATE_FORMAT, 'target': 'parsed_date',
+     'message': "Zeile {row_num}: Ungültiges Datumsformat '{value}'"},
+    {'id': 'numeric_customer', 'kind': 'numeric', 'field': 'Customer', 'type': 'int', 'required': True},
+    {'id': 'numeric_ordernumber', 'kind': 'numeric', 'field': 'OrderNumber', 'type': 'int', 'required': True},
+    {'id': 'numeric_salesquantity', 'kind': 'numeric', 'field': 'SalesQuantity', 'type': 'int', 'required': False},
+    {'id': 'numeric_revenue', 'kind': 'numeric', 'field': 'Revenue', 'type': 'decimal', 'required': False},
+    {'id': 'numeric_discount', 'kind': 'numeric', 'field': 'Discount', 'type': 'decimal', 'required': False},
+    {'id': 'numeric_revenueusd', 'kind': 'numeric', 'field': 'RevenueUSD', 'type': 'decimal', 'required': False},
+    {'id': 'numeric_discountusd', 'kind': 'numeric', 'field': 'DiscountUSD', 'type': 'decimal', 'required': False},
+    {'id': 'numeric_costsusd', 'kind': 'numeric', 'field': 'CostsUSD', 'type': 'decimal', 'required': False},
+    {'id': 'currency_length', 'kind': 'length', 'field': 'Currency', 'length': 3,
+     'message': "Zeile {row_num}: Ungültige Währung '{value}' (sollte 3-stelliger Code sein)"},
+    {'id': 'country_length', 'kind': 'length', 'field': 'Country', 'length': 2,
+     'message': "Zeile {row_num}: Ungültiger Ländercode '{value}' (sollte 2-stellig sein)"},
+]
+
+# Regel-id für Ausnahmen während der Prüfung eines Datensatzes
+UNEXPECTED_RULE = 'unexpected'
+
+NUMERIC_MESSAGE = "Zeile {row_num}: {field} hat ungültigen Wert '{value}'"
+NUMERIC_EMPTY_MESSAGE = "Zeile {row_num}: {field} fehlt oder ist leer"
+
+# Felder, die von den Regeln gelesen werden
+RULE_FIELDS = list(dict.fromkeys(rule['field'] for rule in RULES))
+
+_NUMERIC_TYPES = {'int': int, 'decimal': Decimal}
+
+
+def _check_mapping(value, rule, count=True):
+    """Gibt den korrigierten Wert zurück oder None, wenn keine Korrektur nötig ist"""
+    return rule['mapping'].correct(value, count)
+
+
+def _check_date(value, rule):
+    """Gibt das geparste Datum zurück oder None bei ungültigem Format"""
+    try:
+        return datetime.strptime(value, rule['format'])
+    except ValueError:
+        return None
+
+
+def _check_numeric(value, rule):
+    """Gibt (Wert, Status) zurück, Status ist 'ok', 'empty' oder 'invalid'"""
+    value = value.strip()
+    if not value:
+        return None, 'empty'
+    try:
+        if rule['type'] == 'decimal':
+            value = value.replace(',', '.')
+        return _NUMERIC_TYPES[rule['type']](value), 'ok'
+    except (ValueError, InvalidOperation):
+        return None, 'invalid'
+
+
+def _check_length(value, rule):
+    """Gibt den getrimmten Wert zurück, wenn er die falsche Länge hat, sonst None"""
+    value = value.strip()
+    if value and len(value) != rule['length']:
+        return value
+    return None
+
+
+def validate_record(row, rule_ids=None, count=True):
+    """
+    Wendet die Regeltabelle auf einen einzelnen Datensatz an.
+    Korrigiert und ergänzt den Datensatz (parsed_*-Felder) und gibt die Fehlermeldungen zurück.
+    Ist rule_ids eine Liste, wird je Meldung die id der auslösenden Regel angehängt.
+    count=False zählt die Korrekturen nicht in den Referenzdaten mit (reine Prüfläufe).
+    """
+    row_num = row['_row_num']
+    error_messages = []
+
+    for rule in RULES:
+        found = len(error_messages)
+        field = rule['field']
+        kind = rule['kind']
+
+        if kind == 'mapping':
+            value = row.get(field, '')
+            corrected = _check_mapping(value, rule, count)
+            if corrected is not None:
+                row[field] = corrected
+                error_messages.append(rule['message'].format(row_num=row_num, value=value.strip(), corrected=corrected))
+
+        elif kind == 'required':
+            if not row.get(field):
+                error_messages.append(rule['message'].format(row_num=row_num))
+
+        elif kind == 'date':
+            value = row.get(field, '')
+            row[rule['target']] = _check_date(value, rule)
+            if row[rule['target']] is None:
+                error_messages.append(rule['message'].format(row_num=row_num, value=value))
+
+        elif kind == 'numeric':
+            parsed, status = _check_numeric(row.get(field, ''), rule)
+            row[f'parsed_{field}'] = parsed
+            if status == 'invalid':
+                error_messages.append(NUMERIC_MESSAGE.format(row_num=row_num, field=field, value=row.get(field)))
+            elif status == 'empty' and rule['required']:
+                error_messages.append(NUMERIC_EMPTY_MESSAGE.format(row_num=row_num, field=field))
+
+        elif kind == 'length':
+            value = _check_length(row.get(field, ''), rule)
+            if value is not None:
+                error_messages.append(rule['message'].format(row_num=row_num, value=value))
+
+        if rule_ids is not None:
+            rule_ids.extend([rule['id']] * (len(error_messages) - found))
+
+    return error_messages
+
+
+def _evaluate_uniques(column, check, rule):
+    """
+    Wertet eine Prüfung nur einmal je eindeutigem Wert einer Spalte aus.
+    Gibt (Codes je Zeile, Ergebnisse je eindeutigem Wert als Objekt-Array) zurück.
+    """
+    codes, uniques = pd.factorize(column.to_numpy(dtype=object))
+    results = np.empty(len(uniques), dtype=object)
+    results[:] = [check(value, rule) for value in uniques]
+    return codes, results
+
+
+def validate_columns(frame, row_nums, count=True):
+    """
+    Wendet die Regeltabelle spaltenweise auf einen Batch von Rohdatensätzen an.
+    Jede Regel wird nur einmal je eindeutigem Spaltenwert ausgewertet und über
+    die Faktorisierungs-Codes auf alle Zeilen übertragen.
+
+    frame:    DataFrame mit den CSV-Spalten als Strings (None für fehlende Felder)
+    row_nums: Zeilennummern der Datensätze in der Quelldatei
+    count:    False, wenn die Korrekturen nicht in den Referenzdaten gezählt werden sollen
+              (reiner Prüflauf, die Daten werden an anderer Stelle normalisiert)
+
+    Gibt (validated, errors) zurück: validated enthält die korrigierten CSV-Spalten,
+    '_row_num' und die parsed_*-Spalten (Objekt-Spalten, Werte wie bei validate_record,
+    fehlende als None), errors die Fehlereinträge {'row_num', 'data', 'errors', 'rules'}
+    mit der id der auslösenden Regel je Meldung in 'rules'. Datensätze als Dicts
+    entstehen nur für die Zeilen mit Fehlermeldungen.
+    """
+    frame = frame.reset_index(drop=True).astype(object)
+    missing = frame.isna()
+    if missing.to_numpy().any():
+        frame = frame.mask(missing, None)
+    row_nums = np.asarray(row_nums)
+    n = len(frame)
+
+    # Datensätze mit fehlenden Feldern (None) werden einzeln validiert,
+    # damit auch Sonderfälle exakt wie im zeilenweisen Ablauf behandelt werden
+    if all(field in frame.columns for field in RULE_FIELDS):
+        single = missing[RULE_FIELDS].any(axis=1).to_numpy()
+    else:
+        single = np.ones(n, dtype=bool)
+    batch = ~single
+
+    messages = []     # (Position, Regelindex, Meldung)
+    parsed = {}
+
+    for rule_index, rule in enumerate(RULES):
+        field = rule['field']
+        kind = rule['kind']
+        if field in frame.columns:
+            column = frame[field].where(batch, '')
+        else:
+            column = pd.Series([''] * n, dtype=object)
+
+        if kind == 'mapping':
+            # Kompilierte Referenztabelle: ein Nachschlagen je eindeutigem Wert, gezählt nur im Batch
+            per_row = rule['mapping'].corrections_for(column, batch, count)
+            hit = np.flatnonzero(pd.notna(per_row))
+            values = column.to_numpy()
+            for pos in hit:
+                messages.append((pos, rule_index, rule['message'].format(
+                    row_num=row_nums[pos], value=values[pos].strip(), corrected=per_row[pos])))
+            frame.loc[hit, field] = per_row[hit]
+
+        elif kind == 'required':
+            hit = np.flatnonzero((column == '').to_numpy() & batch)
+            for pos in hit:
+                messages.append((pos, rule_index, rule['message'].format(row_num=row_nums[pos])))
+
+        elif kind == 'date':
+            codes, dates = _evaluate_uniques(column, _check_date, rule)
+            per_row = dates[codes]
+            parsed[rule['target']] = per_row
+            values = column.to_numpy()
+            for pos in np.flatnonzero(pd.isna(per_row) & batch):
+                messages.append((pos, rule_index, rule['message'].format(row_num=row_nums[pos], value=values[pos])))
+
+        elif kind == 'numeric':
+            codes, results = _evaluate_uniques(column, _check_numeric, rule)
+            numbers = np.empty(len(results), dtype=object)
+            numbers[:] = [value for value, _ in results]
+            status = np.array([state for _, state in results], dtype=object)
+            parsed[f'parsed_{field}'] = numbers[codes]
+            row_status = status[codes] if len(status) else np.empty(0, dtype=object)
+            raw = frame[field].to_numpy()
+            for pos in np.flatnonzero((row_status == 'invalid') & batch):
+                messages.append((pos, rule_index, NUMERIC_MESSAGE.format(
+                    row_num=row_nums[pos], field=field, value=raw[pos])))
+            if rule['required']:
+                for pos in np.flatnonzero((row_status == 'empty') & batch):
+                    messages.append((pos, rule_index, NUMERIC_EMPTY_MESSAGE.format(
+                        row_num=row_nums[pos], field=field)))
+
+        elif kind == 'length':
+            codes, flagged = _evaluate_uniques(column, _check_length, rule)
+            per_row = flagged[codes]
+            for pos in np.flatnonzero(pd.notna(per_row) & batch):
+                messages.append((pos, rule_index, rule['message'].format(row_num=row_nums[pos], value=per_row[pos])))
+
+    # Datensätze aufbauen: Rohspalten, Zeilennummer und geparste Werte
+    columns = list(frame.columns)
+    raw_values = frame.to_numpy()
+    parsed_items = list(parsed.items())
+    built = {}
+
+    def record_at(pos):
+        record = built.get(pos)
+        if record is None:
+            record = dict(zip(columns, raw_values[pos]))
+            record['_row_num'] = row_nums[pos].item() if hasattr(row_nums[pos], 'item') else row_nums[pos]
+            if batch[pos]:
+                for name, values in parsed_items:
+                    record[name] = values[pos]
+            built[pos] = record
+        return record
+
+    errors = []
+    by_row = {}
+    rules_by_row = {}
+    for pos, rule_index, message in sorted(messages, key=lambda m: (m[0], m[1])):
+        by_row.setdefault(pos, []).append(message)
+        rules_by_row.setdefault(pos, []).append(RULES[rule_index]['id'])
+
+    for pos in np.flatnonzero(single):
+        rules_by_row[pos] = []
+        try:
+            by_row[pos] = validate_record(record_at(pos), rules_by_row[pos], count)
+        except Exception as e:
+            by_row[pos] = [f"Unerwarteter Fehler: {str(e)}"]
+            rules_by_row[pos] = [UNEXPECTED_RULE]
+
+    for pos in sorted(by_row):
+        if by_row[pos]:
+            record = record_at(pos)
+            errors.append({
+                'row_num': record['_row_num'],
+                'data': record,
+                'errors': by_row[pos],
+                'rules': rules_by_row[pos]
+            })
+
+    # Ergebnis spaltenweise; einzeln validierte Datensätze überschreiben ihre Zeile
+    validated = frame
+    validated['_row_num'] = row_nums
+    for name, values in parsed_items:
+        validated[name] = pd.Series(values, index=validated.index, dtype=object)
+    single_positions = np.flatnonzero(single)
+    if len(single_positions):
+        names = list(validated.columns)
+        validated.iloc[single_positions] = pd.DataFrame(
+            [[record_at(pos).get(name) for name in names] for pos in single_positions],
+            columns=names, dtype=object).to_numpy()
+    return validated, errors
+
+
+def validate_batch(frame, row_nums, with_records=True, count=True):
+    """
+    validate_columns mit dem Ergebnis als Dicts (identisch zu validate_record),
+    with_records=False liefert nur die Fehlereinträge: (records oder None, errors).
+    Für große Batches validate_columns verwenden, die Dicts kosten mehr als die Prüfung.
+    """
+    validated, errors = validate_columns(frame, row_nums, count)
+    records = validated.to_dict('records') if with_records else None
+    return records, errors
+
+
+def write_validation_report(errors, path, title='Global Bike Sales Data ETL'):
+    """Schreibt Fehlereinträge im Format von 'fehlerhafte_datensaetze.txt'"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"FEHLERBERICHT - {title}\n")
+        f.write("="*80 + "\n\n")
+        f.write(f"Anzahl fehlerhafter Datensätze: {len(errors)}\n\n")
+
+        for error in errors:
+            f.write(f"\nZeile {error['row_num']}:\n")
+            f.write("-" * 40 + "\n")
+            for err_msg in error['errors']:
+                f.write(f"  • {err_msg}\n")
+            f.write(f"  Daten: {error['data']}\n\n")
@@ -111,7 +111,7 @@ drop table if exists SatSalesOrg cascade;
 /* Table: HubCountry                                            */
 /*==============================================================*/
 create table HubCountry (
-   hubCountryId         INT4                 not null,
+   hubCountryId         INT8                 not null,
    loadDate             DATE                 null,
    sourceSystem         VARCHAR(254)         null,
    countryCode          VARCHAR(254)         null,
@@ -129,7 +129,7 @@ hubCountryId
 /* Table: HubCustomer                                           */
 /*==============================================================*/
 create table HubCustomer (
-   hubCustomerId        INT4                 not null,
+   hubCustomerId        INT8                 not null,
    loadDate             DATE                 null,
    sourceSystem         VARCHAR(254)         null,
    customerID           VARCHAR(254)         null,
@@ -147,7 +147,7 @@ hubCustomerId
 /* Table: HubDate                                               */
 /*==============================================================*/
 create table HubDate (
-   hubDateId            INT4                 not null,
+   hubDateId            INT8                 not null,
    loadDate             DATE                 null,
    sourceSystem         VARCHAR(254)         null,
    date                 INT4                 null,
@@ -165,7 +165,7 @@ hubDateId
 /* Table: HubFactSales                                          */
 /*==============================================================*/
 create table HubFactSales (
-   hubFactSalesId       INT4                 not null,
+   hubFactSalesId       INT8                 not null,
    loadDate             DATE                 null,
    sourceSystem         VARCHAR(254)         null,
    orderItem            INT4                 null,
@@ -184,7 +184,7 @@ hubFactSalesId
 /* Table: HubProduct                                            */
 /*==============================================================*/
 create table HubProduct (
-   hubProductId         INT4                 not null,
+   hubProductId         INT8                 not null,
    loadDate             DATE                 null,
    sourceSystem         VARCHAR(254)         null,
    productID            VARCHAR(254)         null,
@@ -202,7 +202,7 @@ hubProductId
 /* Table: HubProductCategory                                    */
 /*==============================================================*/
 create table HubProductCategory (
-   hubProductCategoryId INT4                 not null,
+   hubProductCategoryId INT8                 not null,
    loadDate             DATE                 null,
    sourceSystem         VARCHAR(254)         null,
    productCatID         VARCHAR(254)         null,
@@ -220,7 +220,7 @@ hubProductCategoryId
 /* Table: HubSalesOrg                                           */
 /*==============================================================*/
 create table HubSalesOrg (
-   hubSalesOrgId        INT4                 not null,
+   hubSalesOrgId        INT8                 not null,
    loadDate             DATE                 null,
    sourceSystem         VARCHAR(254)         null,
    salesOrg             VARCHAR(254)         null,
@@ -238,8 +238,8 @@ hubSalesOrgId
 /* Table: LinkCustomerCountry                                   */
 /*==============================================================*/
 create table LinkCustomerCountry (
-   hubCountryId         INT4                 not null,
-   hubCustomerId        INT4                 not null,
+   hubCountryId         INT8                 not null,
+   hubCustomerId        INT8                 not null,
    loadDate             DATE                 null,
    sourceSystem         VARCHAR(254)         null
 );
@@ -262,12 +262,12 @@ hubCountryId
 /* Table: LinkFactSales                                         */
 /*==============================================================*/
 create table LinkFactSales (
-   hubProductId         INT4                 not null,
-   hubCustomerId        INT4                 not null,
-   hubDateId            INT4                 not null,
-   hubFactSalesId       INT4                 not null,
-   hubProductCategoryId INT4                 not null,
-   hubSalesOrgId        INT4                 not null,
+   hubProductId         INT8                 not null,
+   hubCustomerId        INT8                 not null,
+   hubDateId            INT8                 not null,
+   hubFactSalesId       INT8                 not null,
+   hubProductCategoryId INT8                 not null,
+   hubSalesOrgId        INT8                 not null,
    loadDate             DATE                 null,
    sourceSystem         VARCHAR(254)         null
 );
@@ -318,8 +318,8 @@ hubSalesOrgId
 /* Table: LinkProductProductCategory                            */
 /*==============================================================*/
 create table LinkProductProductCategory (
-   hubProductId         INT4                 not null,
-   hubProductCategoryId INT4                 not null,
+   hubProductId         INT8                 not null,
+   hubProductCategoryId INT8                 not null,
    loadDate             DATE                 null,
    sourceSystem         VARCHAR(254)         null
 );
@@ -342,8 +342,8 @@ hubProductId
 /* Table: LinkSalesOrgCountry                                   */
 /*==============================================================*/
 create table LinkSalesOrgCountry (
-   hubCountryId         INT4                 not null,
-   hubSalesOrgId        INT4                 not null,
+   hubCountryId         INT8                 not null,
+   hubSalesOrgId        INT8                 not null,
    loadDate             DATE                 null,
    sourceSystem         VARCHAR(254)         null
 );
@@ -367,8 +367,9 @@ hubCountryId
 /*==============================================================*/
 create table SatCountry (
    loadDate             DATE                 not null,
-   hubCountryId         INT4                 not null,
+   hubCountryId         INT8                 not null,
    countryName          VARCHAR(254)         null,
+   hashDiff             CHAR(32)             null,
    constraint PK_SATCOUNTRY primary key (loadDate, hubCountryId)
 );
 
@@ -392,9 +393,10 @@ hubCountryId
 /*==============================================================*/
 create table SatCustomer (
    loadDate             DATE                 not null,
-   hubCustomerId        INT4                 not null,
+   hubCustomerId        INT8                 not null,
    custDescr            VARCHAR(254)         null,
    city                 VARCHAR(254)         null,
+   hashDiff             CHAR(32)             null,
    constraint PK_SATCUSTOMER primary key (loadDate, hubCustomerId)
 );
 
@@ -418,10 +420,11 @@ hubCustomerId
 /*==============================================================*/
 create table SatDate (
    loadDate             DATE                 not null,
-   hubDateId            INT4                 not null,
+   hubDateId            INT8                 not null,
    year                 INT4                 null,
    month                INT4                 null,
    day                  INT4                 null,
+   hashDiff             CHAR(32)             null,
    constraint PK_SATDATE primary key (loadDate, hubDateId)
 );
 
@@ -445,7 +448,7 @@ hubDateId
 /*==============================================================*/
 create table SatFactSales (
    loadDate             DATE                 not null,
-   hubFactSalesId       INT4                 not null,
+   hubFactSalesId       INT8                 not null,
    salesQuantity        INT4                 null,
    UnitOfMeasure        VARCHAR(254)         null,
    RevenueUSD           NUMERIC              null,
@@ -454,8 +457,16 @@ create table SatFactSales (
    Revenue              NUMERIC              null,
    Discount             NUMERIC              null,
    currency             VARCHAR(254)         null,
+   hashDiff             CHAR(32)             null,
    constraint PK_SATFACTSALES primary key (loadDate, hubFactSalesId)
-);
+) partition by range (loadDate);
+
+/*==============================================================*/
+/* Partitions: SatFactSales                                     */
+/* Monthly partitions are added before each load                */
+/* (schema_management.ensure_partitions)                        */
+/*==============================================================*/
+create table SatFactSales_default partition of SatFactSales default;
 
 /*==============================================================*/
 /* Index: SATFACTSALES_PK                                       */
@@ -477,9 +488,10 @@ hubFactSalesId
 /*==============================================================*/
 create table SatProduct (
    loadDate             DATE                 not null,
-   hubProductId         INT4                 not null,
+   hubProductId         INT8                 not null,
    prodDescr            VARCHAR(254)         null,
    divisionCode         VARCHAR(254)         null,
+   hashDiff             CHAR(32)             null,
    constraint PK_SATPRODUCT primary key (loadDate, hubProductId)
 );
 
@@ -504,7 +516,8 @@ hubProductId
 create table SatProductCategory (
    catDescr             VARCHAR(254)         not null,
    loadDate             DATE                 not null,
-   hubProductCategoryId INT4                 not null,
+   hubProductCategoryId INT8                 not null,
+   hashDiff             CHAR(32)             null,
    constraint PK_SATPRODUCTCATEGORY primary key (loadDate, hubProductCategoryId)
 );
 
@@ -528,7 +541,8 @@ hubProductCategoryId
 /*==============================================================*/
 create table SatSalesOrg (
    loadDate             DATE                 not null,
-   hubSalesOrgId        INT4                 not null,
+   hubSalesOrgId        INT8                 not null,
+   hashDiff             CHAR(32)             null,
    constraint PK_SATSALESORG primary key (loadDate, hubSalesOrgId)
 );
 
@@ -4,6 +4,11 @@
 /* Transforms normalized Data Vault into denormalized Star Schema */
 /*==============================================================*/
 
+-- Satellites keep one row per change (hashDiff delta load), every LEFT JOIN
+-- below picks the latest version per hub key.
+-- For daily loads use mart_refresh.py, which only upserts rows whose
+-- satellites changed since the last refresh. This script is its --full mode.
+
 -- Truncate mart tables before loading
 TRUNCATE TABLE FactSales CASCADE;
 TRUNCATE TABLE DimDate CASCADE;
@@ -15,6 +20,9 @@ TRUNCATE TABLE DimProduct CASCADE;
 /*==============================================================*/
 /* Load DimDate                                                 */
 /*==============================================================*/
+-- The attributes come from the Calendar table (Praktikum1/calendar_dim.py),
+-- loaded by mart_refresh.py before this script runs: one join on the
+-- YYYYMMDD key instead of parsing and formatting every date here.
 INSERT INTO DimDate (
     DateKey,
     Date,
@@ -27,22 +35,19 @@ INSERT INTO DimDate (
     DayName,
     IsWeekend
 )
-SELECT DISTINCT
+SELECT
     h.hubDateId AS DateKey,
-    TO_DATE(h.date::TEXT, 'YYYYMMDD') AS Date,
-    COALESCE(s.year, EXTRACT(YEAR FROM TO_DATE(h.date::TEXT, 'YYYYMMDD'))) AS Year,
-    COALESCE(s.month, EXTRACT(MONTH FROM TO_DATE(h.date::TEXT, 'YYYYMMDD'))) AS Month,
-    COALESCE(s.day, EXTRACT(DAY FROM TO_DATE(h.date::TEXT, 'YYYYMMDD'))) AS Day,
-    CEIL(COALESCE(s.month, EXTRACT(MONTH FROM TO_DATE(h.date::TEXT, 'YYYYMMDD')))::NUMERIC / 3) AS Quarter,
-    TO_CHAR(TO_DATE(h.date::TEXT, 'YYYYMMDD'), 'Month') AS MonthName,
-    EXTRACT(DOW FROM TO_DATE(h.date::TEXT, 'YYYYMMDD')) AS DayOfWeek,
-    TO_CHAR(TO_DATE(h.date::TEXT, 'YYYYMMDD'), 'Day') AS DayName,
-    CASE WHEN EXTRACT(DOW FROM TO_DATE(h.date::TEXT, 'YYYYMMDD')) IN (0, 6) 
-         THEN TRUE 
-         ELSE FALSE 
-    END AS IsWeekend
+    c.Date,
+    c.Year,
+    c.Month,
+    c.Day,
+    c.Quarter,
+    c.MonthName,
+    c.DayOfWeek,
+    c.DayName,
+    c.IsWeekend
 FROM HubDate h
-LEFT JOIN SatDate s ON h.hubDateId = s.hubDateId
+JOIN Calendar c ON c.DateKey = h.date
 WHERE h.date IS NOT NULL;
 
 /*==============================================================*/
@@ -58,7 +63,7 @@ SELECT DISTINCT
     h.countryCode AS CountryCode,
     COALESCE(s.countryName, h.countryCode) AS CountryName
 FROM HubCountry h
-LEFT JOIN SatCountry s ON h.hubCountryId = s.hubCountryId
+LEFT JOIN (SELECT DISTINCT ON (hubCountryId) * FROM SatCountry ORDER BY hubCountryId, loadDate DESC) s ON h.hubCountryId = s.hubCountryId
 WHERE h.countryCode IS NOT NULL;
 
 /*==============================================================*/
@@ -89,7 +94,7 @@ SELECT DISTINCT
     COALESCE(scust.custDescr, 'Unknown') AS CustomerName,
     COALESCE(scust.city, 'Unknown') AS City
 FROM HubCustomer hcust
-LEFT JOIN SatCustomer scust ON hcust.hubCustomerId = scust.hubCustomerId
+LEFT JOIN (SELECT DISTINCT ON (hubCustomerId) * FROM SatCustomer ORDER BY hubCustomerId, loadDate DESC) scust ON hcust.hubCustomerId = scust.hubCustomerId
 WHERE hcust.customerID IS NOT NULL;
 
 /*==============================================================*/
@@ -113,8 +118,8 @@ SELECT DISTINCT
 FROM HubProduct hp
 INNER JOIN LinkProductProductCategory lppc ON hp.hubProductId = lppc.hubProductId
 INNER JOIN HubProductCategory hpc ON lppc.hubProductCategoryId = hpc.hubProductCategoryId
-LEFT JOIN SatProduct sp ON hp.hubProductId = sp.hubProductId
-LEFT JOIN SatProductCategory spc ON hpc.hubProductCategoryId = spc.hubProductCategoryId
+LEFT JOIN (SELECT DISTINCT ON (hubProductId) * FROM SatProduct ORDER BY hubProductId, loadDate DESC) sp ON hp.hubProductId = sp.hubProductId
+LEFT JOIN (SELECT DISTINCT ON (hubProductCategoryId) * FROM SatProductCategory ORDER BY hubProductCategoryId, loadDate DESC) spc ON hpc.hubProductCategoryId = spc.hubProductCategoryId
 WHERE hp.productID IS NOT NULL;
 
 /*==============================================================*/
@@ -141,7 +146,9 @@ INSERT INTO FactSales (
     GrossProfit,
     GrossProfitMargin
 )
-SELECT
+-- One row per order line: a sales org linked to several countries resolves
+-- to the lowest country key
+SELECT DISTINCT ON (hfs.orderNumber, hfs.orderItem)
     lfs.hubDateId AS DateKey,
     lfs.hubCustomerId AS CustomerKey,
     lfs.hubProductId AS ProductKey,
@@ -171,13 +178,13 @@ SELECT
 FROM LinkFactSales lfs
 INNER JOIN HubFactSales hfs ON lfs.hubFactSalesId = hfs.hubFactSalesId
 INNER JOIN LinkSalesOrgCountry lsoc ON lfs.hubSalesOrgId = lsoc.hubSalesOrgId
-LEFT JOIN SatFactSales sfs ON hfs.hubFactSalesId = sfs.hubFactSalesId
+LEFT JOIN (SELECT DISTINCT ON (hubFactSalesId) * FROM SatFactSales ORDER BY hubFactSalesId, loadDate DESC) sfs ON hfs.hubFactSalesId = sfs.hubFactSalesId
 WHERE lfs.hubDateId IS NOT NULL
   AND lfs.hubCustomerId IS NOT NULL
   AND lfs.hubProductId IS NOT NULL
   AND lfs.hubSalesOrgId IS NOT NULL
   AND lsoc.hubCountryId IS NOT NULL
-ORDER BY hfs.orderNumber, hfs.orderItem;
+ORDER BY hfs.orderNumber, hfs.orderItem, lsoc.hubCountryId;
 
 /*==============================================================*/
 /* Data Quality Checks                                          */
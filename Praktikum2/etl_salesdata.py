@@ -1,293 +1,870 @@
 import argparse
+import hashlib
+import io
 import os
+import re
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import date
 from urllib.parse import quote_plus
 
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, text
-
-
-def normalize_country_code(raw: str) -> str:
-    """Normalize country codes to 2-letter format (DE, US)."""
-    if pd.isna(raw):
-        return None
-    s = str(raw).strip().upper()
-    mapping = {
-        'GER': 'DE',
-        'DEU': 'DE',
-        'DE': 'DE',
-        'USA': 'US',
-        'U.S.': 'US',
-        'US': 'US',
-    }
-    return mapping.get(s, s)
+from sqlalchemy import text
 
+# Shared modules (validation rules, ...) live next to the Praktikum1 ETL
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Praktikum1'))
+
+from validation_rules import RULES_VERSION, validate_batch, write_validation_report  # noqa: E402
+from instrumentation import RunMetrics, StageRecord  # noqa: E402
+from calendar_dim import date_keys  # noqa: E402
+from parse_cache import DEFAULT_CACHE_DIR, ParseCache, errors_from_frame, errors_to_frame  # noqa: E402
+from schema_management import indexes_dropped, prepare_schema  # noqa: E402
+from storage_backend import create_engine  # noqa: E402
+from load_checkpoint import LoadCheckpoint, chain_digest, checkpoint_key  # noqa: E402
+from reference_data import COUNTRIES, CURRENCIES, MAPPINGS  # noqa: E402
+
+# Stages recorded by the run report (--metrics-report / --profile-stage)
+PROFILE_STAGES = ('read_csv', 'build_hubs', 'build_links', 'build_sats', 'write_tables')
+
+
+def _md5_bigint(value) -> int:
+    """First 8 bytes of the MD5 digest as signed BIGINT."""
+    digest = hashlib.md5(value.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+def _hash_values(values) -> np.ndarray:
+    """Hash keys for distinct business key values (missing -> 0)."""
+    return np.array([0 if pd.isna(v) else _md5_bigint(str(v).strip().upper()) for v in values], dtype=np.int64)
 
-def country_name_from_code(code: str) -> str:
-    """Map 2-letter country code to full name."""
-    if code is None:
-        return None
-    names = {
-        'DE': 'Germany',
-        'US': 'United States',
-    }
-    return names.get(code, code)
-
-
-def normalize_currency(raw: str) -> str:
-    """Normalize currency: EUR/€ -> EUR, USD -> USD."""
-    if pd.isna(raw):
-        return None
-    s = str(raw).strip().upper()
-    euro_aliases = {'EUR', '€', 'EURO'}
-    if s in euro_aliases:
-        return 'EUR'
-    if s == 'USD':
-        return 'USD'
-    return s
-
-
-def run_sql_file(engine, sql_path: str):
-    """Execute all statements in a SQL file."""
-    with open(sql_path, 'r', encoding='utf-8') as f:
-        sql_text = f.read()
-    statements = [stmt.strip() for stmt in sql_text.split(';') if stmt.strip()]
-    with engine.begin() as conn:
-        for stmt in statements:
-            conn.execute(text(stmt))
 
+def hash_key(series: pd.Series) -> pd.Series:
+    """Data Vault 2.0 hash key of a business key column.
 
-def factorize_series(series: pd.Series, start: int = 1) -> pd.Series:
-    """Assign stable integer IDs to unique values in a series."""
-    codes, uniques = pd.factorize(series, sort=True)
-    return pd.Series(codes + start, index=series.index)
+    The key is trimmed and upper-cased before hashing, so the same business
+    key always yields the same BIGINT across runs and files. Missing keys
+    map to 0. Each distinct value is hashed only once.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    return pd.Series(_hash_values(uniques)[codes], index=series.index)
 
 
-def build_hubs(df: pd.DataFrame) -> dict:
+class KeyRegistry:
+    """Business keys of one source frame, resolved to hub hash keys once.
+
+    Each hub's key column is factorized a single time: codes[hub] is aligned
+    with the frame rows, uniques[hub] holds the distinct business keys in
+    order of first appearance (missing values included) and ids[hub] their
+    hash keys. Hubs, links and satellites pick ids by position instead of
+    merging on string keys.
+
+    The derived columns CountryCodeNorm, DateParsed, DateKey, FactKey and
+    CurrencyNorm are added to the frame here, each computed once.
+    """
+
+    SOURCES = {
+        'hubcountry': 'CountryCodeNorm',
+        'hubcustomer': 'Customer',
+        'hubdate': 'DateKey',
+        'hubfactsales': 'FactKey',
+        'hubproduct': 'Product',
+        'hubproductcategory': 'ProdCat',
+        'hubsalesorg': 'SalesOrg',
+    }
+
+    def __init__(self, df: pd.DataFrame):
+        # Shared reference tables (Praktikum1/reference_data.py), one lookup per distinct value
+        df['CountryCodeNorm'] = COUNTRIES.normalize(df['Country'])
+        df['CurrencyNorm'] = CURRENCIES.normalize(df['Currency'])
+        if 'DateParsed' not in df.columns:
+            df['DateParsed'] = pd.to_datetime(df['Date'], format=DATE_FORMAT, errors='coerce')
+        df['DateKey'] = date_keys(df['DateParsed'])
+        df['FactKey'] = df['OrderNumber'].astype('string') + '-' + df['OrderItem'].astype('string')
+
+        self.codes, self.uniques, self.ids = {}, {}, {}
+        for hub, column in self.SOURCES.items():
+            codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+            self.codes[hub] = codes.astype(np.int32)
+            self.uniques[hub] = uniques
+            self.ids[hub] = _hash_values(uniques)
+
+    def row_ids(self, hub: str, rows: np.ndarray = None) -> np.ndarray:
+        """Hash key per frame row (or for the given row positions)."""
+        codes = self.codes[hub] if rows is None else self.codes[hub][rows]
+        return self.ids[hub][codes]
+
+    def first_rows(self, hub: str) -> np.ndarray:
+        """Row position of the first occurrence of every distinct key, in code order."""
+        _, first = np.unique(self.codes[hub], return_index=True)
+        return first
+
+    def distinct_rows(self, hubs: list, columns: pd.DataFrame = None) -> np.ndarray:
+        """Row positions of the first occurrence of each distinct key combination.
+
+        Extra descriptive columns (e.g. a satellite's attributes) can be part
+        of the combination.
+        """
+        frame = pd.DataFrame({hub: self.codes[hub] for hub in hubs})
+        if columns is not None:
+            frame = pd.concat([frame, columns.reset_index(drop=True)], axis=1)
+        return np.flatnonzero(~frame.duplicated().to_numpy())
+
+
+def hash_diff(df: pd.DataFrame, columns: list) -> pd.Series:
+    """MD5 hex digest over the descriptive satellite attributes (NULL -> '')."""
+    if not columns:
+        return pd.Series(hashlib.md5(b'').hexdigest(), index=df.index)
+    # Concatenate column by column so only one attribute is converted at a time
+    combined = None
+    for c in columns:
+        part = df[c].astype('string').str.strip().fillna('')
+        combined = part if combined is None else combined.str.cat(part, sep='||')
+    codes, uniques = pd.factorize(combined)
+    digests = np.array([hashlib.md5(v.encode('utf-8')).hexdigest() for v in uniques], dtype=object)
+    return pd.Series(digests[codes], index=df.index)
+
+
+class ChunkDeduplicator:
+    """Drops rows that were already emitted by an earlier chunk.
+
+    Only 64-bit row hashes are kept per table, so the state grows with the
+    number of distinct output rows but never holds the rows themselves.
+    """
+
+    def __init__(self):
+        self.seen = {}
+
+    def filter(self, table_name: str, df: pd.DataFrame) -> pd.DataFrame:
+        if df.empty:
+            return df
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        seen = self.seen.get(table_name, np.empty(0, dtype=np.uint64))
+        mask = ~np.isin(hashes, seen) & ~pd.Series(hashes).duplicated().to_numpy()
+        self.seen[table_name] = np.union1d(seen, hashes[mask])
+        return df[mask]
+
+
+def build_hubs(df: pd.DataFrame, keys: KeyRegistry = None) -> dict:
     """Build all Hub tables from source DataFrame."""
+    keys = keys or KeyRegistry(df)
     hubs = {}
 
-    # HubCountry
-    df['CountryCodeNorm'] = df['Country'].map(normalize_country_code)
-    hubs['hubcountry'] = (
-        df[['CountryCodeNorm']]
-        .drop_duplicates()
-        .assign(hubCountryId=lambda d: factorize_series(d['CountryCodeNorm']))
-        .rename(columns={'CountryCodeNorm': 'countryCode'})
-    )[['hubCountryId', 'countryCode']]
-
-    # HubCustomer
-    hubs['hubcustomer'] = (
-        df[['Customer']]
-        .drop_duplicates()
-        .assign(hubCustomerId=lambda d: factorize_series(d['Customer']))
-        .rename(columns={'Customer': 'customerID'})
-    )[['hubCustomerId', 'customerID']]
-
-    # HubDate
-    df['DateParsed'] = pd.to_datetime(df['Date'], format='%d.%m.%y', errors='coerce')
-    df['DateKey'] = df['DateParsed'].dt.strftime('%Y%m%d').astype('Int64')
-    hubs['hubdate'] = (
-        df[['DateKey']]
-        .drop_duplicates()
-        .assign(hubDateId=lambda d: factorize_series(d['DateKey']))
-        .rename(columns={'DateKey': 'date'})
-    )[['hubDateId', 'date']]
-
-    # HubFactSales
-    df['FactKey'] = df['OrderNumber'].astype('string') + '-' + df['OrderItem'].astype('string')
-    hubs['hubfactsales'] = (
-        df[['FactKey', 'OrderNumber', 'OrderItem']]
-        .drop_duplicates()
-        .assign(hubFactSalesId=lambda d: factorize_series(d['FactKey']))
-        .rename(columns={'OrderNumber': 'orderNumber', 'OrderItem': 'orderItem'})
+    def hub_frame(hub, id_column, key_column, extra=None):
+        first = keys.first_rows(hub)
+        frame = pd.DataFrame({id_column: keys.ids[hub], key_column: keys.uniques[hub]})
+        for target, source in (extra or {}).items():
+            frame[target] = df[source].to_numpy()[first]
+        return frame
+
+    hubs['hubcountry'] = hub_frame('hubcountry', 'hubCountryId', 'countryCode')
+    hubs['hubcustomer'] = hub_frame('hubcustomer', 'hubCustomerId', 'customerID')
+    hubs['hubdate'] = hub_frame('hubdate', 'hubDateId', 'date')
+    hubs['hubfactsales'] = hub_frame(
+        'hubfactsales', 'hubFactSalesId', 'factKey', {'orderItem': 'OrderItem', 'orderNumber': 'OrderNumber'}
     )[['hubFactSalesId', 'orderItem', 'orderNumber']]
-
-    # HubProduct
-    hubs['hubproduct'] = (
-        df[['Product']]
-        .drop_duplicates()
-        .assign(hubProductId=lambda d: factorize_series(d['Product']))
-        .rename(columns={'Product': 'productID'})
-    )[['hubProductId', 'productID']]
-
-    # HubProductCategory
-    hubs['hubproductcategory'] = (
-        df[['ProdCat']]
-        .drop_duplicates()
-        .assign(hubProductCategoryId=lambda d: factorize_series(d['ProdCat']))
-        .rename(columns={'ProdCat': 'productCatID'})
-    )[['hubProductCategoryId', 'productCatID']]
-
-    # HubSalesOrg
-    hubs['hubsalesorg'] = (
-        df[['SalesOrg']]
-        .drop_duplicates()
-        .assign(hubSalesOrgId=lambda d: factorize_series(d['SalesOrg']))
-        .rename(columns={'SalesOrg': 'salesOrg'})
-    )[['hubSalesOrgId', 'salesOrg']]
+    hubs['hubproduct'] = hub_frame('hubproduct', 'hubProductId', 'productID')
+    hubs['hubproductcategory'] = hub_frame('hubproductcategory', 'hubProductCategoryId', 'productCatID')
+    hubs['hubsalesorg'] = hub_frame('hubsalesorg', 'hubSalesOrgId', 'salesOrg')
 
     return hubs
 
 
-def build_links(df: pd.DataFrame, hubs: dict) -> dict:
-    """Build all Link tables from source DataFrame and Hubs."""
-    links = {}
+_LINK_HUBS = {
+    'linkcustomercountry': ['hubcountry', 'hubcustomer'],
+    'linkproductproductcategory': ['hubproduct', 'hubproductcategory'],
+    'linksalesorgcountry': ['hubcountry', 'hubsalesorg'],
+    'linkfactsales': ['hubproduct', 'hubcustomer', 'hubdate', 'hubfactsales', 'hubproductcategory', 'hubsalesorg'],
+}
 
-    country_lu = hubs['hubcountry']
-    cust_lu = hubs['hubcustomer']
-    date_lu = hubs['hubdate']
-    prod_lu = hubs['hubproduct']
-    cat_lu = hubs['hubproductcategory']
-    salesorg_lu = hubs['hubsalesorg']
-
-    # Local FactKey -> hubFactSalesId mapping
-    fact_map = (
-        df[['FactKey']]
-        .drop_duplicates()
-        .assign(hubFactSalesId=lambda d: factorize_series(d['FactKey']))
-    )
+_HUB_ID_COLUMNS = {
+    'hubcountry': 'hubCountryId',
+    'hubcustomer': 'hubCustomerId',
+    'hubdate': 'hubDateId',
+    'hubfactsales': 'hubFactSalesId',
+    'hubproduct': 'hubProductId',
+    'hubproductcategory': 'hubProductCategoryId',
+    'hubsalesorg': 'hubSalesOrgId',
+}
 
-    base = pd.DataFrame({
-        'CountryCodeNorm': df['Country'].map(normalize_country_code),
-        'Customer': df['Customer'],
-        'DateKey': df['DateParsed'].dt.strftime('%Y%m%d').astype('Int64'),
-        'FactKey': df['FactKey'],
-        'Product': df['Product'],
-        'ProdCat': df['ProdCat'],
-        'SalesOrg': df['SalesOrg'],
-    })
 
-    # LinkCustomerCountry
-    links['linkcustomercountry'] = (
-        base[['CountryCodeNorm', 'Customer']]
-        .drop_duplicates()
-        .merge(country_lu, left_on='CountryCodeNorm', right_on='countryCode')
-        .merge(cust_lu, left_on='Customer', right_on='customerID')
-    )[['hubCountryId', 'hubCustomerId']]
-
-    # LinkProductProductCategory
-    links['linkproductproductcategory'] = (
-        base[['Product', 'ProdCat']]
-        .drop_duplicates()
-        .merge(prod_lu, left_on='Product', right_on='productID')
-        .merge(cat_lu, left_on='ProdCat', right_on='productCatID')
-    )[['hubProductId', 'hubProductCategoryId']]
-
-    # LinkSalesOrgCountry
-    links['linksalesorgcountry'] = (
-        base[['SalesOrg', 'CountryCodeNorm']]
-        .drop_duplicates()
-        .merge(salesorg_lu, left_on='SalesOrg', right_on='salesOrg')
-        .merge(country_lu, left_on='CountryCodeNorm', right_on='countryCode')
-    )[['hubCountryId', 'hubSalesOrgId']]
-
-    # LinkFactSales
-    links['linkfactsales'] = (
-        base[['Product', 'Customer', 'DateKey', 'FactKey', 'ProdCat', 'SalesOrg']]
-        .drop_duplicates()
-        .merge(prod_lu, left_on='Product', right_on='productID')
-        .merge(cust_lu, left_on='Customer', right_on='customerID')
-        .merge(date_lu, left_on='DateKey', right_on='date')
-        .merge(fact_map, on='FactKey')
-        .merge(cat_lu, left_on='ProdCat', right_on='productCatID')
-        .merge(salesorg_lu, left_on='SalesOrg', right_on='salesOrg')
-    )[['hubProductId', 'hubCustomerId', 'hubDateId', 'hubFactSalesId', 'hubProductCategoryId', 'hubSalesOrgId']]
+def build_links(df: pd.DataFrame, hubs: dict, keys: KeyRegistry = None) -> dict:
+    """Build all Link tables from source DataFrame and Hubs.
 
+    A link row exists for every distinct combination of its hub keys; ids are
+    looked up by row position in the key registry.
+    """
+    keys = keys or KeyRegistry(df)
+    links = {}
+    for link, link_hubs in _LINK_HUBS.items():
+        rows = keys.distinct_rows(link_hubs)
+        links[link] = pd.DataFrame({_HUB_ID_COLUMNS[hub]: keys.row_ids(hub, rows) for hub in link_hubs})
     return links
 
 
-def build_sats(df: pd.DataFrame, hubs: dict, load_dt: date) -> dict:
+def build_sats(df: pd.DataFrame, hubs: dict, load_dt: date, keys: KeyRegistry = None) -> dict:
     """Build all Satellite tables from source DataFrame and Hubs."""
+    keys = keys or KeyRegistry(df)
     sats = {}
     ld = pd.Timestamp(load_dt)
 
-    country_lu = hubs['hubcountry']
-    cust_lu = hubs['hubcustomer']
-    date_lu = hubs['hubdate']
-    prod_lu = hubs['hubproduct']
-    cat_lu = hubs['hubproductcategory']
-    salesorg_lu = hubs['hubsalesorg']
-
-    # Local FactKey mapping
-    fact_map = (
-        df[['FactKey']]
-        .drop_duplicates()
-        .assign(hubFactSalesId=lambda d: factorize_series(d['FactKey']))
-    )
+    def sat_frame(hub, attributes, rows=None):
+        """One row per distinct (hub key, attributes) combination, attributes renamed."""
+        if rows is None:
+            rows = keys.distinct_rows([hub], df[list(attributes)])
+        frame = pd.DataFrame({'loadDate': ld, _HUB_ID_COLUMNS[hub]: keys.row_ids(hub, rows)})
+        for source, target in attributes.items():
+            frame[target] = df[source].iloc[rows].to_numpy()
+        return frame
 
     # SatCountry
     sats['satcountry'] = (
-        country_lu.assign(loadDate=ld)
-        .assign(countryName=lambda d: d['countryCode'].map(country_name_from_code))
+        hubs['hubcountry'].assign(loadDate=ld)
+        .assign(countryName=lambda d: COUNTRIES.names_for(d['countryCode'], fallback_to_code=True).to_numpy())
     )[['loadDate', 'hubCountryId', 'countryName']].drop_duplicates()
 
     # SatCustomer
-    sats['satcustomer'] = (
-        df[['Customer', 'CustDescr', 'City']]
-        .drop_duplicates()
-        .merge(cust_lu, left_on='Customer', right_on='customerID')
-        .assign(loadDate=ld)
-        .rename(columns={'CustDescr': 'custDescr', 'City': 'city'})
-    )[['loadDate', 'hubCustomerId', 'custDescr', 'city']]
-
-    # SatDate
-    sats['satdate'] = (
-        df[['DateKey', 'DateParsed']]
-        .drop_duplicates()
-        .merge(date_lu, left_on='DateKey', right_on='date')
-        .assign(loadDate=ld)
-        .assign(year=lambda d: d['DateParsed'].dt.year.astype('Int64'))
-        .assign(month=lambda d: d['DateParsed'].dt.month.astype('Int64'))
-        .assign(day=lambda d: d['DateParsed'].dt.day.astype('Int64'))
-    )[['loadDate', 'hubDateId', 'year', 'month', 'day']]
-
-    # SatFactSales
-    df['CurrencyNorm'] = df['Currency'].map(normalize_currency)
-    sats['satfactsales'] = (
-        df[['FactKey', 'SalesQuantity', 'UnitOfMeasure', 'RevenueUSD', 'DiscountUSD', 'CostsUSD', 'Revenue', 'Discount', 'CurrencyNorm']]
-        .merge(fact_map, on='FactKey')
-        .assign(loadDate=ld)
-        .rename(columns={
-            'SalesQuantity': 'salesQuantity',
-            'CurrencyNorm': 'currency',
-        })
-    )[['loadDate', 'hubFactSalesId', 'salesQuantity', 'UnitOfMeasure', 'RevenueUSD', 'DiscountUSD', 'CostsUSD', 'Revenue', 'Discount', 'currency']]
+    sats['satcustomer'] = sat_frame('hubcustomer', {'CustDescr': 'custDescr', 'City': 'city'})
+
+    # SatDate: the date key determines year, month and day
+    date_rows = keys.first_rows('hubdate')
+    parsed = df['DateParsed'].iloc[date_rows].dt
+    sats['satdate'] = pd.DataFrame({
+        'loadDate': ld,
+        'hubDateId': keys.ids['hubdate'],
+        'year': parsed.year.astype('Int64').to_numpy(),
+        'month': parsed.month.astype('Int64').to_numpy(),
+        'day': parsed.day.astype('Int64').to_numpy(),
+    })
+
+    # SatFactSales: one row per source line
+    sats['satfactsales'] = sat_frame('hubfactsales', {
+        'SalesQuantity': 'salesQuantity', 'UnitOfMeasure': 'UnitOfMeasure', 'RevenueUSD': 'RevenueUSD',
+        'DiscountUSD': 'DiscountUSD', 'CostsUSD': 'CostsUSD', 'Revenue': 'Revenue', 'Discount': 'Discount',
+        'CurrencyNorm': 'currency',
+    }, rows=np.arange(len(df)))
 
     # SatProduct
-    sats['satproduct'] = (
-        df[['Product', 'ProdDescr', 'Division']]
-        .drop_duplicates()
-        .merge(prod_lu, left_on='Product', right_on='productID')
-        .assign(loadDate=ld)
-        .rename(columns={'ProdDescr': 'prodDescr', 'Division': 'divisionCode'})
-    )[['loadDate', 'hubProductId', 'prodDescr', 'divisionCode']]
+    sats['satproduct'] = sat_frame('hubproduct', {'ProdDescr': 'prodDescr', 'Division': 'divisionCode'})
 
     # SatProductCategory
-    sats['satproductcategory'] = (
-        df[['ProdCat', 'CatDescr']]
-        .drop_duplicates()
-        .merge(cat_lu, left_on='ProdCat', right_on='productCatID')
-        .assign(loadDate=ld)
-        .rename(columns={'CatDescr': 'catDescr'})
+    sats['satproductcategory'] = sat_frame(
+        'hubproductcategory', {'CatDescr': 'catDescr'}
     )[['catDescr', 'loadDate', 'hubProductCategoryId']]
 
     # SatSalesOrg
     sats['satsalesorg'] = (
-        salesorg_lu.assign(loadDate=ld)
+        hubs['hubsalesorg'].assign(loadDate=ld)
     )[['loadDate', 'hubSalesOrgId']].drop_duplicates()
 
+    # HashDiff over the descriptive attributes, used for delta detection
+    for name, sat in sats.items():
+        attributes = [c for c in sat.columns if c != 'loadDate' and not c.startswith('hub')]
+        sats[name] = sat.assign(hashDiff=hash_diff(sat, attributes))
+
     return sats
 
 
-def write_tables(engine, tables: dict):
-    """Write DataFrames to Postgres, lowercasing column names."""
+# Dialects with COPY FROM STDIN and temporary staging tables (DuckDB through storage_backend)
+COPY_DIALECTS = ('postgresql', 'duckdb')
+
+
+def _key_columns(table_name: str, columns: list) -> list:
+    """Hub hash key columns of a table (all of them for links)."""
+    return [c for c in columns if c.startswith('hub') and c.endswith('id')]
+
+
+def _delta_insert_sql(table_name: str, staging: str, columns: list, keys: list = None) -> str:
+    """INSERT ... SELECT that only adds rows not yet present in the vault.
+
+    Hubs and links: hash keys not yet present. Satellites: rows whose
+    hashdiff differs from the latest version of the same hub key. Tables
+    outside the vault pass their key columns explicitly and are treated
+    like hubs.
+    """
+    cols = ', '.join(columns)
+    if keys is None:
+        keys = _key_columns(table_name, columns)
+    select = ', '.join(f's.{c}' for c in columns)
+    if table_name.startswith('sat'):
+        key = keys[0]
+        return (
+            f'INSERT INTO {table_name} ({cols}) SELECT {select} FROM {staging} s '
+            f'WHERE s.hashdiff IS DISTINCT FROM ('
+            f'SELECT t.hashdiff FROM {table_name} t WHERE t.{key} = s.{key} ORDER BY t.loaddate DESC LIMIT 1) '
+            f'ON CONFLICT DO NOTHING'
+        )
+    match = ' AND '.join(f't.{c} = s.{c}' for c in keys)
+    return (
+        f'INSERT INTO {table_name} ({cols}) SELECT DISTINCT {select} FROM {staging} s '
+        f'WHERE NOT EXISTS (SELECT 1 FROM {table_name} t WHERE {match}) '
+        f'ON CONFLICT DO NOTHING'
+    )
+
+
+def _copy_frame(conn, staging: str, df: pd.DataFrame):
+    """Stream a DataFrame into a staging table with COPY FROM STDIN."""
+    out = df.copy()
+    for col in out.columns:
+        # Integer columns with NULLs arrive as float; COPY into INT columns needs '5', not '5.0'
+        values = out[col]
+        if values.dtype.kind == 'f' and values.notna().any() and (values.dropna() % 1 == 0).all():
+            out[col] = values.astype('Int64')
+    buffer = io.StringIO()
+    out.to_csv(buffer, index=False, header=False, na_rep='\\N', date_format='%Y-%m-%d')
+    buffer.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {staging} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def _merge_frame(engine, table_name: str, df: pd.DataFrame, keys: list = None) -> int:
+    """Delta-load one frame (lowercase columns) in its own transaction; returns the inserted rows."""
     with engine.begin() as conn:
-        for table_name, df in tables.items():
-            if not df.empty:
-                df_to_write = df.copy()
-                df_to_write.columns = [str(c).lower() for c in df_to_write.columns]
-                df_to_write.to_sql(table_name, con=conn, if_exists='append', index=False, method='multi', chunksize=5000)
+        if engine.dialect.name not in COPY_DIALECTS:
+            df.to_sql(table_name, con=conn, if_exists='append', index=False, method='multi', chunksize=5000)
+            return len(df)
+        staging = f'stg_{table_name}'
+        conn.execute(text(f'CREATE TEMP TABLE {staging} (LIKE {table_name}) ON COMMIT DROP'))
+        _copy_frame(conn, staging, df)
+        keys = [k.lower() for k in keys] if keys else None
+        result = conn.execute(text(_delta_insert_sql(table_name, staging, list(df.columns), keys)))
+        return result.rowcount
+
+
+def _slice_digest(table_name: str, part: pd.DataFrame, keys: list = None) -> list:
+    """Checkpoint keys of one slice: a hash over its key columns (the whole row if it has none)."""
+    columns = [k.lower() for k in keys] if keys else _key_columns(table_name, list(part.columns))
+    hashed = pd.util.hash_pandas_object(part[columns or list(part.columns)], index=False).to_numpy()
+    return [hashlib.sha256(hashed.tobytes()).hexdigest()]
+
+
+def write_table(engine, table_name: str, df: pd.DataFrame, keys: list = None, commit_size: int = 0,
+                checkpoint: LoadCheckpoint = None, unit: str = None) -> tuple:
+    """Delta-load one DataFrame, lowercasing column names.
+
+    On Postgres and DuckDB the frame is COPYed into a temporary staging table
+    and merged with a single INSERT ... SELECT, so re-runs only add new
+    hubs/links and changed satellite rows. Other dialects fall back to a plain
+    to_sql append.
+    `keys` names the key columns of tables outside the vault.
+    By default the whole frame is one transaction. With `commit_size` it is
+    written in slices of that many rows, each committed on its own; a
+    `checkpoint` records every committed slice under `unit` (default: the
+    table name), and a resumed run continues after the last one.
+    Returns (inserted rows, seconds).
+    """
+    start = time.perf_counter()
+    if df.empty:
+        return 0, 0.0
+    df_to_write = df.copy()
+    df_to_write.columns = [str(c).lower() for c in df_to_write.columns]
+    if not commit_size:
+        return _merge_frame(engine, table_name, df_to_write, keys), time.perf_counter() - start
+
+    unit = unit or table_name
+    offsets = range(0, len(df_to_write), commit_size)
+    skipped, digest = 0, None
+    if checkpoint is not None:
+        if checkpoint.done(unit):
+            return 0, time.perf_counter() - start
+        skipped, digest = checkpoint.resume(
+            unit, (_slice_digest(table_name, df_to_write.iloc[o:o + commit_size], keys) for o in offsets))
+    inserted = 0
+    for number, offset in enumerate(offsets[skipped:], skipped + 1):
+        part = df_to_write.iloc[offset:offset + commit_size]
+        count = _merge_frame(engine, table_name, part, keys)
+        inserted += count
+        if checkpoint is not None:
+            digest = chain_digest(digest, _slice_digest(table_name, part, keys))
+            checkpoint.record(unit, number, digest, inserted=count)
+    if checkpoint is not None:
+        checkpoint.complete(unit)
+    return inserted, time.perf_counter() - start
+
+
+def write_tables(engine, tables: dict, workers: int = 1, timings: dict = None, keys: dict = None,
+                 commit_size: int = 0, checkpoint: LoadCheckpoint = None, unit_prefix: str = '') -> dict:
+    """Write the tables of one dependency tier, up to `workers` at a time.
+
+    Tables within a tier (all hubs, all links, all sats) do not reference each
+    other, so each is written concurrently on its own pooled connection. Call
+    once per tier, hubs -> links -> sats, to keep foreign keys satisfied.
+    Returns the number of inserted rows per table; seconds per table are
+    added to `timings` if given. `keys` maps tables outside the vault to
+    their key columns. `commit_size` and `checkpoint` are passed to
+    write_table, with the checkpoint unit `<unit_prefix><table>`.
+    """
+    inserted = {}
+    keys = keys or {}
+    if workers <= 1:
+        # In the calling thread, so --profile-stage write_tables sees the actual work
+        for name, df in tables.items():
+            inserted[name], seconds = write_table(engine, name, df, keys.get(name), commit_size, checkpoint,
+                                                  unit_prefix + name)
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + seconds
+        return inserted
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {name: pool.submit(write_table, engine, name, df, keys.get(name), commit_size, checkpoint,
+                                     unit_prefix + name)
+                   for name, df in tables.items()}
+        for name, future in futures.items():
+            inserted[name], seconds = future.result()
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + seconds
+    return inserted
+
+
+def print_corrections():
+    """Print the country code and currency corrections made by the reference tables, most frequent first."""
+    lines = [f"  {mapping.name:<10}'{raw}' -> '{code}': {rows:,} rows"
+             for mapping in MAPPINGS for raw, code, rows in mapping.summary()]
+    if lines:
+        print('Reference data corrections:')
+        print('\n'.join(lines))
+
+
+def print_timings(timings: dict):
+    """Print per-table write times, slowest first."""
+    print('Write timings:')
+    for name, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+        print(f'  {name:<28}{seconds:8.2f}s')
+
+
+CSV_READ_OPTIONS = dict(sep=';', decimal=',', engine='python', on_bad_lines='skip')
+
+# Explicit column schema for the fast parsers: string, int, decimal (comma) or date
+SALES_SCHEMA = {
+    'OrderNumber': 'int',
+    'OrderItem': 'int',
+    'Date': 'date',
+    'Customer': 'string',
+    'CustDescr': 'string',
+    'City': 'string',
+    'SalesOrg': 'string',
+    'Country': 'string',
+    'Product': 'string',
+    'ProdDescr': 'string',
+    'ProdCat': 'string',
+    'CatDescr': 'string',
+    'Division': 'string',
+    'SalesQuantity': 'int',
+    'UnitOfMeasure': 'string',
+    'Revenue': 'decimal',
+    'Currency': 'string',
+    'Discount': 'decimal',
+    'RevenueUSD': 'decimal',
+    'DiscountUSD': 'decimal',
+    'CostsUSD': 'decimal',
+}
+DATE_FORMAT = '%d.%m.%y'
+PARSERS = ('c', 'pyarrow', 'python')
+
+# Bump when SALES_SCHEMA or apply_schema change the typed frame (invalidates the parse cache)
+SCHEMA_VERSION = 1
+CACHE_NAMESPACE = 'etl_salesdata'
+
+
+class Quarantine:
+    """Collects rejected CSV lines with their line numbers in a text report."""
+
+    def __init__(self, path: str, csv_path: str):
+        self.path = path
+        self.csv_path = csv_path
+        self.entries = []      # (line number, reason, raw data or None)
+
+    def add(self, line_number: int, reason: str, data: str = None):
+        self.entries.append((int(line_number), reason, data))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def write(self):
+        """Write the report; raw text of malformed lines is read back from the CSV."""
+        missing = {line for line, _, data in self.entries if data is None}
+        raw = {}
+        if missing:
+            with open(self.csv_path, 'r', encoding='utf-8-sig') as f:
+                for line_number, line in enumerate(f, start=1):
+                    if line_number in missing:
+                        raw[line_number] = line.rstrip('\r\n')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write("QUARANTINE REPORT - Global Bike Sales Data ETL\n")
+            f.write("=" * 80 + "\n\n")
+            f.write(f"Source: {self.csv_path}\n")
+            f.write(f"Quarantined lines: {len(self.entries)}\n\n")
+            for line_number, reason, data in sorted(self.entries, key=lambda e: e[0]):
+                f.write(f"\nLine {line_number}:\n")
+                f.write("-" * 40 + "\n")
+                f.write(f"  • {reason}\n")
+                f.write(f"  Data: {data if data is not None else raw.get(line_number)}\n")
+
+
+class IngestStats:
+    """Row and timing counters of a CSV ingest."""
+
+    def __init__(self, parser: str):
+        self.parser = parser
+        self.rows = 0
+        self.quarantined = 0
+        self.seconds = 0.0
+
+    def report(self) -> str:
+        rate = self.rows / self.seconds if self.seconds else 0.0
+        return (f"Parsed {self.rows:,} rows in {self.seconds:.2f}s ({rate:,.0f} rows/s, parser={self.parser}), "
+                f"{self.quarantined:,} quarantined")
+
+
+def _bad_lines_from_warnings(caught) -> list:
+    """Extract (line number, reason) from C-parser 'Skipping line N: ...' warnings."""
+    bad = []
+    for w in caught:
+        for match in re.finditer(r'Skipping line (\d+): ([^\n]*)', str(w.message)):
+            bad.append((int(match.group(1)), match.group(2)))
+    return bad
+
+
+def _bad_lines_from_pyarrow(caught, csv_path: str) -> list:
+    """Locate pyarrow's invalid rows (reported by text only) in the source file."""
+    reasons = {}
+    for w in caught:
+        match = re.match(r'(Expected \d+ columns, but found \d+): (.*)', str(w.message), re.S)
+        if match:
+            reasons.setdefault(match.group(2), match.group(1))
+    bad = []
+    if reasons:
+        with open(csv_path, 'r', encoding='utf-8-sig') as f:
+            for line_number, line in enumerate(f, start=1):
+                reason = reasons.get(line.rstrip('\r\n'))
+                if reason is not None:
+                    bad.append((line_number, reason))
+    return bad
+
+
+def _line_numbers(index: pd.Index, bad_line_numbers: list) -> np.ndarray:
+    """Map positional row numbers to 1-based file lines, skipping header and bad lines."""
+    bad = np.sort(np.asarray(bad_line_numbers, dtype=np.int64))
+    shifted = bad - np.arange(len(bad)) - 2
+    positions = np.asarray(index, dtype=np.int64)
+    return positions + 2 + np.searchsorted(shifted, positions, side='right')
+
+
+def _embedded_newlines(chunk: pd.DataFrame) -> np.ndarray:
+    """Line breaks inside quoted fields per row (a row spans 1 + this many file lines)."""
+    extra = np.zeros(len(chunk), dtype=np.int64)
+    for column in chunk.columns:
+        values = chunk[column]
+        if values.str.contains('\n', regex=False).any():   # rare: only count columns that have any
+            extra += values.str.count('\n').fillna(0).to_numpy(dtype=np.int64)
+    return extra
+
+
+class LineMap:
+    """File line of every parsed row, carried across the chunks of one CSV.
+
+    Blank lines are read as all-empty rows (skip_blank_lines=False), so they
+    take part in the positional numbering and are dropped by the caller
+    afterwards. Rows with quoted line breaks shift every later row by the
+    number of breaks. The C parser reports skipped lines in records (one per
+    row, ignoring quoted breaks), pyarrow's are located in the file directly;
+    both are returned as file lines.
+    """
+
+    def __init__(self, parser: str):
+        self.physical_bad = parser == 'pyarrow'
+        self.bad_lines = []     # in the parser's own numbering
+        self.extra = 0          # quoted line breaks of all earlier chunks
+
+    def map(self, index: pd.Index, chunk: pd.DataFrame, new_bad: list) -> tuple:
+        """(file line per row, [(file line, reason)] of the chunk's skipped lines)."""
+        self.bad_lines.extend(line for line, _ in new_bad)
+        extra = _embedded_newlines(chunk)
+        before = self.extra + np.cumsum(extra) - extra
+        if self.physical_bad:
+            lines = _line_numbers(np.asarray(index, dtype=np.int64) + before, self.bad_lines)
+        else:
+            records = _line_numbers(index, self.bad_lines)
+            lines = records + before
+            preceding = np.concatenate(([self.extra], self.extra + np.cumsum(extra)))
+            new_bad = [(line + int(preceding[np.searchsorted(records, line)]), reason) for line, reason in new_bad]
+        self.extra += int(extra.sum())
+        return lines, new_bad
+
+
+def apply_schema(chunk: pd.DataFrame, line_numbers: np.ndarray, quarantine: Quarantine = None) -> pd.DataFrame:
+    """Convert string columns to the schema types; rows with unparsable values are quarantined."""
+    source = chunk.copy(deep=False)
+    invalid = np.zeros(len(chunk), dtype=bool)
+    reasons = {}
+    for column, kind in SALES_SCHEMA.items():
+        if column not in chunk.columns:
+            continue
+        raw = source[column].str.strip()
+        if kind == 'string':
+            chunk[column] = raw.astype('string')
+            continue
+        if kind == 'date':
+            parsed = pd.to_datetime(raw, format=DATE_FORMAT, errors='coerce')
+            chunk['DateParsed'] = parsed
+        elif kind == 'decimal':
+            parsed = pd.to_numeric(raw.str.replace(',', '.', regex=False), errors='coerce')
+            chunk[column] = parsed.astype('float64')
+        else:
+            parsed = pd.to_numeric(raw, errors='coerce')
+            whole = parsed.isna() | (parsed == np.floor(parsed))
+            parsed = parsed.where(whole)
+            chunk[column] = parsed.astype('Int64')
+        failed = (parsed.isna() & raw.notna()).to_numpy()
+        for pos in np.flatnonzero(failed):
+            reasons.setdefault(pos, []).append(f"{column} has invalid value '{raw.iloc[pos]}'")
+        invalid |= failed
+
+    if invalid.any():
+        if quarantine is not None:
+            for pos in np.flatnonzero(invalid):
+                data = ';'.join('' if pd.isna(v) else str(v) for v in source.iloc[pos])
+                quarantine.add(line_numbers[pos], '; '.join(reasons[pos]), data)
+        chunk = chunk[~invalid]
+    return chunk
+
+
+def iter_sales_csv(csv_path: str, parser: str = 'c', chunksize: int = None,
+                   quarantine: Quarantine = None, stats: IngestStats = None, validation_errors: list = None,
+                   timings: dict = None):
+    """Yield typed DataFrames from the source CSV (one frame unless chunksize is set).
+
+    The 'c' and 'pyarrow' parsers read every column as string and convert it
+    with SALES_SCHEMA; malformed lines and unparsable values go to the
+    quarantine with their line numbers. 'python' is the legacy inference path.
+    If validation_errors is a list, the raw rows are also checked against the
+    shared rule table of the Praktikum1 ETL and its findings appended to it.
+    If timings is a dict, seconds spent reading ('extract') and checking and
+    converting ('validate') are added to it.
+    """
+    if parser not in PARSERS:
+        raise ValueError(f'Unknown parser {parser!r}, expected one of {PARSERS}')
+    if parser == 'pyarrow' and chunksize:
+        raise ValueError('The pyarrow parser does not support --chunksize')
+
+    if parser == 'python':
+        options = dict(CSV_READ_OPTIONS)
+    else:
+        options = dict(sep=';', engine=parser, on_bad_lines='warn', dtype=str, skip_blank_lines=False)
+    reader = pd.read_csv(csv_path, chunksize=chunksize, **options) if chunksize else None
+
+    line_map = LineMap(parser)
+    while True:
+        started = time.perf_counter()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', pd.errors.ParserWarning)
+            if reader is None:
+                chunk = pd.read_csv(csv_path, **options)
+            else:
+                chunk = next(reader, None)
+        if chunk is None:
+            break
+        parsed = time.perf_counter()
+
+        if parser == 'python':
+            if 'Customer' in chunk.columns:
+                chunk['Customer'] = chunk['Customer'].astype('string')
+        else:
+            if parser == 'pyarrow':
+                new_bad = _bad_lines_from_pyarrow(caught, csv_path)
+                chunk.index = pd.RangeIndex(len(chunk))
+            else:
+                new_bad = _bad_lines_from_warnings(caught)
+            line_numbers, new_bad = line_map.map(chunk.index, chunk, new_bad)
+            if quarantine is not None:
+                for line_number, reason in new_bad:
+                    quarantine.add(line_number, reason)
+            blank = chunk.isna().all(axis=1).to_numpy()
+            if blank.any():
+                chunk, line_numbers = chunk[~blank], line_numbers[~blank]
+            rows_before = len(chunk)
+            if validation_errors is not None:
+                # Report only: KeyRegistry normalizes and counts the corrections of the loaded rows
+                _, found = validate_batch(chunk.fillna(''), line_numbers, with_records=False, count=False)
+                validation_errors.extend(found)
+            chunk = apply_schema(chunk, line_numbers, quarantine)
+            if stats is not None:
+                stats.quarantined += len(new_bad) + rows_before - len(chunk)
+
+        finished = time.perf_counter()
+        if stats is not None:
+            stats.rows += len(chunk)
+            stats.seconds += finished - started
+        if timings is not None:
+            timings['extract'] = timings.get('extract', 0.0) + parsed - started
+            timings['validate'] = timings.get('validate', 0.0) + finished - parsed
+        yield chunk
+        if reader is None:
+            break
+
+
+def _stage(metrics: RunMetrics, name: str, rows_in: int = 0):
+    """metrics.stage(...) or a no-op when the run is not instrumented."""
+    return metrics.stage(name, rows_in) if metrics is not None else nullcontext(StageRecord())
+
+
+def _row_count(tables: dict) -> int:
+    return sum(len(df) for df in tables.values())
+
+
+def load_frame(engine, df: pd.DataFrame, load_dt: date, workers: int = 1, timings: dict = None,
+               metrics: RunMetrics = None, dedup: ChunkDeduplicator = None, commit_size: int = 0,
+               checkpoint: LoadCheckpoint = None, unit_prefix: str = '') -> dict:
+    """Build hubs, links and sats for one frame and write them tier by tier.
+
+    Returns the inserted rows per group ('Hubs', 'Links', 'Sats') and table.
+    With a dedup filter, rows already written for an earlier chunk are
+    dropped first (SatFactSales is not deduplicated in a full run either).
+    `commit_size`, `checkpoint` and `unit_prefix` go to write_tables.
+    """
+    with _stage(metrics, 'build_hubs', len(df)) as record:
+        keys = KeyRegistry(df)
+        hubs = build_hubs(df, keys)
+        record.rows_out += _row_count(hubs)
+    with _stage(metrics, 'build_links', len(df)) as record:
+        links = build_links(df, hubs, keys)
+        record.rows_out += _row_count(links)
+    with _stage(metrics, 'build_sats', len(df)) as record:
+        sats = build_sats(df, hubs, load_dt, keys)
+        record.rows_out += _row_count(sats)
+
+    inserted = {}
+    for group_name, group in [('Hubs', hubs), ('Links', links), ('Sats', sats)]:
+        if dedup is not None:
+            group = {name: tbl if name == 'satfactsales' else dedup.filter(name, tbl) for name, tbl in group.items()}
+        table_seconds = {}
+        with _stage(metrics, 'write_tables', _row_count(group)) as record:
+            counts = write_tables(engine, group, workers, table_seconds, commit_size=commit_size,
+                                  checkpoint=checkpoint, unit_prefix=unit_prefix)
+            record.rows_out += sum(counts.values())
+        for name, seconds in table_seconds.items():
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + seconds
+            if metrics is not None:
+                metrics.db_time(name, seconds, counts[name])
+        inserted[group_name] = counts
+    return inserted
+
+
+def read_frames(csv_path: str, parser: str = 'c', chunksize: int = None, quarantine: Quarantine = None,
+                stats: IngestStats = None, validation_errors: list = None, metrics: RunMetrics = None):
+    """iter_sales_csv with each chunk read recorded as stage 'read_csv'."""
+    frames = iter_sales_csv(csv_path, parser, chunksize, quarantine, stats, validation_errors)
+    while True:
+        with _stage(metrics, 'read_csv') as record:
+            frame = next(frames, None)
+            if frame is not None:
+                record.rows_out += len(frame)
+        if frame is None:
+            return
+        yield frame
+
+
+def read_frame_cached(cache: ParseCache, csv_path: str, parser: str = 'c', quarantine: Quarantine = None,
+                      stats: IngestStats = None, validation_errors: list = None,
+                      metrics: RunMetrics = None) -> pd.DataFrame:
+    """Read the whole CSV through the parse cache.
+
+    The key is the file's content hash plus SCHEMA_VERSION, RULES_VERSION,
+    the parser and whether rule findings are collected. On a hit the typed
+    frame, the quarantined lines and the rule findings are taken from the
+    cache and the CSV is not parsed; on a miss it is read with read_frames
+    and the result is stored.
+    """
+    key = None
+    if cache.enabled:
+        key = cache.key(csv_path, CACHE_NAMESPACE, f'{SCHEMA_VERSION}.{RULES_VERSION}', parser=parser,
+                        validate=validation_errors is not None)
+        started = time.perf_counter()
+        with _stage(metrics, 'read_csv') as record:
+            cached = cache.load(key)
+            if cached is not None:
+                record.rows_out += len(cached[0]['sales'])
+        if cached is not None:
+            frames, meta = cached
+            if quarantine is not None:
+                quarantine.entries.extend(
+                    (int(line), reason, None if pd.isna(data) else data)
+                    for line, reason, data in frames['quarantine'].itertuples(index=False))
+            if validation_errors is not None:
+                validation_errors.extend(errors_from_frame(frames['validation_errors']))
+            if stats is not None:
+                stats.rows += meta['rows']['sales']
+                stats.quarantined += meta['quarantined']
+                stats.seconds += time.perf_counter() - started
+            print(f"Parse cache hit for '{csv_path}' (entry from {meta['created']}), parsing skipped")
+            return frames['sales']
+
+    # Only what this read adds to the shared collectors goes into the entry
+    quarantine_start = len(quarantine) if quarantine is not None else 0
+    errors_start = len(validation_errors) if validation_errors is not None else 0
+    quarantined_start = stats.quarantined if stats is not None else 0
+    df = next(read_frames(csv_path, parser, quarantine=quarantine, stats=stats,
+                          validation_errors=validation_errors, metrics=metrics))
+    if key is not None:
+        entries = quarantine.entries[quarantine_start:] if quarantine is not None else []
+        found = validation_errors[errors_start:] if validation_errors is not None else []
+        frames = {
+            'sales': df,
+            'quarantine': pd.DataFrame({
+                'line': pd.Series([line for line, _, _ in entries], dtype='int64'),
+                'reason': pd.Series([reason for _, reason, _ in entries], dtype=object),
+                'data': pd.Series([data for _, _, data in entries], dtype=object),
+            }),
+            'validation_errors': errors_to_frame(found),
+        }
+        quarantined = stats.quarantined - quarantined_start if stats is not None else len(entries)
+        if not cache.store(key, frames, source=csv_path, quarantined=quarantined):
+            print('Parse cache: result could not be stored')
+    return df
+
+
+def run_chunked(engine, csv_path: str, chunksize: int, load_dt: date, parser: str = 'c',
+                quarantine: Quarantine = None, stats: IngestStats = None, validation_errors: list = None,
+                workers: int = 1, timings: dict = None, metrics: RunMetrics = None, commit_size: int = 0,
+                checkpoint: LoadCheckpoint = None) -> dict:
+    """Load the CSV chunk by chunk; each chunk is written before the next is read.
+
+    Hash keys depend only on the business keys, so no first pass over the
+    file is needed to keep keys consistent across chunks. Checkpoint units
+    are `chunk<n>/<table>`; the chunks of a resumed run are still read and
+    deduplicated, but their committed slices are not written again.
+    """
+    dedup = ChunkDeduplicator()
+    totals = {'Hubs': {}, 'Links': {}, 'Sats': {}}
+
+    chunks = read_frames(csv_path, parser, chunksize, quarantine, stats, validation_errors, metrics)
+    for number, chunk in enumerate(chunks, 1):
+        inserted = load_frame(engine, chunk, load_dt, workers, timings, metrics, dedup, commit_size, checkpoint,
+                              f'chunk{number}/')
+        for group_name, counts in inserted.items():
+            for name, count in counts.items():
+                totals[group_name][name] = totals[group_name].get(name, 0) + count
+
+    return totals
+
+
+def write_metrics(metrics: RunMetrics, path: str):
+    """Write the JSON run report (and the cProfile data of the profiled stage)."""
+    if metrics is None:
+        return
+    report = metrics.write(path or 'etl_metrics.json')
+    print(f"Run report written to '{path or 'etl_metrics.json'}'")
+    if 'profile' in report:
+        print(f"  cProfile of stage '{metrics.profile_stage}' written to '{metrics.profile_path}'")
 
 
 def main():
@@ -299,38 +876,112 @@ def main():
     parser.add_argument('--password', default='postgres', help='Postgres password')
     parser.add_argument('--db', default='postgres', help='Postgres database name')
     parser.add_argument('--run-crebas', action='store_true', help='Execute crebas.sql before loading')
+    parser.add_argument('--database-url', default=None,
+                        help='SQLAlchemy URL or duckdb:///file.duckdb (embedded, no server); overrides the Postgres options')
     parser.add_argument('--crebas', default=os.path.join(os.path.dirname(__file__), 'crebas.sql'), help='Path to crebas.sql')
+    parser.add_argument('--chunksize', type=int, default=None, help='Stream the CSV in chunks of this many rows (bounded memory)')
+    parser.add_argument('--parser', choices=PARSERS, default='c', help='CSV parser: typed c/pyarrow with quarantine, or legacy python')
+    parser.add_argument('--quarantine', default='quarantined_rows.txt', help='Report file for malformed or unparsable lines')
+    parser.add_argument('--validation-report', default=None, help='Check rows against the shared validation rules and write a report')
+    parser.add_argument('--workers', type=int, default=4, help='Tables written concurrently per tier (one pooled connection each)')
+    parser.add_argument('--metrics-report', default=None, help='Write a JSON run report (per-stage time, rows, RSS, DB time per table)')
+    parser.add_argument('--profile-stage', default=None, choices=PROFILE_STAGES,
+                        help='Record this stage with cProfile (<stage>.prof); write_tables is then run with one writer, '
+                             'since cProfile only sees the calling thread')
+    parser.add_argument('--no-cache', action='store_true', help='Always parse and validate the CSV, bypassing the parse cache')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Parse cache directory (Parquet, keyed by CSV content hash)')
+    parser.add_argument('--commit-size', type=int, default=0,
+                        help='Commit every table in slices of this many rows and record them in the checkpoint; '
+                             'a re-run after a failure continues after the last committed slice (0 = one transaction per table)')
+    parser.add_argument('--checkpoint', default='load_checkpoint.json', help='Checkpoint file for --commit-size')
     args = parser.parse_args()
 
     # Build connection string from components (URL-encode password to handle special chars like @)
-    conn_str = f'postgresql+psycopg2://{args.user}:{quote_plus(args.password)}@{args.host}:{args.port}/{args.db}'
-
-    # Read CSV
-    df = pd.read_csv(args.csv, sep=';', decimal=',', engine='python', on_bad_lines='skip')
-    if 'Customer' in df.columns:
-        df['Customer'] = df['Customer'].astype('string')
-
-    # Build hubs, links, sats
-    hubs = build_hubs(df)
-    links = build_links(df, hubs)
-    sats = build_sats(df, hubs, load_dt=date.today())
-
-    # Connect to DB
-    engine = create_engine(conn_str)
-
-    # Optionally (re)create schema
-    if args.run_crebas:
-        run_sql_file(engine, args.crebas)
-
-    # Write in dependency order: hubs -> links -> sats
-    write_tables(engine, hubs)
-    write_tables(engine, links)
-    write_tables(engine, sats)
-
-    print('ETL completed:')
-    for group_name, group in [('Hubs', hubs), ('Links', links), ('Sats', sats)]:
-        total = sum(len(df_) for df_ in group.values())
-        print(f"  {group_name}: {total:,} rows across {len(group)} tables")
+    conn_str = args.database_url or f'postgresql+psycopg2://{args.user}:{quote_plus(args.password)}@{args.host}:{args.port}/{args.db}'
+
+    quarantine = Quarantine(args.quarantine, args.csv)
+    stats = IngestStats(args.parser)
+    validation_errors = [] if args.validation_report and args.parser != 'python' else None
+    timings = {}
+    metrics = None
+    if args.metrics_report or args.profile_stage:
+        metrics = RunMetrics('etl_salesdata', profile_stage=args.profile_stage)
+    if args.profile_stage == 'write_tables' and args.workers > 1:
+        print(f"Profiling write_tables: writing with 1 worker instead of {args.workers}")
+        args.workers = 1
+
+    checkpoint = None
+    if args.commit_size:
+        # Progress only carries over to the same CSV, parse options, slice size and target database
+        checkpoint = LoadCheckpoint(args.checkpoint, checkpoint_key(
+            args.csv, CACHE_NAMESPACE, f'{SCHEMA_VERSION}.{RULES_VERSION}', parser=args.parser,
+            chunksize=args.chunksize, commit_size=args.commit_size, database=conn_str))
+        if checkpoint.discarded:
+            print(f"Checkpoint '{args.checkpoint}' belongs to a different input and is discarded")
+        if args.run_crebas:
+            checkpoint.clear()  # fresh schema: nothing to resume
+        elif checkpoint.resumed:
+            print(f"Resuming from checkpoint '{args.checkpoint}': committed slices are skipped")
+
+    if args.chunksize:
+        engine = create_engine(conn_str, pool_size=args.workers, max_overflow=0)
+        # Indexes stay in place: every chunk's delta insert looks up the rows of earlier chunks
+        prepare_schema(engine, args.crebas if args.run_crebas else None, date.today(), timings)
+        totals = run_chunked(engine, args.csv, args.chunksize, load_dt=date.today(),
+                             parser=args.parser, quarantine=quarantine, stats=stats,
+                             validation_errors=validation_errors, workers=args.workers, timings=timings,
+                             metrics=metrics, commit_size=args.commit_size, checkpoint=checkpoint)
+        if checkpoint is not None:
+            checkpoint.clear()
+        print(stats.report())
+        if len(quarantine):
+            quarantine.write()
+            print(f"  Quarantined lines written to '{args.quarantine}'")
+        if validation_errors is not None:
+            write_validation_report(validation_errors, args.validation_report, 'Sales Data ETL to Data Vault')
+            print(f"  {len(validation_errors):,} rows with rule findings written to '{args.validation_report}'")
+        print('ETL completed (chunked, new or changed rows):')
+        for group_name, group in totals.items():
+            print(f"  {group_name}: {sum(group.values()):,} rows across {len(group)} tables")
+        print_corrections()
+        print_timings(timings)
+        write_metrics(metrics, args.metrics_report)
+        return
+
+    # Read CSV (or the typed frame of an unchanged CSV from the parse cache)
+    cache = ParseCache(args.cache_dir, enabled=not args.no_cache)
+    if not args.no_cache and not cache.available:
+        print('Parse cache disabled: pyarrow is not installed')
+    df = read_frame_cached(cache, args.csv, args.parser, quarantine, stats, validation_errors, metrics)
+    print(stats.report())
+    if len(quarantine):
+        quarantine.write()
+        print(f"  Quarantined lines written to '{args.quarantine}'")
+    if validation_errors is not None:
+        write_validation_report(validation_errors, args.validation_report, 'Sales Data ETL to Data Vault')
+        print(f"  {len(validation_errors):,} rows with rule findings written to '{args.validation_report}'")
+
+    # Connect to DB (one pooled connection per writer thread)
+    engine = create_engine(conn_str, pool_size=args.workers, max_overflow=0)
+
+    # Optionally (re)create schema; join indexes and this month's partitions
+    prepare_schema(engine, args.crebas if args.run_crebas else None, date.today(), timings)
+
+    # Build hubs, links, sats and write in dependency order: hubs -> links -> sats,
+    # tables within a tier in parallel. A fresh schema is bulk loaded without
+    # secondary indexes, they are rebuilt afterwards.
+    with indexes_dropped(engine, timings=timings) if args.run_crebas else nullcontext():
+        inserted = load_frame(engine, df, date.today(), args.workers, timings, metrics,
+                              commit_size=args.commit_size, checkpoint=checkpoint)
+    if checkpoint is not None:
+        checkpoint.clear()
+
+    print('ETL completed (new or changed rows):')
+    for group_name, group in inserted.items():
+        print(f"  {group_name}: {sum(group.values()):,} rows across {len(group)} tables")
+    print_corrections()
+    print_timings(timings)
+    write_metrics(metrics, args.metrics_report)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,343 @@
+"""Incremental Data Vault -> Sales Mart refresh.
+
+Instead of truncating and rebuilding the star schema (etl_dv_to_mart.sql),
+only the dimension members and facts whose satellites received rows since the
+last refresh are upserted. The satellites' loadDate serves as watermark and is
+stored in MartRefreshState. --full runs etl_dv_to_mart.sql instead and resets
+the watermark. Both keep the sales cubes (sales_cubes.py) in step with FactSales.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from datetime import date
+from urllib.parse import quote_plus
+
+from sqlalchemy import text
+
+import sales_cubes
+from schema_management import MART_TABLES, indexes_dropped, run_sql_file
+
+# The calendar generator is shared with the Praktikum1 ETL
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Praktikum1'))
+
+from calendar_dim import COLUMNS as CALENDAR_COLUMNS, calendar_frame  # noqa: E402
+from storage_backend import create_engine  # noqa: E402
+
+MART_NAME = 'sales_mart'
+
+STATE_DDL = '''
+CREATE TABLE IF NOT EXISTS MartRefreshState (
+   MartName             VARCHAR(50)          NOT NULL,
+   Watermark            DATE                 NULL,
+   RefreshedAt          TIMESTAMP            NOT NULL,
+   FullRebuild          BOOLEAN              NOT NULL,
+   CONSTRAINT PK_MARTREFRESHSTATE PRIMARY KEY (MartName)
+)
+'''
+
+CALENDAR_DDL = '''
+CREATE TABLE IF NOT EXISTS Calendar (
+   DateKey              INT4                 NOT NULL,
+   Date                 DATE                 NOT NULL,
+   Year                 INT4                 NOT NULL,
+   Month                INT4                 NOT NULL,
+   Day                  INT4                 NOT NULL,
+   Quarter              INT4                 NOT NULL,
+   MonthName            VARCHAR(20)          NOT NULL,
+   DayOfWeek            INT4                 NOT NULL,
+   DayName              VARCHAR(20)          NOT NULL,
+   IsWeekend            BOOLEAN              NOT NULL,
+   CONSTRAINT PK_CALENDAR PRIMARY KEY (DateKey)
+)
+'''
+
+SATELLITES = ('SatCountry', 'SatCustomer', 'SatDate', 'SatFactSales', 'SatProduct', 'SatProductCategory',
+              'SatSalesOrg')
+
+
+def _latest(sat: str, hub_id: str, since: bool = True) -> str:
+    """Latest satellite version per hub key, restricted to keys changed since the watermark.
+
+    loadDate leads the satellites' primary key, so the range filter is an
+    index scan. Every newer version of a key is >= the watermark as well, so
+    the latest changed row is also the latest row overall.
+    """
+    where = 'WHERE loadDate >= :since ' if since else ''
+    return f'(SELECT DISTINCT ON ({hub_id}) * FROM {sat} {where}ORDER BY {hub_id}, loadDate DESC)'
+
+
+# Dimensions first (FactSales references them), each upserted on its key.
+UPSERTS = {
+    'DimDate': f'''
+        INSERT INTO DimDate (DateKey, Date, Year, Month, Day, Quarter, MonthName, DayOfWeek, DayName, IsWeekend)
+        SELECT h.hubDateId, c.Date, c.Year, c.Month, c.Day, c.Quarter, c.MonthName, c.DayOfWeek, c.DayName,
+               c.IsWeekend
+        FROM HubDate h
+        JOIN {_latest('SatDate', 'hubDateId')} s ON h.hubDateId = s.hubDateId
+        JOIN Calendar c ON c.DateKey = h.date
+        WHERE h.date IS NOT NULL
+        ON CONFLICT (DateKey) DO UPDATE SET
+            Date = EXCLUDED.Date, Year = EXCLUDED.Year, Month = EXCLUDED.Month, Day = EXCLUDED.Day,
+            Quarter = EXCLUDED.Quarter, MonthName = EXCLUDED.MonthName, DayOfWeek = EXCLUDED.DayOfWeek,
+            DayName = EXCLUDED.DayName, IsWeekend = EXCLUDED.IsWeekend
+    ''',
+    'DimCountry': f'''
+        INSERT INTO DimCountry (CountryKey, CountryCode, CountryName)
+        SELECT h.hubCountryId, h.countryCode, COALESCE(s.countryName, h.countryCode)
+        FROM HubCountry h
+        JOIN {_latest('SatCountry', 'hubCountryId')} s ON h.hubCountryId = s.hubCountryId
+        WHERE h.countryCode IS NOT NULL
+        ON CONFLICT (CountryKey) DO UPDATE SET
+            CountryCode = EXCLUDED.CountryCode, CountryName = EXCLUDED.CountryName
+    ''',
+    'DimSalesOrg': f'''
+        INSERT INTO DimSalesOrg (SalesOrgKey, SalesOrgID)
+        SELECT h.hubSalesOrgId, h.salesOrg
+        FROM HubSalesOrg h
+        JOIN {_latest('SatSalesOrg', 'hubSalesOrgId')} s ON h.hubSalesOrgId = s.hubSalesOrgId
+        WHERE h.salesOrg IS NOT NULL
+        ON CONFLICT (SalesOrgKey) DO UPDATE SET SalesOrgID = EXCLUDED.SalesOrgID
+    ''',
+    'DimCustomer': f'''
+        INSERT INTO DimCustomer (CustomerKey, CustomerID, CustomerName, City)
+        SELECT h.hubCustomerId, h.customerID, COALESCE(s.custDescr, 'Unknown'), COALESCE(s.city, 'Unknown')
+        FROM HubCustomer h
+        JOIN {_latest('SatCustomer', 'hubCustomerId')} s ON h.hubCustomerId = s.hubCustomerId
+        WHERE h.customerID IS NOT NULL
+        ON CONFLICT (CustomerKey) DO UPDATE SET
+            CustomerID = EXCLUDED.CustomerID, CustomerName = EXCLUDED.CustomerName, City = EXCLUDED.City
+    ''',
+    # A product also changes when only its category description changed
+    'DimProduct': f'''
+        WITH changed AS (
+            SELECT hubProductId FROM SatProduct WHERE loadDate >= :since
+            UNION
+            SELECT l.hubProductId
+            FROM LinkProductProductCategory l
+            JOIN SatProductCategory s ON s.hubProductCategoryId = l.hubProductCategoryId
+            WHERE s.loadDate >= :since
+        )
+        INSERT INTO DimProduct (ProductKey, ProductID, ProductName, ProductCategoryID, ProductCategoryName, Division)
+        SELECT DISTINCT ON (hp.hubProductId)
+            hp.hubProductId,
+            hp.productID,
+            COALESCE(sp.prodDescr, 'Unknown'),
+            hpc.productCatID,
+            COALESCE(spc.catDescr, 'Unknown'),
+            COALESCE(sp.divisionCode, 'Unknown')
+        FROM HubProduct hp
+        JOIN changed c ON c.hubProductId = hp.hubProductId
+        JOIN LinkProductProductCategory lppc ON hp.hubProductId = lppc.hubProductId
+        JOIN HubProductCategory hpc ON lppc.hubProductCategoryId = hpc.hubProductCategoryId
+        LEFT JOIN {_latest('SatProduct', 'hubProductId', since=False)} sp ON hp.hubProductId = sp.hubProductId
+        LEFT JOIN {_latest('SatProductCategory', 'hubProductCategoryId', since=False)} spc
+            ON hpc.hubProductCategoryId = spc.hubProductCategoryId
+        WHERE hp.productID IS NOT NULL
+        ORDER BY hp.hubProductId, hpc.productCatID
+        ON CONFLICT (ProductKey) DO UPDATE SET
+            ProductID = EXCLUDED.ProductID, ProductName = EXCLUDED.ProductName,
+            ProductCategoryID = EXCLUDED.ProductCategoryID, ProductCategoryName = EXCLUDED.ProductCategoryName,
+            Division = EXCLUDED.Division
+    ''',
+    # One fact row per order line; a sales org linked to several countries
+    # resolves to the lowest country key, as in etl_dv_to_mart.sql.
+    'FactSales': f'''
+        INSERT INTO FactSales (
+            DateKey, CustomerKey, ProductKey, SalesOrgKey, CountryKey, OrderNumber, OrderItem,
+            SalesQuantity, UnitOfMeasure, Revenue, Discount, RevenueUSD, DiscountUSD, CostsUSD, Currency,
+            NetRevenue, NetRevenueUSD, GrossProfit, GrossProfitMargin
+        )
+        SELECT DISTINCT ON (hfs.orderNumber, hfs.orderItem)
+            lfs.hubDateId,
+            lfs.hubCustomerId,
+            lfs.hubProductId,
+            lfs.hubSalesOrgId,
+            lsoc.hubCountryId,
+            hfs.orderNumber,
+            hfs.orderItem,
+            COALESCE(sfs.salesQuantity, 0),
+            COALESCE(sfs.UnitOfMeasure, 'ST'),
+            COALESCE(sfs.Revenue, 0),
+            COALESCE(sfs.Discount, 0),
+            COALESCE(sfs.RevenueUSD, 0),
+            COALESCE(sfs.DiscountUSD, 0),
+            COALESCE(sfs.CostsUSD, 0),
+            COALESCE(sfs.currency, 'EUR'),
+            COALESCE(sfs.Revenue, 0) - COALESCE(sfs.Discount, 0),
+            COALESCE(sfs.RevenueUSD, 0) - COALESCE(sfs.DiscountUSD, 0),
+            (COALESCE(sfs.RevenueUSD, 0) - COALESCE(sfs.DiscountUSD, 0)) - COALESCE(sfs.CostsUSD, 0),
+            CASE
+                WHEN (COALESCE(sfs.RevenueUSD, 0) - COALESCE(sfs.DiscountUSD, 0)) > 0
+                THEN (((COALESCE(sfs.RevenueUSD, 0) - COALESCE(sfs.DiscountUSD, 0)) - COALESCE(sfs.CostsUSD, 0))
+                      / (COALESCE(sfs.RevenueUSD, 0) - COALESCE(sfs.DiscountUSD, 0))) * 100
+                ELSE NULL
+            END
+        FROM {_latest('SatFactSales', 'hubFactSalesId')} sfs
+        JOIN HubFactSales hfs ON hfs.hubFactSalesId = sfs.hubFactSalesId
+        JOIN LinkFactSales lfs ON lfs.hubFactSalesId = hfs.hubFactSalesId
+        JOIN LinkSalesOrgCountry lsoc ON lfs.hubSalesOrgId = lsoc.hubSalesOrgId
+        WHERE lfs.hubDateId IS NOT NULL
+          AND lfs.hubCustomerId IS NOT NULL
+          AND lfs.hubProductId IS NOT NULL
+          AND lfs.hubSalesOrgId IS NOT NULL
+          AND lsoc.hubCountryId IS NOT NULL
+        ORDER BY hfs.orderNumber, hfs.orderItem, lsoc.hubCountryId
+        ON CONFLICT (OrderNumber, OrderItem) DO UPDATE SET
+            DateKey = EXCLUDED.DateKey, CustomerKey = EXCLUDED.CustomerKey, ProductKey = EXCLUDED.ProductKey,
+            SalesOrgKey = EXCLUDED.SalesOrgKey, CountryKey = EXCLUDED.CountryKey,
+            SalesQuantity = EXCLUDED.SalesQuantity, UnitOfMeasure = EXCLUDED.UnitOfMeasure,
+            Revenue = EXCLUDED.Revenue, Discount = EXCLUDED.Discount, RevenueUSD = EXCLUDED.RevenueUSD,
+            DiscountUSD = EXCLUDED.DiscountUSD, CostsUSD = EXCLUDED.CostsUSD, Currency = EXCLUDED.Currency,
+            NetRevenue = EXCLUDED.NetRevenue, NetRevenueUSD = EXCLUDED.NetRevenueUSD,
+            GrossProfit = EXCLUDED.GrossProfit, GrossProfitMargin = EXCLUDED.GrossProfitMargin
+    ''',
+}
+
+
+def load_calendar(conn) -> int:
+    """Bulk-load the calendar days that cover HubDate into Calendar.
+
+    Whole years from the first to the last hub date are generated at once in
+    Python (calendar_dim.py) and COPYed into a staging table. Days already in
+    Calendar are kept. DimDate then only joins on the YYYYMMDD key.
+    Returns the number of new days.
+    """
+    conn.execute(text(CALENDAR_DDL))
+    first, last = conn.execute(text('SELECT MIN(date), MAX(date) FROM HubDate')).one()
+    if first is None:
+        return 0
+    frame = calendar_frame(date(first // 10000, 1, 1), date(last // 10000, 12, 31))
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    conn.execute(text('CREATE TEMP TABLE stg_calendar (LIKE Calendar) ON COMMIT DROP'))
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY stg_calendar ({', '.join(CALENDAR_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+    return conn.execute(text(
+        'INSERT INTO Calendar SELECT * FROM stg_calendar ON CONFLICT (DateKey) DO NOTHING'
+    )).rowcount
+
+
+def read_watermark(conn):
+    """loadDate up to which the mart is current (None: never refreshed)."""
+    conn.execute(text(STATE_DDL))
+    return conn.execute(text('SELECT Watermark FROM MartRefreshState WHERE MartName = :mart'),
+                        {'mart': MART_NAME}).scalar()
+
+
+def vault_watermark(conn):
+    """Latest loadDate over all satellites."""
+    union = ' UNION ALL '.join(f'SELECT MAX(loadDate) AS loadDate FROM {sat}' for sat in SATELLITES)
+    return conn.execute(text(f'SELECT MAX(loadDate) FROM ({union}) m')).scalar()
+
+
+def record_watermark(conn, watermark, full: bool):
+    conn.execute(text(STATE_DDL))
+    conn.execute(text(
+        'INSERT INTO MartRefreshState (MartName, Watermark, RefreshedAt, FullRebuild) '
+        'VALUES (:mart, :watermark, CURRENT_TIMESTAMP, :full) '
+        'ON CONFLICT (MartName) DO UPDATE SET Watermark = EXCLUDED.Watermark, '
+        'RefreshedAt = EXCLUDED.RefreshedAt, FullRebuild = EXCLUDED.FullRebuild'
+    ), {'mart': MART_NAME, 'watermark': watermark, 'full': full})
+
+
+def refresh_incremental(engine, timings: dict = None) -> dict:
+    """Upsert mart rows touched since the stored watermark in one transaction.
+
+    The watermark day itself is refreshed again: loadDate is a DATE, so a
+    second vault load on the same day carries the same loadDate. The upserts
+    are idempotent, re-applying them is harmless. The sales cubes are
+    re-aggregated for the months of the touched facts only.
+    Returns {table: upserted rows}.
+    """
+    counts = {}
+    with engine.begin() as conn:
+        since = read_watermark(conn) or date.min
+        start = time.perf_counter()
+        counts['Calendar'] = load_calendar(conn)
+        if timings is not None:
+            timings['Calendar'] = time.perf_counter() - start
+        # Cube slices of the touched facts as they are before the upsert ...
+        start = time.perf_counter()
+        sales_cubes.create_cubes(conn)
+        sales_cubes.stage_slices(conn, since)
+        cube_seconds = time.perf_counter() - start
+        for table, sql in UPSERTS.items():
+            start = time.perf_counter()
+            counts[table] = conn.execute(text(sql), {'since': since}).rowcount
+            if timings is not None:
+                timings[table] = time.perf_counter() - start
+        # ... and after it, then only those slices are re-aggregated
+        start = time.perf_counter()
+        sales_cubes.mark_slices(conn, since)
+        counts['Cubes'] = sum(sales_cubes.refresh_slices(conn).values())
+        if timings is not None:
+            timings['Cubes'] = cube_seconds + time.perf_counter() - start
+        record_watermark(conn, vault_watermark(conn), full=False)
+    return counts
+
+
+def refresh_full(engine, sql_path: str, timings: dict = None):
+    """Rebuild the whole mart with etl_dv_to_mart.sql and reset the watermark.
+
+    Calendar is loaded first, the script takes DimDate's attributes from it.
+    The mart's secondary indexes are dropped for the reload and rebuilt after it,
+    the sales cubes are rebuilt from the new facts.
+    """
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        watermark = vault_watermark(conn)
+        load_calendar(conn)
+    with indexes_dropped(engine, MART_TABLES):
+        run_sql_file(engine, sql_path)
+    with engine.begin() as conn:
+        sales_cubes.rebuild(conn)
+        record_watermark(conn, watermark, full=True)
+    if timings is not None:
+        timings['full rebuild'] = time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh the Sales Mart from the Data Vault (incremental by default).')
+    parser.add_argument('--host', default='localhost', help='Postgres host')
+    parser.add_argument('--port', default='5432', help='Postgres port')
+    parser.add_argument('--user', default='postgres', help='Postgres username')
+    parser.add_argument('--password', default='postgres', help='Postgres password')
+    parser.add_argument('--db', default='postgres', help='Postgres database name')
+    parser.add_argument('--full', action='store_true', help='Truncate and rebuild the mart with etl_dv_to_mart.sql')
+    parser.add_argument('--mart-sql', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'etl_dv_to_mart.sql'),
+                        help='Path to etl_dv_to_mart.sql (used by --full)')
+    parser.add_argument('--create-mart', action='store_true',
+                        help='Execute sales_mart.sql first (drops and recreates the mart tables)')
+    parser.add_argument('--mart-schema', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sales_mart.sql'),
+                        help='Path to sales_mart.sql (used by --create-mart)')
+    parser.add_argument('--database-url', default=None,
+                        help='SQLAlchemy URL or duckdb:///file.duckdb (embedded, no server); overrides the Postgres options')
+    args = parser.parse_args()
+
+    conn_str = args.database_url or f'postgresql+psycopg2://{args.user}:{quote_plus(args.password)}@{args.host}:{args.port}/{args.db}'
+    engine = create_engine(conn_str)
+    timings = {}
+    if args.create_mart:
+        run_sql_file(engine, args.mart_schema)
+
+    if args.full:
+        refresh_full(engine, args.mart_sql, timings)
+        print('Sales Mart rebuilt (full).')
+    else:
+        counts = refresh_incremental(engine, timings)
+        print('Sales Mart refreshed (rows touched since the last watermark):')
+        for table, rows in counts.items():
+            print(f'  {table:<14}{rows:>10,} rows  {timings[table]:8.2f}s')
+    with engine.connect() as conn:
+        print(f'Watermark: {read_watermark(conn)}')
+    print(f'Total: {sum(timings.values()):.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+"""Pre-aggregated sales cubes over the Sales Mart.
+
+The cubes hold the USD measures of FactSales summed per year/quarter/month x
+country x sales org x product category, so dashboard queries read a few
+hundred cube rows instead of joining and scanning the fact table.
+
+- CubeMonth is aggregated from FactSales; the coarser cubes are rolled up
+  from CubeMonth.
+- mart_refresh.py rebuilds only the slices (months) touched by a load:
+  months of changed facts and of facts of changed products, before and after
+  the upsert, so facts that move to another month are covered.
+- query() answers from the smallest cube that has every requested dimension.
+
+Run as a script to rebuild the cubes or to run a query, optionally timed
+against the same aggregation over FactSales:
+    python sales_cubes.py --by year country --where year=2019 --compare-facts
+"""
+import argparse
+import os
+import sys
+import time
+from urllib.parse import quote_plus
+
+import pandas as pd
+from sqlalchemy import text
+
+# Postgres or embedded DuckDB engine, shared with the Praktikum1 ETL
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Praktikum1'))
+
+from storage_backend import create_engine  # noqa: E402
+
+# Dimension -> (cube column, type, expression over the star schema)
+DIMENSIONS = {
+    'year': ('Year', 'INT4', 'd.Year'),
+    'quarter': ('Quarter', 'INT4', 'd.Quarter'),
+    'month': ('Month', 'INT4', 'd.Month'),
+    'country': ('CountryCode', 'VARCHAR(10)', 'c.CountryCode'),
+    'salesorg': ('SalesOrgID', 'VARCHAR(50)', 's.SalesOrgID'),
+    'category': ('ProductCategoryID', 'VARCHAR(50)', 'p.ProductCategoryID'),
+}
+TIME_DIMENSIONS = ('year', 'quarter', 'month')
+
+# Measure -> (type, aggregate over FactSales); cubes are rolled up with SUM
+MEASURES = {
+    'Transactions': ('INT8', 'COUNT(*)'),
+    'SalesQuantity': ('INT8', 'SUM(f.SalesQuantity)'),
+    'RevenueUSD': ('NUMERIC(18,2)', 'SUM(f.RevenueUSD)'),
+    'DiscountUSD': ('NUMERIC(18,2)', 'SUM(f.DiscountUSD)'),
+    'CostsUSD': ('NUMERIC(18,2)', 'SUM(f.CostsUSD)'),
+    'NetRevenueUSD': ('NUMERIC(18,2)', 'SUM(f.NetRevenueUSD)'),
+    'GrossProfit': ('NUMERIC(18,2)', 'SUM(f.GrossProfit)'),
+}
+# Ratio of the sums, not the average of the per-line margins
+DERIVED = {
+    'GrossProfitMargin': 'ROUND(100 * SUM(GrossProfit) / NULLIF(SUM(NetRevenueUSD), 0), 2)',
+}
+
+# Smallest first: query() takes the first cube with all requested dimensions
+CUBES = {
+    'CubeYearCountry': ('year', 'country'),
+    'CubeYear': ('year', 'country', 'salesorg', 'category'),
+    'CubeQuarter': ('year', 'quarter', 'country', 'salesorg', 'category'),
+    'CubeMonth': ('year', 'quarter', 'month', 'country', 'salesorg', 'category'),
+}
+BASE_CUBE = 'CubeMonth'
+# The base cube is filled first, the others are rolled up from it
+REFRESH_ORDER = [BASE_CUBE] + [cube for cube in CUBES if cube != BASE_CUBE]
+
+STAR_JOIN = '''FactSales f
+        JOIN DimDate d ON d.DateKey = f.DateKey
+        JOIN DimCountry c ON c.CountryKey = f.CountryKey
+        JOIN DimSalesOrg s ON s.SalesOrgKey = f.SalesOrgKey
+        JOIN DimProduct p ON p.ProductKey = f.ProductKey'''
+
+SLICES_DDL = 'CREATE TEMP TABLE stg_cube_slices ON COMMIT DROP AS SELECT Year, Quarter, Month FROM DimDate WITH NO DATA'
+
+# Months of the facts whose cube rows change: facts with a new satellite
+# version and facts of products whose attributes or category changed
+# (same product set as the DimProduct upsert in mart_refresh.py).
+MARK_SLICES = '''
+    INSERT INTO stg_cube_slices (Year, Quarter, Month)
+    SELECT DISTINCT d.Year, d.Quarter, d.Month
+    FROM FactSales f
+    JOIN DimDate d ON d.DateKey = f.DateKey
+    WHERE (f.OrderNumber, f.OrderItem) IN (
+            SELECT h.orderNumber, h.orderItem
+            FROM SatFactSales sfs
+            JOIN HubFactSales h ON h.hubFactSalesId = sfs.hubFactSalesId
+            WHERE sfs.loadDate >= :since
+        )
+       OR f.ProductKey IN (
+            SELECT hubProductId FROM SatProduct WHERE loadDate >= :since
+            UNION
+            SELECT l.hubProductId
+            FROM LinkProductProductCategory l
+            JOIN SatProductCategory spc ON spc.hubProductCategoryId = l.hubProductCategoryId
+            WHERE spc.loadDate >= :since
+        )
+'''
+
+
+def cube_ddl(cube: str) -> str:
+    dimensions = [DIMENSIONS[name] for name in CUBES[cube]]
+    columns = [f'   {column:<20} {kind:<20} NOT NULL' for column, kind, _ in dimensions]
+    columns += [f'   {measure:<20} {kind:<20} NOT NULL' for measure, (kind, _) in MEASURES.items()]
+    key = ', '.join(column for column, _, _ in dimensions)
+    return (f'CREATE TABLE IF NOT EXISTS {cube} (\n' + ',\n'.join(columns) +
+            f',\n   CONSTRAINT PK_{cube.upper()} PRIMARY KEY ({key})\n)')
+
+
+def create_cubes(conn):
+    """Create the cube tables that are missing."""
+    for cube in CUBES:
+        conn.execute(text(cube_ddl(cube)))
+
+
+def _slice_columns(cube: str) -> list:
+    """Time columns that identify a slice of the cube: year and its finest period."""
+    periods = [name for name in ('month', 'quarter') if name in CUBES[cube]]
+    return ['Year'] + ([DIMENSIONS[periods[0]][0]] if periods else [])
+
+
+def _in_slices(cube: str, prefix: str = '') -> str:
+    columns = _slice_columns(cube)
+    qualified = ', '.join(f'{prefix}{column}' for column in columns)
+    return f"({qualified}) IN (SELECT {', '.join(columns)} FROM stg_cube_slices)"
+
+
+def _fill_sql(cube: str, sliced: bool) -> str:
+    """INSERT ... SELECT of one cube, from FactSales (base cube) or rolled up from the base cube."""
+    columns = [DIMENSIONS[name][0] for name in CUBES[cube]] + list(MEASURES)
+    if cube == BASE_CUBE:
+        select = [DIMENSIONS[name][2] for name in CUBES[cube]] + [aggregate for _, aggregate in MEASURES.values()]
+        source, where = STAR_JOIN, _in_slices(cube, 'd.') if sliced else None
+        group = [DIMENSIONS[name][2] for name in CUBES[cube]]
+    else:
+        group = [DIMENSIONS[name][0] for name in CUBES[cube]]
+        select = group + [f'SUM({measure})' for measure in MEASURES]
+        source, where = BASE_CUBE, _in_slices(cube) if sliced else None
+    return (f"INSERT INTO {cube} ({', '.join(columns)})\n"
+            f"        SELECT {', '.join(select)}\n"
+            f"        FROM {source}\n" +
+            (f'        WHERE {where}\n' if where else '') +
+            f"        GROUP BY {', '.join(group)}")
+
+
+def stage_slices(conn, since):
+    """Create the slice table of this transaction and mark the slices touched since the watermark."""
+    conn.execute(text(SLICES_DDL))
+    mark_slices(conn, since)
+
+
+def mark_slices(conn, since):
+    """Add the months of facts changed since the watermark (call before and after the fact upsert)."""
+    conn.execute(text(MARK_SLICES), {'since': since})
+
+
+def refresh_slices(conn) -> dict:
+    """Rebuild the marked slices of every cube, base cube first. Returns {cube: rows written}."""
+    counts = {}
+    for cube in REFRESH_ORDER:
+        conn.execute(text(f'DELETE FROM {cube} WHERE {_in_slices(cube)}'))
+        counts[cube] = conn.execute(text(_fill_sql(cube, sliced=True))).rowcount
+    return counts
+
+
+def rebuild(conn) -> dict:
+    """Rebuild all cubes from FactSales. Returns {cube: rows written}."""
+    create_cubes(conn)
+    counts = {}
+    for cube in REFRESH_ORDER:
+        conn.execute(text(f'DELETE FROM {cube}'))
+        counts[cube] = conn.execute(text(_fill_sql(cube, sliced=False))).rowcount
+    return counts
+
+
+def choose_cube(dimensions) -> str:
+    """Smallest cube that has all the given dimensions."""
+    unknown = set(dimensions) - set(DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Unknown dimensions {sorted(unknown)}; available: {', '.join(DIMENSIONS)}")
+    for cube, available in CUBES.items():
+        if set(dimensions) <= set(available):
+            return cube
+    raise ValueError(f'No cube has all of {sorted(dimensions)}')
+
+
+def _query_sql(source: str, column_of: dict, aggregate_of: dict, by, where: dict, measures) -> tuple:
+    """SELECT over a cube or the star join; returns (sql, parameters, result columns)."""
+    parameters, conditions = {}, []
+    for i, (name, value) in enumerate(where.items()):
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        placeholders = []
+        for j, item in enumerate(values):
+            parameters[f'w{i}_{j}'] = item
+            placeholders.append(f':w{i}_{j}')
+        conditions.append(f"{column_of[name]} IN ({', '.join(placeholders)})")
+    groups = [column_of[name] for name in by]
+    labels = [DIMENSIONS[name][0] for name in by]
+    select = [f'{group} AS {label}' for group, label in zip(groups, labels)]
+    select += [f'{aggregate_of[m]} AS {m}' for m in measures]
+    sql = f"SELECT {', '.join(select)} FROM {source}"
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    if groups:
+        sql += f" GROUP BY {', '.join(groups)} ORDER BY {', '.join(groups)}"
+    return sql, parameters, labels + list(measures)
+
+
+def _cube_aggregates() -> dict:
+    return {**{measure: f'SUM({measure})' for measure in MEASURES}, **DERIVED}
+
+
+def _fact_aggregates() -> dict:
+    """The measures over FactSales; derived measures use the fact aggregates instead of the cube sums."""
+    aggregates = {measure: aggregate for measure, (_, aggregate) in MEASURES.items()}
+    for measure, expression in DERIVED.items():
+        for name in MEASURES:
+            expression = expression.replace(f'SUM({name})', MEASURES[name][1])
+        aggregates[measure] = expression
+    return aggregates
+
+
+def _check_measures(measures) -> list:
+    measures = list(measures or MEASURES)
+    unknown = [m for m in measures if m not in MEASURES and m not in DERIVED]
+    if unknown:
+        raise ValueError(f"Unknown measures {unknown}; available: {', '.join([*MEASURES, *DERIVED])}")
+    return measures
+
+
+def query(engine, by=(), where: dict = None, measures=None) -> pd.DataFrame:
+    """Aggregate the measures by the given dimensions from the smallest matching cube.
+
+    `where` maps dimensions to a value or a list of values, e.g.
+    query(engine, by=['year'], where={'country': 'DE', 'year': [2019, 2020]}).
+    """
+    where = dict(where or {})
+    measures = _check_measures(measures)
+    cube = choose_cube(set(by) | set(where))
+    column_of = {name: DIMENSIONS[name][0] for name in DIMENSIONS}
+    sql, parameters, columns = _query_sql(cube, column_of, _cube_aggregates(), by, where, measures)
+    with engine.connect() as conn:
+        rows = conn.execute(text(sql), parameters).fetchall()
+    return pd.DataFrame(rows, columns=columns)
+
+
+def query_facts(engine, by=(), where: dict = None, measures=None) -> pd.DataFrame:
+    """The same aggregation as query(), computed from FactSales (for checks and timing)."""
+    where = dict(where or {})
+    measures = _check_measures(measures)
+    choose_cube(set(by) | set(where))
+    column_of = {name: DIMENSIONS[name][2] for name in DIMENSIONS}
+    sql, parameters, columns = _query_sql(STAR_JOIN, column_of, _fact_aggregates(), by, where, measures)
+    with engine.connect() as conn:
+        rows = conn.execute(text(sql), parameters).fetchall()
+    return pd.DataFrame(rows, columns=columns)
+
+
+def _parse_where(items) -> dict:
+    """['year=2019,2020', 'country=DE'] -> {'year': [2019, 2020], 'country': ['DE']}"""
+    where = {}
+    for item in items or []:
+        name, _, values = item.partition('=')
+        cast = int if name in TIME_DIMENSIONS else str
+        where[name] = [cast(value) for value in values.split(',')]
+    return where
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild or query the pre-aggregated sales cubes.')
+    parser.add_argument('--host', default='localhost', help='Postgres host')
+    parser.add_argument('--port', default='5432', help='Postgres port')
+    parser.add_argument('--user', default='postgres', help='Postgres username')
+    parser.add_argument('--password', default='postgres', help='Postgres password')
+    parser.add_argument('--db', default='postgres', help='Postgres database name')
+    parser.add_argument('--database-url', default=None,
+                        help='SQLAlchemy URL or duckdb:///file.duckdb (embedded, no server); overrides the Postgres options')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild all cubes from FactSales')
+    parser.add_argument('--by', nargs='*', default=[], choices=DIMENSIONS, help='Dimensions to group by')
+    parser.add_argument('--where', nargs='*', default=[], help='Filters like year=2019,2020 or country=DE')
+    parser.add_argument('--measures', nargs='*', default=None, help='Measures (default: all base measures)')
+    parser.add_argument('--compare-facts', action='store_true',
+                        help='Also run the query over FactSales and compare result and time')
+    args = parser.parse_args()
+
+    conn_str = args.database_url or f'postgresql+psycopg2://{args.user}:{quote_plus(args.password)}@{args.host}:{args.port}/{args.db}'
+    engine = create_engine(conn_str)
+
+    if args.rebuild:
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            counts = rebuild(conn)
+        print(f'Cubes rebuilt in {time.perf_counter() - start:.2f}s:')
+        for cube, rows in counts.items():
+            print(f'  {cube:<16}{rows:>10,} rows')
+        if not args.by and not args.where:
+            return
+
+    where = _parse_where(args.where)
+    print(f'Answered from {choose_cube(set(args.by) | set(where))}')
+    start = time.perf_counter()
+    result = query(engine, args.by, where, args.measures)
+    cube_seconds = time.perf_counter() - start
+    print(result.to_string(index=False))
+    print(f'Cube query: {cube_seconds * 1000:.1f} ms')
+    if args.compare_facts:
+        start = time.perf_counter()
+        facts = query_facts(engine, args.by, where, args.measures)
+        fact_seconds = time.perf_counter() - start
+        same = facts.astype(str).equals(result.astype(str))
+        print(f"FactSales query: {fact_seconds * 1000:.1f} ms ({'same result' if same else 'RESULT DIFFERS'})")
+
+
+if __name__ == '__main__':
+    main()
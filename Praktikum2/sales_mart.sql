@@ -12,12 +12,37 @@ DROP TABLE IF EXISTS DimProduct CASCADE;
 DROP TABLE IF EXISTS DimDate CASCADE;
 DROP TABLE IF EXISTS DimCountry CASCADE;
 DROP TABLE IF EXISTS DimSalesOrg CASCADE;
+DROP TABLE IF EXISTS MartRefreshState CASCADE;
+DROP TABLE IF EXISTS Calendar CASCADE;
+DROP TABLE IF EXISTS CubeYearCountry CASCADE;
+DROP TABLE IF EXISTS CubeYear CASCADE;
+DROP TABLE IF EXISTS CubeQuarter CASCADE;
+DROP TABLE IF EXISTS CubeMonth CASCADE;
+
+/*==============================================================*/
+/* Table: Calendar                                              */
+/* Gap-free date table, generated by Praktikum1/calendar_dim.py */
+/* DateKey: YYYYMMDD, matches HubDate.date                      */
+/*==============================================================*/
+CREATE TABLE Calendar (
+   DateKey              INT4                 NOT NULL,
+   Date                 DATE                 NOT NULL,
+   Year                 INT4                 NOT NULL,
+   Month                INT4                 NOT NULL,
+   Day                  INT4                 NOT NULL,
+   Quarter              INT4                 NOT NULL,
+   MonthName            VARCHAR(20)          NOT NULL,
+   DayOfWeek            INT4                 NOT NULL,
+   DayName              VARCHAR(20)          NOT NULL,
+   IsWeekend            BOOLEAN              NOT NULL,
+   CONSTRAINT PK_CALENDAR PRIMARY KEY (DateKey)
+);
 
 /*==============================================================*/
 /* Dimension: DimDate                                           */
 /*==============================================================*/
 CREATE TABLE DimDate (
-   DateKey              INT4                 NOT NULL,
+   DateKey              INT8                 NOT NULL,
    Date                 DATE                 NOT NULL,
    Year                 INT4                 NOT NULL,
    Month                INT4                 NOT NULL,
@@ -37,7 +62,7 @@ CREATE INDEX IDX_DIMDATE_YEAR_MONTH ON DimDate(Year, Month);
 /* Dimension: DimCountry                                        */
 /*==============================================================*/
 CREATE TABLE DimCountry (
-   CountryKey           INT4                 NOT NULL,
+   CountryKey           INT8                 NOT NULL,
    CountryCode          VARCHAR(10)          NOT NULL,
    CountryName          VARCHAR(100)         NOT NULL,
    CONSTRAINT PK_DIMCOUNTRY PRIMARY KEY (CountryKey)
@@ -49,7 +74,7 @@ CREATE UNIQUE INDEX IDX_DIMCOUNTRY_CODE ON DimCountry(CountryCode);
 /* Dimension: DimSalesOrg                                       */
 /*==============================================================*/
 CREATE TABLE DimSalesOrg (
-   SalesOrgKey          INT4                 NOT NULL,
+   SalesOrgKey          INT8                 NOT NULL,
    SalesOrgID           VARCHAR(50)          NOT NULL,
    CONSTRAINT PK_DIMSALESORG PRIMARY KEY (SalesOrgKey)
 );
@@ -60,7 +85,7 @@ CREATE UNIQUE INDEX IDX_DIMSALESORG_ID ON DimSalesOrg(SalesOrgID);
 /* Dimension: DimCustomer                                       */
 /*==============================================================*/
 CREATE TABLE DimCustomer (
-   CustomerKey          INT4                 NOT NULL,
+   CustomerKey          INT8                 NOT NULL,
    CustomerID           VARCHAR(50)          NOT NULL,
    CustomerName         VARCHAR(254)         NOT NULL,
    City                 VARCHAR(100)         NOT NULL,
@@ -73,7 +98,7 @@ CREATE UNIQUE INDEX IDX_DIMCUSTOMER_ID ON DimCustomer(CustomerID);
 /* Dimension: DimProduct                                        */
 /*==============================================================*/
 CREATE TABLE DimProduct (
-   ProductKey           INT4                 NOT NULL,
+   ProductKey           INT8                 NOT NULL,
    ProductID            VARCHAR(50)          NOT NULL,
    ProductName          VARCHAR(254)         NOT NULL,
    ProductCategoryID    VARCHAR(50)          NOT NULL,
@@ -90,11 +115,11 @@ CREATE UNIQUE INDEX IDX_DIMPRODUCT_ID ON DimProduct(ProductID);
 /*==============================================================*/
 CREATE TABLE FactSales (
    SalesKey             SERIAL               NOT NULL,
-   DateKey              INT4                 NOT NULL,
-   CustomerKey          INT4                 NOT NULL,
-   ProductKey           INT4                 NOT NULL,
-   SalesOrgKey          INT4                 NOT NULL,
-   CountryKey           INT4                 NOT NULL,
+   DateKey              INT8                 NOT NULL,
+   CustomerKey          INT8                 NOT NULL,
+   ProductKey           INT8                 NOT NULL,
+   SalesOrgKey          INT8                 NOT NULL,
+   CountryKey           INT8                 NOT NULL,
    OrderNumber          INT4                 NOT NULL,
    OrderItem            INT4                 NOT NULL,
    SalesQuantity        INT4                 NOT NULL,
@@ -109,7 +134,8 @@ CREATE TABLE FactSales (
    NetRevenueUSD        NUMERIC(15,2)        NOT NULL,
    GrossProfit          NUMERIC(15,2)        NOT NULL,
    GrossProfitMargin    NUMERIC(5,2)         NULL,
-   CONSTRAINT PK_FACTSALES PRIMARY KEY (SalesKey)
+   CONSTRAINT PK_FACTSALES PRIMARY KEY (SalesKey),
+   CONSTRAINT AK_FACTSALES_ORDER UNIQUE (OrderNumber, OrderItem)
 );
 
 -- Foreign Key Constraints
@@ -144,11 +170,86 @@ CREATE INDEX IDX_FACTSALES_CUSTOMER ON FactSales(CustomerKey);
 CREATE INDEX IDX_FACTSALES_PRODUCT ON FactSales(ProductKey);
 CREATE INDEX IDX_FACTSALES_SALESORG ON FactSales(SalesOrgKey);
 CREATE INDEX IDX_FACTSALES_COUNTRY ON FactSales(CountryKey);
-CREATE INDEX IDX_FACTSALES_ORDER ON FactSales(OrderNumber, OrderItem);
 CREATE INDEX IDX_FACTSALES_DATE_PRODUCT ON FactSales(DateKey, ProductKey);
 CREATE INDEX IDX_FACTSALES_DATE_CUSTOMER ON FactSales(DateKey, CustomerKey);
 CREATE INDEX IDX_FACTSALES_DATE_COUNTRY ON FactSales(DateKey, CountryKey);
 
+/*==============================================================*/
+/* Refresh state: watermark of the incremental mart refresh     */
+/*==============================================================*/
+CREATE TABLE MartRefreshState (
+   MartName             VARCHAR(50)          NOT NULL,
+   Watermark            DATE                 NULL,
+   RefreshedAt          TIMESTAMP            NOT NULL,
+   FullRebuild          BOOLEAN              NOT NULL,
+   CONSTRAINT PK_MARTREFRESHSTATE PRIMARY KEY (MartName)
+);
+
+/*==============================================================*/
+/* Sales cubes: USD measures pre-aggregated per period x        */
+/* country x sales org x product category (sales_cubes.py)      */
+/*==============================================================*/
+CREATE TABLE CubeYearCountry (
+   Year                 INT4                 NOT NULL,
+   CountryCode          VARCHAR(10)          NOT NULL,
+   Transactions         INT8                 NOT NULL,
+   SalesQuantity        INT8                 NOT NULL,
+   RevenueUSD           NUMERIC(18,2)        NOT NULL,
+   DiscountUSD          NUMERIC(18,2)        NOT NULL,
+   CostsUSD             NUMERIC(18,2)        NOT NULL,
+   NetRevenueUSD        NUMERIC(18,2)        NOT NULL,
+   GrossProfit          NUMERIC(18,2)        NOT NULL,
+   CONSTRAINT PK_CUBEYEARCOUNTRY PRIMARY KEY (Year, CountryCode)
+);
+
+CREATE TABLE CubeYear (
+   Year                 INT4                 NOT NULL,
+   CountryCode          VARCHAR(10)          NOT NULL,
+   SalesOrgID           VARCHAR(50)          NOT NULL,
+   ProductCategoryID    VARCHAR(50)          NOT NULL,
+   Transactions         INT8                 NOT NULL,
+   SalesQuantity        INT8                 NOT NULL,
+   RevenueUSD           NUMERIC(18,2)        NOT NULL,
+   DiscountUSD          NUMERIC(18,2)        NOT NULL,
+   CostsUSD             NUMERIC(18,2)        NOT NULL,
+   NetRevenueUSD        NUMERIC(18,2)        NOT NULL,
+   GrossProfit          NUMERIC(18,2)        NOT NULL,
+   CONSTRAINT PK_CUBEYEAR PRIMARY KEY (Year, CountryCode, SalesOrgID, ProductCategoryID)
+);
+
+CREATE TABLE CubeQuarter (
+   Year                 INT4                 NOT NULL,
+   Quarter              INT4                 NOT NULL,
+   CountryCode          VARCHAR(10)          NOT NULL,
+   SalesOrgID           VARCHAR(50)          NOT NULL,
+   ProductCategoryID    VARCHAR(50)          NOT NULL,
+   Transactions         INT8                 NOT NULL,
+   SalesQuantity        INT8                 NOT NULL,
+   RevenueUSD           NUMERIC(18,2)        NOT NULL,
+   DiscountUSD          NUMERIC(18,2)        NOT NULL,
+   CostsUSD             NUMERIC(18,2)        NOT NULL,
+   NetRevenueUSD        NUMERIC(18,2)        NOT NULL,
+   GrossProfit          NUMERIC(18,2)        NOT NULL,
+   CONSTRAINT PK_CUBEQUARTER PRIMARY KEY (Year, Quarter, CountryCode, SalesOrgID, ProductCategoryID)
+);
+
+CREATE TABLE CubeMonth (
+   Year                 INT4                 NOT NULL,
+   Quarter              INT4                 NOT NULL,
+   Month                INT4                 NOT NULL,
+   CountryCode          VARCHAR(10)          NOT NULL,
+   SalesOrgID           VARCHAR(50)          NOT NULL,
+   ProductCategoryID    VARCHAR(50)          NOT NULL,
+   Transactions         INT8                 NOT NULL,
+   SalesQuantity        INT8                 NOT NULL,
+   RevenueUSD           NUMERIC(18,2)        NOT NULL,
+   DiscountUSD          NUMERIC(18,2)        NOT NULL,
+   CostsUSD             NUMERIC(18,2)        NOT NULL,
+   NetRevenueUSD        NUMERIC(18,2)        NOT NULL,
+   GrossProfit          NUMERIC(18,2)        NOT NULL,
+   CONSTRAINT PK_CUBEMONTH PRIMARY KEY (Year, Quarter, Month, CountryCode, SalesOrgID, ProductCategoryID)
+);
+
 /*==============================================================*/
 /* Comments                                                     */
 /*==============================================================*/
@@ -158,6 +259,11 @@ COMMENT ON TABLE DimSalesOrg IS 'Sales organization dimension';
 COMMENT ON TABLE DimCustomer IS 'Customer dimension';
 COMMENT ON TABLE DimProduct IS 'Product dimension with category denormalization';
 COMMENT ON TABLE FactSales IS 'Sales fact table with direct references to all dimensions (star schema)';
+COMMENT ON TABLE MartRefreshState IS 'Satellite loadDate up to which the mart is current (mart_refresh.py)';
+COMMENT ON TABLE CubeMonth IS 'FactSales USD measures per month, country, sales org and product category';
+COMMENT ON TABLE CubeQuarter IS 'CubeMonth rolled up to quarters';
+COMMENT ON TABLE CubeYear IS 'CubeMonth rolled up to years';
+COMMENT ON TABLE CubeYearCountry IS 'CubeMonth rolled up to years and countries';
 
 COMMENT ON COLUMN FactSales.CountryKey IS 'Direct reference to country dimension (star schema pattern)';
 COMMENT ON COLUMN FactSales.NetRevenue IS 'Revenue - Discount in original currency';
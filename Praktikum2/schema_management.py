@@ -0,0 +1,217 @@
+"""Index and partition management for the Data Vault and Sales Mart schemas.
+
+- Join indexes: (hub key, loadDate DESC) on every satellite. They serve the
+  "latest version per hub key" lookups in the hashdiff delta insert and in
+  etl_dv_to_mart.sql / mart_refresh.py.
+- Partitions: SatFactSales is range-partitioned by loadDate (crebas.sql).
+  One partition per month is created before each load, and rows outside
+  them land in the default partition.
+- Bulk loads: secondary indexes are dropped before loading into an empty
+  schema and rebuilt afterwards (one sort per index instead of row-by-row
+  maintenance).
+
+Run as a script to time the mart build with and without the join indexes.
+"""
+import argparse
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date
+from urllib.parse import quote_plus
+
+from sqlalchemy import text
+
+# Postgres or embedded DuckDB engine, shared with the Praktikum1 ETL
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Praktikum1'))
+
+from storage_backend import create_engine  # noqa: E402
+
+VAULT_TABLES = (
+    'hubcountry', 'hubcustomer', 'hubdate', 'hubfactsales', 'hubproduct', 'hubproductcategory', 'hubsalesorg',
+    'linkcustomercountry', 'linkfactsales', 'linkproductproductcategory', 'linksalesorgcountry',
+    'satcountry', 'satcustomer', 'satdate', 'satfactsales', 'satproduct', 'satproductcategory', 'satsalesorg',
+)
+MART_TABLES = ('dimdate', 'dimcountry', 'dimsalesorg', 'dimcustomer', 'dimproduct', 'factsales')
+
+# Satellite -> hub key column
+SATELLITE_KEYS = {
+    'satcountry': 'hubCountryId',
+    'satcustomer': 'hubCustomerId',
+    'satdate': 'hubDateId',
+    'satfactsales': 'hubFactSalesId',
+    'satproduct': 'hubProductId',
+    'satproductcategory': 'hubProductCategoryId',
+    'satsalesorg': 'hubSalesOrgId',
+}
+
+JOIN_INDEXES = {f'idx_{sat}_latest': (sat, f'{key}, loadDate DESC') for sat, key in SATELLITE_KEYS.items()}
+
+# Tables range-partitioned by loadDate, one partition per month
+PARTITIONED_TABLES = ('satfactsales',)
+
+
+def run_sql_file(engine, sql_path: str):
+    """Execute all statements in a SQL file."""
+    with open(sql_path, 'r', encoding='utf-8') as f:
+        sql_text = f.read()
+    statements = [stmt.strip() for stmt in sql_text.split(';') if stmt.strip()]
+    with engine.begin() as conn:
+        for stmt in statements:
+            conn.execute(text(stmt))
+
+
+def _is_postgres(engine) -> bool:
+    return engine.dialect.name == 'postgresql'
+
+
+def create_join_indexes(engine, timings: dict = None):
+    """Create the satellite join indexes that are missing."""
+    if not _is_postgres(engine):
+        return
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for name, (table, columns) in JOIN_INDEXES.items():
+            conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})'))
+    if timings is not None:
+        timings['join indexes'] = timings.get('join indexes', 0.0) + time.perf_counter() - start
+
+
+def _month_bounds(day: date) -> tuple:
+    first = day.replace(day=1)
+    following = first.replace(year=first.year + 1, month=1) if first.month == 12 else first.replace(month=first.month + 1)
+    return first, following
+
+
+def ensure_partitions(engine, load_dt: date):
+    """Create the monthly partition covering load_dt for every partitioned table.
+
+    Tables that are not partitioned (schemas created before crebas.sql
+    partitioned SatFactSales) are skipped.
+    """
+    if not _is_postgres(engine):
+        return
+    first, following = _month_bounds(load_dt)
+    with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            partitioned = conn.execute(text(
+                'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)'
+            ), {'table': table}).scalar()
+            if not partitioned:
+                continue
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {table}_p{first:%Y%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{first.isoformat()}') TO ('{following.isoformat()}')"
+            ))
+
+
+def secondary_indexes(conn, tables) -> dict:
+    """Indexes on the tables that do not back a constraint: {name: definition}.
+
+    Definitions of partitioned indexes read "ON ONLY <table>"; without ONLY
+    they are recreated on all partitions again.
+    """
+    rows = conn.execute(text(
+        'SELECT i.indexname, i.indexdef FROM pg_indexes i '
+        'WHERE i.schemaname = current_schema() AND i.tablename = ANY(:tables) '
+        'AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = to_regclass(i.indexname))'
+    ), {'tables': list(tables)})
+    return {name: definition.replace(' ON ONLY ', ' ON ', 1) for name, definition in rows}
+
+
+@contextmanager
+def indexes_dropped(engine, tables=VAULT_TABLES, timings: dict = None):
+    """Drop the secondary indexes of the tables for a bulk load, rebuild them afterwards.
+
+    Meant for loads into empty tables: the delta inserts of later loads look
+    up existing rows and need the indexes. Indexes are rebuilt (and the
+    tables analyzed) even if the load fails.
+    """
+    if not _is_postgres(engine):
+        yield
+        return
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        definitions = secondary_indexes(conn, tables)
+        for name in definitions:
+            conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+    if timings is not None:
+        timings['indexes dropped'] = time.perf_counter() - start
+    try:
+        yield
+    finally:
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            for definition in definitions.values():
+                conn.execute(text(definition))
+            for table in tables:
+                conn.execute(text(f'ANALYZE {table}'))
+        if timings is not None:
+            timings['indexes rebuilt'] = time.perf_counter() - start
+
+
+def prepare_schema(engine, crebas_path: str = None, load_dt: date = None, timings: dict = None):
+    """Schema step of the load: optional crebas.sql, join indexes, partitions for load_dt."""
+    if crebas_path:
+        run_sql_file(engine, crebas_path)
+    create_join_indexes(engine, timings)
+    ensure_partitions(engine, load_dt or date.today())
+
+
+def time_mart_build(engine, mart_sql: str) -> float:
+    """Seconds for a full etl_dv_to_mart.sql run."""
+    start = time.perf_counter()
+    run_sql_file(engine, mart_sql)
+    return time.perf_counter() - start
+
+
+def benchmark_mart(engine, mart_sql: str, repeat: int = 3) -> dict:
+    """Best-of-n mart build time without and with the satellite join indexes."""
+    with engine.begin() as conn:
+        for name in JOIN_INDEXES:
+            conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+    without = min(time_mart_build(engine, mart_sql) for _ in range(repeat))
+    create_join_indexes(engine)
+    with engine.begin() as conn:
+        for table in SATELLITE_KEYS:
+            conn.execute(text(f'ANALYZE {table}'))
+    with_indexes = min(time_mart_build(engine, mart_sql) for _ in range(repeat))
+    return {'without join indexes': without, 'with join indexes': with_indexes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create Data Vault join indexes and partitions, or time the mart build.')
+    parser.add_argument('--host', default='localhost', help='Postgres host')
+    parser.add_argument('--port', default='5432', help='Postgres port')
+    parser.add_argument('--user', default='postgres', help='Postgres username')
+    parser.add_argument('--password', default='postgres', help='Postgres password')
+    parser.add_argument('--db', default='postgres', help='Postgres database name')
+    parser.add_argument('--benchmark-mart', action='store_true',
+                        help='Time etl_dv_to_mart.sql without and with the join indexes (rebuilds the mart)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per variant for --benchmark-mart (best is kept)')
+    parser.add_argument('--mart-sql', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'etl_dv_to_mart.sql'),
+                        help='Path to etl_dv_to_mart.sql')
+    parser.add_argument('--database-url', default=None,
+                        help='SQLAlchemy URL or duckdb:///file.duckdb (embedded, no server); overrides the Postgres options')
+    args = parser.parse_args()
+
+    conn_str = args.database_url or f'postgresql+psycopg2://{args.user}:{quote_plus(args.password)}@{args.host}:{args.port}/{args.db}'
+    engine = create_engine(conn_str)
+
+    if args.benchmark_mart:
+        results = benchmark_mart(engine, args.mart_sql, args.repeat)
+        print(f'Mart build (best of {args.repeat}):')
+        for variant, seconds in results.items():
+            print(f'  {variant:<24}{seconds:8.2f}s')
+        return
+
+    timings = {}
+    prepare_schema(engine, timings=timings)
+    if not _is_postgres(engine):
+        print(f'Nothing to do on {engine.dialect.name}: join indexes and partitions are Postgres-only.')
+        return
+    print(f"Join indexes and partitions are in place ({timings['join indexes']:.2f}s).")
+
+
+if __name__ == '__main__':
+    main()
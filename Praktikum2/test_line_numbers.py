@@ -0,0 +1,42 @@
+"""Line numbers of quarantined rows after blank lines, quoted line breaks and malformed lines."""
+import pytest
+
+from etl_salesdata import IngestStats, Quarantine, iter_sales_csv
+
+HEADER = ('OrderNumber;OrderItem;Date;Customer;CustDescr;City;SalesOrg;Country;Product;ProdDescr;ProdCat;'
+          'CatDescr;Division;SalesQuantity;UnitOfMeasure;Revenue;Currency;Discount;RevenueUSD;DiscountUSD;CostsUSD')
+
+
+def _row(item, customer='Customer 1', costs='10,00'):
+    return (f'100000;{item};05.09.12;1;{customer};Munich;DE00;DE;BIK1;Product 1;BIK;Bikes;BI;1;ST;'
+            f'20,00;EUR;0,00;22,00;0,00;{costs}')
+
+
+LINES = [
+    HEADER,                                   # 1
+    _row(10),                                 # 2
+    '',                                       # 3
+    _row(20),                                 # 4
+    _row(30, customer='"Customer\n1"'),       # 5-6
+    _row(40, costs='abc'),                    # 7
+    _row(50) + ';extra',                      # 8
+    _row(60, costs='xyz'),                    # 9
+    _row(70),                                 # 10
+]
+
+
+@pytest.mark.parametrize('parser, chunksize', [('c', None), ('c', 2), ('pyarrow', None)])
+def test_quarantine_reports_file_lines(tmp_path, parser, chunksize):
+    csv_path = tmp_path / 'SalesData.csv'
+    csv_path.write_text('\n'.join(LINES) + '\n', encoding='utf-8')
+    quarantine = Quarantine(str(tmp_path / 'quarantine.txt'), str(csv_path))
+    stats = IngestStats(parser)
+    validation_errors = []
+
+    frames = list(iter_sales_csv(str(csv_path), parser=parser, chunksize=chunksize, quarantine=quarantine,
+                                 stats=stats, validation_errors=validation_errors))
+
+    assert sorted(line for line, _, _ in quarantine.entries) == [7, 8, 9]
+    assert sum(len(frame) for frame in frames) == stats.rows == 4
+    assert stats.quarantined == 3
+    assert {e['row_num'] for e in validation_errors} == {7, 9}
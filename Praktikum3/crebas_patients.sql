@@ -0,0 +1,103 @@
+/*==============================================================*/
+/* DBMS name:      PostgreSQL 11+                               */
+/* Multi-site patient data (PatientInnenDaten)                  */
+/*==============================================================*/
+
+drop table if exists Messwert cascade;
+
+drop table if exists Anamnese cascade;
+
+drop table if exists Patient cascade;
+
+drop table if exists Standort cascade;
+
+drop table if exists DiagnoseCode cascade;
+
+/*==============================================================*/
+/* Table: Standort                                              */
+/*==============================================================*/
+create table Standort (
+   site                 VARCHAR(100)         not null,
+   typ                  VARCHAR(50)          not null,
+   ort                  VARCHAR(100)         not null,
+   constraint PK_STANDORT primary key (site)
+);
+
+/*==============================================================*/
+/* Table: DiagnoseCode                                          */
+/* Recorded ICD codes classified with the ICD-10-GM catalog     */
+/* treffer: exact, prefix, group or null (not in the catalog)   */
+/*==============================================================*/
+create table DiagnoseCode (
+   icdCode              VARCHAR(20)          not null,
+   katalogCode          VARCHAR(20)          null,
+   titel                VARCHAR(512)         null,
+   gruppe               VARCHAR(10)          null,
+   gruppenTitel         VARCHAR(512)         null,
+   kapitel              INT2                 null,
+   kapitelTitel         VARCHAR(512)         null,
+   treffer              VARCHAR(10)          null,
+   constraint PK_DIAGNOSECODE primary key (icdCode)
+);
+
+/*==============================================================*/
+/* Table: Patient                                               */
+/* patientKey: hash key of '<site>/<id>', unique across sites   */
+/*==============================================================*/
+create table Patient (
+   site                 VARCHAR(100)         not null,
+   patientKey           INT8                 not null,
+   siteId               INT4                 not null,
+   nachname             VARCHAR(254)         null,
+   vorname              VARCHAR(254)         null,
+   geburtsdatum         DATE                 null,
+   versicherung         VARCHAR(50)          null,
+   geschlecht           CHAR(1)              null,
+   constraint PK_PATIENT primary key (patientKey),
+   constraint AK_PATIENT_SITE_ID unique (site, siteId)
+);
+
+/*==============================================================*/
+/* Table: Anamnese                                              */
+/* One row per recorded ICD code (anamnese1 -> nr 1, ...)       */
+/*==============================================================*/
+create table Anamnese (
+   patientKey           INT8                 not null,
+   nr                   INT2                 not null,
+   icdCode              VARCHAR(20)          not null,
+   constraint PK_ANAMNESE primary key (patientKey, nr)
+);
+
+create index IDX_ANAMNESE_ICD on Anamnese (icdCode);
+
+/*==============================================================*/
+/* Table: Messwert                                              */
+/* visusCode: CF/HM/LP/NLP when no numeric visus was measured   */
+/*==============================================================*/
+create table Messwert (
+   patientKey           INT8                 not null,
+   diagnose             VARCHAR(20)          null,
+   tensio               NUMERIC              null,
+   refraktion           NUMERIC              null,
+   visus                NUMERIC              null,
+   visusCode            VARCHAR(10)          null,
+   untersuchungsdatum   DATE                 not null,
+   constraint PK_MESSWERT primary key (patientKey, untersuchungsdatum)
+);
+
+create index IDX_MESSWERT_DIAGNOSE on Messwert (diagnose);
+
+alter table Patient
+   add constraint FK_PATIENT_STANDORT foreign key (site)
+      references Standort (site)
+      on delete restrict on update restrict;
+
+alter table Anamnese
+   add constraint FK_ANAMNESE_PATIENT foreign key (patientKey)
+      references Patient (patientKey)
+      on delete restrict on update restrict;
+
+alter table Messwert
+   add constraint FK_MESSWERT_PATIENT foreign key (patientKey)
+      references Patient (patientKey)
+      on delete restrict on update restrict;
@@ -0,0 +1,279 @@
+"""ETL of the multi-site patient data (PatientInnenDaten) into Postgres.
+
+Every site (praxis_*, uniklinik_*) delivers three CSV files:
+<site>_stammdaten.csv, <site>_anamnesen.csv and <site>_messwerte.csv. The
+files are discovered by name, parsed in a process pool (one task per file)
+and tagged with their site. Site-local ids are only unique within a site, so
+every row gets a global patientKey: the hash key of '<site>/<id>', computed
+like the Data Vault hub keys of the sales ETL.
+"""
+import argparse
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import quote_plus
+
+import numpy as np
+import pandas as pd
+
+# Shared modules: bulk writer of the sales ETL (Praktikum2), instrumentation and storage backend (Praktikum1)
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'Praktikum2'))
+
+from etl_salesdata import hash_key, print_timings, write_metrics, write_tables  # noqa: E402
+from schema_management import run_sql_file  # noqa: E402
+from instrumentation import RunMetrics  # noqa: E402
+from storage_backend import create_engine  # noqa: E402
+from icd_index import DEFAULT_CACHE, DEFAULT_ICD_DIR, IcdIndex  # noqa: E402
+
+DEFAULT_DATA_DIR = os.path.join(HERE, 'Patient_innen-Daten-20251111', 'PatientInnenDaten')
+
+SITE_FILE = re.compile(r'^(?P<site>(?:praxis|uniklinik)_[a-z_]+?)_(?P<kind>stammdaten|anamnesen|messwerte)\.csv$')
+KINDS = ('stammdaten', 'anamnesen', 'messwerte')
+
+# Column schema per file kind: string, int, float (decimal point) or date (DD.MM.YYYY)
+SCHEMAS = {
+    'stammdaten': {'id': 'int', 'nachname': 'string', 'vorname': 'string', 'geburtsdatum': 'date',
+                   'versicherung': 'string', 'geschlecht': 'string'},
+    'anamnesen': {'id': 'int', 'anamnese1': 'string', 'anamnese2': 'string'},
+    'messwerte': {'id': 'int', 'diagnose': 'string', 'tensio': 'float', 'refraktion': 'float', 'visus': 'float',
+                  'untersuchungsdatum': 'date'},
+}
+DATE_FORMAT = '%d.%m.%Y'
+
+# Visual acuity below the chart is recorded as a code instead of a number
+VISUS_CODES = {'CF': 'CF', 'FC': 'CF', 'HM': 'HM', 'LP': 'LP', 'NLP': 'NLP'}
+
+# Target table -> key columns for the delta insert; written tier by tier
+TABLE_KEYS = {
+    'standort': ['site'],
+    'diagnosecode': ['icdCode'],
+    'patient': ['patientKey'],
+    'anamnese': ['patientKey', 'nr'],
+    'messwert': ['patientKey', 'untersuchungsdatum'],
+}
+TIERS = (('standort', 'diagnosecode'), ('patient',), ('anamnese', 'messwert'))
+
+PROFILE_STAGES = ('parse_files', 'build_tables', 'write_tables')
+
+
+def discover_sites(data_dir: str) -> dict:
+    """{site: {kind: path}} for all site files in data_dir."""
+    sites = {}
+    for name in sorted(os.listdir(data_dir)):
+        match = SITE_FILE.match(name)
+        if match:
+            sites.setdefault(match['site'], {})[match['kind']] = os.path.join(data_dir, name)
+    return sites
+
+
+def decode(raw: bytes) -> tuple:
+    """Text and encoding of a file: UTF-8, or Latin-1 for the ISO-8859 exports."""
+    try:
+        return raw.decode('utf-8-sig'), 'utf-8'
+    except UnicodeDecodeError:
+        return raw.decode('latin-1'), 'latin-1'
+
+
+def parse_site_file(task: tuple) -> dict:
+    """Read and type one site file (runs in a worker process).
+
+    Returns the typed frame with site and patientKey columns, plus the
+    encoding and the number of values that could not be converted.
+    """
+    site, kind, path = task
+    with open(path, 'rb') as f:
+        text, encoding = decode(f.read())
+    # Some exports mix CRLF and bare CR line ends; the C parser accepts both
+    raw = pd.read_csv(io.StringIO(text), sep=';', dtype=str, keep_default_na=False)
+    raw = raw.apply(lambda col: col.str.strip()).replace('', None)
+
+    df = pd.DataFrame(index=raw.index)
+    invalid = 0
+    for column, kind_of in SCHEMAS[kind].items():
+        values = raw[column] if column in raw.columns else pd.Series(None, index=raw.index, dtype=object)
+        if kind_of == 'int':
+            typed = pd.to_numeric(values, errors='coerce').astype('Int64')
+        elif kind_of == 'float':
+            typed = pd.to_numeric(values, errors='coerce')
+        elif kind_of == 'date':
+            typed = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+        else:
+            typed = values.astype('string')
+        df[column] = typed
+        if column == 'visus':
+            df['visusCode'] = values.str.upper().map(VISUS_CODES).astype('string')
+            invalid += int((typed.isna() & values.notna() & df['visusCode'].isna()).sum())
+        else:
+            invalid += int((typed.isna() & values.notna()).sum())
+
+    df.insert(0, 'site', site)
+    df.insert(1, 'patientKey', hash_key(site + '/' + df['id'].astype('string')).to_numpy())
+    return {'site': site, 'kind': kind, 'frame': df, 'encoding': encoding, 'invalid': invalid}
+
+
+def parse_all(sites: dict, workers: int) -> list:
+    """Parse all site files, largest first so the pool stays busy."""
+    tasks = [(site, kind, path) for site, files in sites.items() for kind, path in files.items()]
+    tasks.sort(key=lambda task: os.path.getsize(task[2]), reverse=True)
+    if workers <= 1:
+        return [parse_site_file(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(parse_site_file, tasks))
+
+
+def _combined(results: list, kind: str) -> pd.DataFrame:
+    frames = [r['frame'] for r in sorted(results, key=lambda r: r['site']) if r['kind'] == kind]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['site', 'patientKey'])
+
+
+def diagnosis_codes(codes: pd.Series, icd: IcdIndex) -> pd.DataFrame:
+    """One row per distinct recorded ICD code with its catalog code, group and chapter."""
+    distinct = pd.Series(codes.dropna().unique(), dtype='string').sort_values(ignore_index=True)
+    classified = icd.classify(distinct)
+    return pd.DataFrame({
+        'icdCode': distinct,
+        'katalogCode': classified['catalogCode'],
+        'titel': classified['title'],
+        'gruppe': classified['groupRange'],
+        'gruppenTitel': classified['groupTitle'],
+        'kapitel': classified['chapter'],
+        'kapitelTitel': classified['chapterTitle'],
+        'treffer': classified['match'],
+    })
+
+
+def build_tables(results: list, icd: IcdIndex) -> tuple:
+    """Combined target tables from the parsed site files.
+
+    Rows without a usable key (id, or the examination date of a
+    measurement) cannot be merged and are counted as rejected.
+    Returns (tables, rejected rows per table).
+    """
+    rejected = {}
+
+    def keep(name, df, columns):
+        valid = df[columns].notna().all(axis=1)
+        rejected[name] = int((~valid).sum())
+        return df[valid].reset_index(drop=True)
+
+    stammdaten = keep('patient', _combined(results, 'stammdaten'), ['id'])
+    patient = stammdaten.rename(columns={'id': 'siteId'})
+
+    anamnesen = keep('anamnese', _combined(results, 'anamnesen'), ['id'])
+    anamnese = anamnesen.melt(id_vars=['patientKey'], value_vars=['anamnese1', 'anamnese2'],
+                              var_name='nr', value_name='icdCode')
+    anamnese = anamnese[anamnese['icdCode'].notna()]
+    anamnese['nr'] = anamnese['nr'].str[-1].astype(np.int16)
+    anamnese = anamnese.sort_values(['patientKey', 'nr'], kind='stable').reset_index(drop=True)
+
+    messwert = keep('messwert', _combined(results, 'messwerte'), ['id', 'untersuchungsdatum'])
+    messwert = messwert.drop(columns=['id', 'site'])
+
+    sites = sorted({r['site'] for r in results})
+    standort = pd.DataFrame({
+        'site': sites,
+        'typ': [s.split('_', 1)[0] for s in sites],
+        'ort': [s.split('_', 1)[1].replace('_', ' ').title() for s in sites],
+    })
+    diagnosecode = diagnosis_codes(pd.concat([anamnese['icdCode'], messwert['diagnose']]), icd)
+    tables = {'standort': standort, 'diagnosecode': diagnosecode, 'patient': patient,
+              'anamnese': anamnese, 'messwert': messwert}
+    return tables, rejected
+
+
+def load(engine, data_dir: str, workers: int = 1, timings: dict = None, metrics: RunMetrics = None,
+         icd: IcdIndex = None) -> dict:
+    """Discover, parse, combine and write all site files. Returns a summary dict."""
+    def stage(name, rows_in=0):
+        return metrics.stage(name, rows_in) if metrics is not None else nullcontext()
+
+    sites = discover_sites(data_dir)
+    incomplete = {site: sorted(set(KINDS) - set(files)) for site, files in sites.items() if len(files) < len(KINDS)}
+
+    start = time.perf_counter()
+    with stage('parse_files') as record:
+        results = parse_all(sites, workers)
+        if record is not None:
+            record.rows_out += sum(len(r['frame']) for r in results)
+    parse_seconds = time.perf_counter() - start
+
+    with stage('build_tables'):
+        tables, rejected = build_tables(results, icd if icd is not None else IcdIndex.cached())
+
+    inserted = {}
+    for tier in TIERS:
+        group = {name: tables[name] for name in tier}
+        with stage('write_tables', sum(len(df) for df in group.values())):
+            inserted.update(write_tables(engine, group, workers, timings, TABLE_KEYS))
+
+    return {
+        'sites': len(sites),
+        'files': len(results),
+        'incomplete': incomplete,
+        'latin1_files': sorted(f"{r['site']}_{r['kind']}" for r in results if r['encoding'] == 'latin-1'),
+        'invalid_values': sum(r['invalid'] for r in results),
+        'rejected': rejected,
+        'unknown_icd': int(tables['diagnosecode']['treffer'].isna().sum()),
+        'inserted': inserted,
+        'parse_seconds': parse_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ETL of the multi-site patient CSVs to Postgres.')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Directory with the <site>_<kind>.csv files')
+    parser.add_argument('--host', default='localhost', help='Postgres host')
+    parser.add_argument('--port', default='5432', help='Postgres port')
+    parser.add_argument('--user', default='postgres', help='Postgres username')
+    parser.add_argument('--password', default='postgres', help='Postgres password')
+    parser.add_argument('--db', default='postgres', help='Postgres database name')
+    parser.add_argument('--run-crebas', action='store_true', help='Execute crebas_patients.sql before loading')
+    parser.add_argument('--database-url', default=None,
+                        help='SQLAlchemy URL or duckdb:///file.duckdb (embedded, no server); overrides the Postgres options')
+    parser.add_argument('--crebas', default=os.path.join(HERE, 'crebas_patients.sql'), help='Path to crebas_patients.sql')
+    parser.add_argument('--icd-dir', default=DEFAULT_ICD_DIR, help='Directory with the ICD_*.csv catalog files')
+    parser.add_argument('--icd-cache', default=DEFAULT_CACHE, help='Prebuilt ICD index (.npz), rebuilt when the catalog changes')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Parser processes and concurrent table writers')
+    parser.add_argument('--metrics-report', default=None, help='Write a JSON run report (per-stage time, rows, RSS)')
+    parser.add_argument('--profile-stage', default=None, choices=PROFILE_STAGES, help='Record this stage with cProfile (<stage>.prof)')
+    args = parser.parse_args()
+
+    conn_str = args.database_url or f'postgresql+psycopg2://{args.user}:{quote_plus(args.password)}@{args.host}:{args.port}/{args.db}'
+    engine = create_engine(conn_str, pool_size=max(1, args.workers), max_overflow=0)
+    if args.run_crebas:
+        run_sql_file(engine, args.crebas)
+
+    metrics = None
+    if args.metrics_report or args.profile_stage:
+        metrics = RunMetrics('etl_patients', profile_stage=args.profile_stage)
+    timings = {}
+    icd = IcdIndex.cached(args.icd_dir, args.icd_cache)
+    summary = load(engine, args.data_dir, args.workers, timings, metrics, icd)
+
+    print(f"Parsed {summary['files']} files from {summary['sites']} sites in {summary['parse_seconds']:.2f}s "
+          f"({args.workers} processes)")
+    for site, missing in summary['incomplete'].items():
+        print(f"  {site}: missing {', '.join(missing)}")
+    if summary['latin1_files']:
+        print(f"  Latin-1 decoded: {', '.join(summary['latin1_files'])}")
+    print(f"  Values not convertible (stored as NULL): {summary['invalid_values']:,}")
+    if summary['unknown_icd']:
+        print(f"  ICD codes not in the catalog: {summary['unknown_icd']:,}")
+    for name, count in summary['rejected'].items():
+        if count:
+            print(f"  {name}: {count:,} rows without key rejected")
+    print('ETL completed (new rows):')
+    for name, count in summary['inserted'].items():
+        print(f'  {name}: {count:,}')
+    print_timings(timings)
+    write_metrics(metrics, args.metrics_report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Prebuilt ICD-10-GM lookup index (code -> code, group, chapter).
+
+Built from the three catalog files in ICD_Daten:
+- ICD_Codes.csv: one row per code, column 7 is the code without suffix
+  ('A00', 'A00.0', 'I10.00'), column 9 its title
+- ICD_Gruppen.csv: group ranges 'start;end;chapter;title' (e.g. A00;A09)
+- ICD_Kapitel.csv: 'chapter;title'
+
+Codes are resolved for whole columns at once: each distinct value is looked
+up once in a hash index of the catalog codes. Values that are not in the
+catalog fall back to their longest known prefix (H40.11 -> H40.1 -> H40).
+The group is found by binary search of the three-character category in the
+sorted group start codes. The index is stored as a plain .npz file (no
+pickle) and rebuilt only when the catalog files change.
+"""
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ICD_DIR = os.path.join(HERE, 'Patient_innen-Daten-20251111', 'ICD_Daten')
+DEFAULT_CACHE = os.path.join(HERE, 'icd_index.npz')
+CATALOG_FILES = ('ICD_Codes.csv', 'ICD_Gruppen.csv', 'ICD_Kapitel.csv')
+CATEGORY_PATTERN = r'[A-Z][0-9]{2}'
+
+# Bump when the layout of the cache file changes
+INDEX_VERSION = 1
+
+
+def catalog_fingerprint(icd_dir: str) -> str:
+    """SHA-256 over the catalog files and the index version."""
+    digest = hashlib.sha256(str(INDEX_VERSION).encode())
+    for name in CATALOG_FILES:
+        with open(os.path.join(icd_dir, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def normalize_codes(values: pd.Series) -> pd.Series:
+    """Upper-case, strip blanks and the catalog suffixes ('-', '!', '*', '+')."""
+    return values.astype('string').str.strip().str.upper().str.rstrip('-!*+').str.rstrip('.')
+
+
+class IcdIndex:
+    """Sorted arrays of codes, groups and chapters with vectorized lookups."""
+
+    def __init__(self, arrays: dict, fingerprint: str = ''):
+        self.codes = arrays['codes']                      # sorted catalog codes
+        self.code_titles = arrays['code_titles']
+        self.group_starts = arrays['group_starts']        # sorted, non-overlapping ranges
+        self.group_ends = arrays['group_ends']
+        self.group_titles = arrays['group_titles']
+        self.group_chapters = arrays['group_chapters']
+        self.chapter_titles = arrays['chapter_titles']    # indexed by chapter number
+        self.group_ranges = np.char.add(np.char.add(self.group_starts, '-'), self.group_ends)
+        self.fingerprint = fingerprint
+        self._code_index = pd.Index(self.codes)
+
+    @classmethod
+    def build(cls, icd_dir: str = DEFAULT_ICD_DIR) -> 'IcdIndex':
+        """Parse the catalog files."""
+        read = dict(sep=';', header=None, dtype=str, encoding='utf-8', keep_default_na=False)
+        codes = pd.read_csv(os.path.join(icd_dir, 'ICD_Codes.csv'), usecols=[6, 8], **read)
+        codes = codes.drop_duplicates(subset=6).sort_values(6)
+        groups = pd.read_csv(os.path.join(icd_dir, 'ICD_Gruppen.csv'), usecols=[0, 1, 2, 3], **read).sort_values(0)
+        chapters = pd.read_csv(os.path.join(icd_dir, 'ICD_Kapitel.csv'), usecols=[0, 1], **read)
+
+        chapter_numbers = chapters[0].astype(int).to_numpy()
+        chapter_titles = np.full(chapter_numbers.max() + 1, '', dtype=object)
+        chapter_titles[chapter_numbers] = chapters[1].to_numpy()
+
+        arrays = {
+            'codes': codes[6].to_numpy(dtype=str),
+            'code_titles': codes[8].to_numpy(dtype=str),
+            'group_starts': groups[0].to_numpy(dtype=str),
+            'group_ends': groups[1].to_numpy(dtype=str),
+            'group_titles': groups[3].to_numpy(dtype=str),
+            'group_chapters': groups[2].astype(np.int16).to_numpy(),
+            'chapter_titles': chapter_titles.astype(str),
+        }
+        return cls(arrays, catalog_fingerprint(icd_dir))
+
+    def save(self, path: str):
+        np.savez(path, fingerprint=np.array(self.fingerprint), codes=self.codes, code_titles=self.code_titles,
+                 group_starts=self.group_starts, group_ends=self.group_ends, group_titles=self.group_titles,
+                 group_chapters=self.group_chapters, chapter_titles=self.chapter_titles)
+
+    @classmethod
+    def load(cls, path: str) -> 'IcdIndex':
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        return cls(arrays, str(arrays.pop('fingerprint')))
+
+    @classmethod
+    def cached(cls, icd_dir: str = DEFAULT_ICD_DIR, cache_path: str = DEFAULT_CACHE) -> 'IcdIndex':
+        """Load the index from cache_path, rebuilding it when the catalog changed."""
+        fingerprint = catalog_fingerprint(icd_dir)
+        if cache_path and os.path.exists(cache_path):
+            try:
+                index = cls.load(cache_path)
+                if index.fingerprint == fingerprint:
+                    return index
+            except (OSError, ValueError, KeyError):
+                pass  # unreadable cache: rebuild
+        index = cls.build(icd_dir)
+        if cache_path:
+            index.save(cache_path)
+        return index
+
+    def _resolve_codes(self, codes: np.ndarray) -> tuple:
+        """Catalog position per code (-1: unknown) and whether it matched exactly."""
+        positions = self._code_index.get_indexer(codes)
+        exact = positions >= 0
+        # Longest known prefix: drop one trailing character at a time down to the category
+        candidates = pd.Series(codes, dtype=object)
+        for _ in range(3):
+            missing = positions < 0
+            if not missing.any():
+                break
+            candidates[missing] = candidates[missing].str[:-1].str.rstrip('.')
+            shortened = missing & (candidates.str.len() >= 3).to_numpy()
+            positions[shortened] = self._code_index.get_indexer(candidates[shortened])
+        return positions, exact
+
+    def _resolve_groups(self, categories: np.ndarray) -> np.ndarray:
+        """Group position per three-character category (-1: no category or outside all groups)."""
+        positions = np.searchsorted(self.group_starts, categories, side='right') - 1
+        # Only real categories (letter + two digits): 'XX1' sorts into X85-Y09 but is no ICD code
+        valid = pd.Series(categories, dtype=object).str.fullmatch(CATEGORY_PATTERN).to_numpy(dtype=bool)
+        found = (positions >= 0) & valid
+        found[found] = categories[found] <= self.group_ends[positions[found]]
+        return np.where(found, positions, -1)
+
+    def classify(self, values: pd.Series) -> pd.DataFrame:
+        """Code, group and chapter for every value of a column (aligned with its index).
+
+        match is 'exact', 'prefix' (a shorter catalog code matched), 'group'
+        (only the category's group is known) or NA (not an ICD code).
+        """
+        # Distinct raw values first, then distinct normalized codes: string work per distinct value only
+        raw_codes, raw_uniques = pd.factorize(values)
+        norm_codes, uniques = pd.factorize(normalize_codes(pd.Series(raw_uniques, dtype=object)))
+        codes = np.append(norm_codes, -1)[raw_codes]
+        uniques = np.asarray(uniques, dtype=str)
+        code_pos, exact = self._resolve_codes(uniques)
+        group_pos = self._resolve_groups(np.array([u[:3] for u in uniques], dtype=str))
+
+        # Result per distinct code plus a trailing all-NA row for missing values (code -1),
+        # then one take() to expand it to the rows
+        code_pos, group_pos, exact = np.append(code_pos, -1), np.append(group_pos, -1), np.append(exact, False)
+        known_code = code_pos >= 0
+        known_group = group_pos >= 0
+        chapters = np.where(known_group, self.group_chapters[group_pos], 0)
+
+        def pick(array, positions, known):
+            return pd.array(np.where(known, array[positions], None), dtype='string')
+
+        distinct = pd.DataFrame({
+            'catalogCode': pick(self.codes, code_pos, known_code),
+            'title': pick(self.code_titles, code_pos, known_code),
+            'groupRange': pick(self.group_ranges, group_pos, known_group),
+            'groupTitle': pick(self.group_titles, group_pos, known_group),
+            'chapter': pd.array(chapters, dtype='Int16'),
+            'chapterTitle': pick(self.chapter_titles, chapters, known_group),
+            'match': pd.array(np.select([exact, known_code, known_group], ['exact', 'prefix', 'group'], None),
+                              dtype='string'),
+        })
+        distinct['chapter'] = distinct['chapter'].where(known_group)
+        return distinct.take(codes).set_axis(values.index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the ICD lookup index or classify codes with it.')
+    parser.add_argument('codes', nargs='*', help='ICD codes to classify (e.g. H40.1 I10.00)')
+    parser.add_argument('--icd-dir', default=DEFAULT_ICD_DIR, help='Directory with the ICD_*.csv catalog files')
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help='Index cache file (.npz)')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the cache even if it is current')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.rebuild:
+        index = IcdIndex.build(args.icd_dir)
+        index.save(args.cache)
+    else:
+        index = IcdIndex.cached(args.icd_dir, args.cache)
+    print(f'ICD index: {len(index.codes):,} codes, {len(index.group_starts)} groups '
+          f'({(time.perf_counter() - start) * 1000:.1f} ms)')
+    if args.codes:
+        with pd.option_context('display.max_colwidth', 60, 'display.width', 200):
+            print(index.classify(pd.Series(args.codes, index=args.codes)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+"""Per-patient time series of the examination results (messwerte).
+
+Every site delivers repeated tensio, refraktion and visus readings per
+patient. The readings of all sites are sorted once by (patientKey, date), so
+the visits of a patient form one contiguous slice of every value array. Each
+patient is then described by the offset of its first reading (starts), and
+all analytics run as single vectorized passes over the whole arrays:
+
+- deltas between visits: difference to the previous valid reading of the
+  same patient (np.diff, masked at patient boundaries)
+- rolling means over the last `window` readings: one shifted pass per
+  window offset, clipped at the patient's first reading
+- threshold crossings (e.g. tensio above a glaucoma limit): a reading beyond
+  the limit whose previous valid reading was not
+- per-patient trajectories (first/last value, min/max, mean, slope per year)
+  with np.*.reduceat over the patient slices
+
+Results are cached in an .npz file (no pickle), keyed by the SHA-256 of the
+messwerte files and the analysis parameters.
+"""
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from etl_patients import DEFAULT_DATA_DIR, discover_sites, parse_all
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE = os.path.join(HERE, 'messwerte_analytics.npz')
+
+MEASURES = ('tensio', 'refraktion', 'visus')
+
+# Rolling mean over the last WINDOW readings of a patient (including the current one)
+DEFAULT_WINDOW = 3
+
+# measure -> (direction, limit). Intraocular pressure above 21 mmHg is the
+# usual screening limit for ocular hypertension / glaucoma
+DEFAULT_LIMITS = {'tensio': ('>', 21.0)}
+
+DAYS_PER_YEAR = 365.25
+
+# Bump when the analytics or the layout of the cache file change
+ANALYTICS_VERSION = 1
+
+
+def input_fingerprint(paths: list, window: int, limits: dict) -> str:
+    """SHA-256 over the messwerte files, the parameters and the analytics version."""
+    digest = hashlib.sha256(f'{ANALYTICS_VERSION};{window};{sorted(limits.items())}'.encode())
+    for path in sorted(paths):
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def messwerte_files(data_dir: str) -> dict:
+    """{site: {'messwerte': path}} for all sites that deliver examination results."""
+    return {site: {'messwerte': files['messwerte']}
+            for site, files in discover_sites(data_dir).items() if 'messwerte' in files}
+
+
+def load_readings(data_dir: str, workers: int = 1) -> pd.DataFrame:
+    """Examination results of all sites, parsed like in the ETL (rows without id or date dropped)."""
+    results = parse_all(messwerte_files(data_dir), workers)
+    frames = [r['frame'] for r in sorted(results, key=lambda r: r['site'])]
+    readings = pd.concat(frames, ignore_index=True)
+    return readings[readings['id'].notna() & readings['untersuchungsdatum'].notna()].reset_index(drop=True)
+
+
+def parse_limit(text: str) -> tuple:
+    """'tensio>21' -> ('tensio', ('>', 21.0))"""
+    for direction in ('>', '<'):
+        if direction in text:
+            measure, value = text.split(direction, 1)
+            measure = measure.strip()
+            if measure not in MEASURES:
+                raise argparse.ArgumentTypeError(f'unknown measure {measure!r} (one of {", ".join(MEASURES)})')
+            return measure, (direction, float(value))
+    raise argparse.ArgumentTypeError(f'expected <measure>> <value> or <measure>< <value>, got {text!r}')
+
+
+class MeasurementSeries:
+    """Readings sorted by (patientKey, date) with the offsets of every patient's slice."""
+
+    def __init__(self, readings: pd.DataFrame):
+        keys = readings['patientKey'].to_numpy(dtype=np.int64)
+        dates = readings['untersuchungsdatum'].to_numpy(dtype='datetime64[D]')
+        order = np.lexsort((dates, keys))
+        self.keys = keys[order]
+        self.dates = dates[order]
+        self.sites = readings['site'].to_numpy(dtype=str)[order]
+        self.ids = readings['id'].to_numpy(dtype=np.int64)[order]
+        self.values = {m: readings[m].to_numpy(dtype=np.float64, na_value=np.nan)[order] for m in MEASURES}
+
+        boundary = np.empty(len(self.keys), dtype=bool)
+        boundary[:1] = True
+        boundary[1:] = self.keys[1:] != self.keys[:-1]
+        self.starts = np.flatnonzero(boundary)                       # first reading of every patient
+        self.counts = np.diff(np.append(self.starts, len(self.keys)))
+        self.patient = np.repeat(np.arange(len(self.starts)), self.counts)   # patient number per reading
+        self.first = self.starts[self.patient]                        # first reading of the own patient
+        self.visit = np.arange(len(self.keys)) - self.first + 1
+
+    def __len__(self):
+        return len(self.keys)
+
+    def previous_valid(self, measure: str) -> np.ndarray:
+        """Position of the patient's previous reading with a value for measure (-1: none)."""
+        valid = ~np.isnan(self.values[measure])
+        last = np.maximum.accumulate(np.where(valid, np.arange(len(self)), -1))
+        previous = np.empty(len(self), dtype=np.int64)
+        previous[:1] = -1
+        previous[1:] = last[:-1]
+        previous[previous < self.first] = -1                          # belongs to the patient before
+        return previous
+
+    def days_since_previous(self) -> np.ndarray:
+        """Days since the patient's previous visit (NaN for the first visit)."""
+        days = np.empty(len(self), dtype=np.float64)
+        days[:1] = np.nan
+        days[1:] = np.diff(self.dates).astype(np.float64)
+        days[self.starts] = np.nan
+        return days
+
+    def deltas(self, measure: str) -> tuple:
+        """Change since the previous valid reading and the days in between (NaN if there is none)."""
+        values = self.values[measure]
+        previous = self.previous_valid(measure)
+        has_previous = (previous >= 0) & ~np.isnan(values)
+        delta = np.full(len(self), np.nan)
+        days = np.full(len(self), np.nan)
+        delta[has_previous] = values[has_previous] - values[previous[has_previous]]
+        days[has_previous] = (self.dates[has_previous] - self.dates[previous[has_previous]]).astype(np.float64)
+        return delta, days
+
+    def rolling_mean(self, measure: str, window: int = DEFAULT_WINDOW) -> np.ndarray:
+        """Mean of the valid values among the patient's last `window` readings."""
+        values = self.values[measure]
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        sums = filled.copy()
+        n = valid.astype(np.int64)
+        # One pass per window offset instead of differences of a global cumulative sum,
+        # which would lose precision on long arrays
+        for offset in range(1, min(window, int(self.counts.max(initial=1)))):
+            inside = self.visit[offset:] > offset                    # reading offset back is the same patient
+            sums[offset:] += np.where(inside, filled[:-offset], 0.0)
+            n[offset:] += inside & valid[:-offset]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(n > 0, sums / n, np.nan)
+
+    def beyond(self, measure: str, direction: str, limit: float) -> np.ndarray:
+        values = self.values[measure]
+        with np.errstate(invalid='ignore'):
+            return values > limit if direction == '>' else values < limit
+
+    def crossings(self, measure: str, direction: str, limit: float) -> np.ndarray:
+        """Readings beyond the limit whose previous valid reading of the patient was not."""
+        beyond = self.beyond(measure, direction, limit)
+        previous = self.previous_valid(measure)
+        return beyond & (previous >= 0) & ~beyond[np.maximum(previous, 0)]
+
+    def _reduce(self, ufunc, values: np.ndarray) -> np.ndarray:
+        return ufunc.reduceat(values, self.starts) if len(self) else values[:0]
+
+    def trajectory(self, measure: str) -> dict:
+        """Per patient: readings, first/last value, min, max, mean and least-squares slope per year."""
+        values = self.values[measure]
+        valid = ~np.isnan(values)
+        position = np.arange(len(self))
+        n = self._reduce(np.add, valid.astype(np.int64))
+        first = self._reduce(np.minimum, np.where(valid, position, len(self)))
+        last = self._reduce(np.maximum, np.where(valid, position, -1))
+        padded = np.append(values, np.nan)                           # index len(self) / -1 -> NaN
+
+        # Time in years since the patient's first visit keeps the sums small
+        t = np.where(valid, (self.dates - self.dates[self.first]).astype(np.float64) / DAYS_PER_YEAR, 0.0)
+        y = np.where(valid, values, 0.0)
+        sx, sy = self._reduce(np.add, t), self._reduce(np.add, y)
+        sxx, sxy = self._reduce(np.add, t * t), self._reduce(np.add, t * y)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, sy / n, np.nan)
+            denominator = n * sxx - sx * sx
+            slope = np.where((n > 1) & (denominator > 1e-12), (n * sxy - sx * sy) / denominator, np.nan)
+        return {
+            'Readings': n,
+            'First': padded[first],
+            'Last': padded[np.where(last >= 0, last, len(self))],
+            'Min': self._reduce(np.fmin, values),
+            'Max': self._reduce(np.fmax, values),
+            'Mean': mean,
+            'SlopePerYear': slope,
+        }
+
+
+def analyze(series: MeasurementSeries, window: int = DEFAULT_WINDOW, limits: dict = None) -> tuple:
+    """(readings, patients): per-reading deltas/rolling means/crossings and per-patient trajectories."""
+    limits = DEFAULT_LIMITS if limits is None else limits
+    readings = {
+        'patientKey': series.keys,
+        'site': series.sites,
+        'id': series.ids,
+        'untersuchungsdatum': series.dates,
+        'visit': series.visit,
+        'daysSincePrevious': series.days_since_previous(),
+    }
+    first_visit = series.dates[series.starts]
+    last_visit = series.dates[series.starts + series.counts - 1]
+    patients = {
+        'patientKey': series.keys[series.starts],
+        'site': series.sites[series.starts],
+        'id': series.ids[series.starts],
+        'visits': series.counts,
+        'firstVisit': first_visit,
+        'lastVisit': last_visit,
+        'followUpDays': (last_visit - first_visit).astype(np.int64),
+    }
+    for measure in MEASURES:
+        readings[measure] = series.values[measure]
+        readings[f'{measure}Delta'], _ = series.deltas(measure)
+        readings[f'{measure}RollingMean'] = series.rolling_mean(measure, window)
+        for name, values in series.trajectory(measure).items():
+            patients[f'{measure}{name}'] = values
+
+    no_date = np.datetime64('NaT', 'D')
+    for measure, (direction, limit) in limits.items():
+        beyond = series.beyond(measure, direction, limit)
+        crossing = series.crossings(measure, direction, limit)
+        readings[f'{measure}Beyond'] = beyond
+        readings[f'{measure}Crossing'] = crossing
+        patients[f'{measure}ReadingsBeyond'] = series._reduce(np.add, beyond.astype(np.int64))
+        patients[f'{measure}Crossings'] = series._reduce(np.add, crossing.astype(np.int64))
+        # datetime64 has no reduceat: take the first flagged position per patient instead
+        first = series._reduce(np.minimum, np.where(beyond, np.arange(len(series)), len(series)))
+        patients[f'{measure}FirstBeyond'] = np.append(series.dates, no_date)[first]
+    return pd.DataFrame(readings), pd.DataFrame(patients)
+
+
+def save_results(path: str, fingerprint: str, readings: pd.DataFrame, patients: pd.DataFrame):
+    def plain(values):
+        # pandas keeps strings as object arrays, which np.load only reads with pickle
+        return values.astype(str) if values.dtype == object else values
+
+    arrays = {f'r_{name}': plain(readings[name].to_numpy()) for name in readings.columns}
+    arrays.update({f'p_{name}': plain(patients[name].to_numpy()) for name in patients.columns})
+    np.savez(path, fingerprint=np.array(fingerprint), **arrays)
+
+
+def load_results(path: str) -> tuple:
+    """(fingerprint, readings, patients) from a cache file."""
+    with np.load(path, allow_pickle=False) as data:
+        readings = pd.DataFrame({name[2:]: data[name] for name in data.files if name.startswith('r_')})
+        patients = pd.DataFrame({name[2:]: data[name] for name in data.files if name.startswith('p_')})
+        return str(data['fingerprint']), readings, patients
+
+
+def cached_analysis(data_dir: str = DEFAULT_DATA_DIR, window: int = DEFAULT_WINDOW, limits: dict = None,
+                    cache_path: str = DEFAULT_CACHE, workers: int = 1, rebuild: bool = False) -> tuple:
+    """(readings, patients, from_cache): load the results, recomputing them when the input changed."""
+    limits = DEFAULT_LIMITS if limits is None else limits
+    paths = [files['messwerte'] for files in messwerte_files(data_dir).values()]
+    fingerprint = input_fingerprint(paths, window, limits)
+    if cache_path and os.path.exists(cache_path) and not rebuild:
+        try:
+            cached, readings, patients = load_results(cache_path)
+            if cached == fingerprint:
+                return readings, patients, True
+        except (OSError, ValueError, KeyError):
+            pass  # unreadable cache: recompute
+    readings, patients = analyze(MeasurementSeries(load_readings(data_dir, workers)), window, limits)
+    if cache_path:
+        save_results(cache_path, fingerprint, readings, patients)
+    return readings, patients, False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-patient time series analytics of the messwerte files.')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Directory with the <site>_messwerte.csv files')
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help='Results cache file (.npz); empty to disable')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute even if the cache is current')
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW, help='Readings per rolling mean')
+    parser.add_argument('--limit', type=parse_limit, action='append', default=None, metavar='MEASURE>VALUE',
+                        help="Threshold to track, e.g. 'tensio>21' or 'visus<0.5' (repeatable; default tensio>21)")
+    parser.add_argument('--readings-output', default=None, help='Write the per-reading results to this CSV')
+    parser.add_argument('--output', default=None, help='Write the per-patient summary to this CSV')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Parser processes')
+    args = parser.parse_args()
+    if args.window < 1:
+        parser.error('--window must be at least 1')
+    limits = dict(args.limit) if args.limit else DEFAULT_LIMITS
+
+    start = time.perf_counter()
+    readings, patients, from_cache = cached_analysis(args.data_dir, args.window, limits, args.cache,
+                                                     args.workers, args.rebuild)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(readings):,} readings of {len(patients):,} patients "
+          f"({'cache' if from_cache else 'computed'}, {elapsed * 1000:.1f} ms)")
+    print(f"  Visits per patient: mean {patients['visits'].mean():.2f}, max {patients['visits'].max()}")
+    for measure, (direction, limit) in limits.items():
+        print(f"  {measure} {direction} {limit:g}: {int(patients[f'{measure}ReadingsBeyond'].gt(0).sum()):,} patients "
+              f"with readings beyond the limit, {int(patients[f'{measure}Crossings'].gt(0).sum()):,} crossed it "
+              f"during follow-up")
+    if args.readings_output:
+        readings.to_csv(args.readings_output, sep=';', index=False)
+        print(f"Readings written to '{args.readings_output}'")
+    if args.output:
+        patients.to_csv(args.output, sep=';', index=False)
+        print(f"Patient summary written to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""Cross-site record linkage of the patient master data (master patient index).
+
+The same person appears at several practices and clinics under different
+site-local ids. Comparing every pair of records is quadratic, so records are
+only compared within blocks of candidates:
+
+- pass 1: same birth date and same Koelner Phonetik code of the surname
+- pass 2: same birth date and same phonetic code of the first name
+  (catches changed or misspelled surnames)
+
+Within a block the names are compared with the cosine similarity of their
+character bigram sets, vectorized over all candidate pairs. Matching pairs
+are merged into clusters (connected components), and every cluster gets a
+master key. Keys from a previous mapping are kept, so a patient's master key
+does not change when new sites are added.
+"""
+import argparse
+import os
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from etl_patients import DEFAULT_DATA_DIR, discover_sites, parse_all
+
+BLOCKING_PASSES = (('geburtsdatum', 'nachnamePhon'), ('geburtsdatum', 'vornamePhon'))
+
+# Blocks larger than this are skipped (a generic phonetic code on a common
+# birth date would otherwise bring back quadratic cost)
+MAX_BLOCK_SIZE = 500
+
+# A pair matches when the mean of surname and first name similarity reaches
+# MATCH_THRESHOLD and neither is below MIN_NAME_SIMILARITY; sex must not differ
+MATCH_THRESHOLD = 0.85
+MIN_NAME_SIMILARITY = 0.6
+
+_FOLD = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+
+
+def normalize_name(name: str) -> str:
+    """Lower case, umlauts folded (ä -> ae), accents removed, only letters and single blanks."""
+    name = unicodedata.normalize('NFKD', name.casefold().translate(_FOLD))
+    letters = ''.join(c if c.isalpha() else ' ' for c in name if not unicodedata.combining(c))
+    return ' '.join(letters.split())
+
+
+def koelner_phonetik(name: str) -> str:
+    """Koelner Phonetik code of a (normalized) name, e.g. 'mueller' -> '657'."""
+    word = ''.join(c for c in name.upper() if 'A' <= c <= 'Z')
+    digits = []
+    for i, c in enumerate(word):
+        before = word[i - 1] if i else ''
+        after = word[i + 1] if i + 1 < len(word) else ''
+        if c in 'AEIJOUY':
+            code = '0'
+        elif c == 'H':
+            continue
+        elif c == 'B':
+            code = '1'
+        elif c == 'P':
+            code = '3' if after == 'H' else '1'
+        elif c in 'DT':
+            code = '8' if after in ('C', 'S', 'Z') else '2'
+        elif c in 'FVW':
+            code = '3'
+        elif c in 'GKQ':
+            code = '4'
+        elif c == 'C':
+            if i == 0:
+                code = '4' if after in tuple('AHKLOQRUX') else '8'
+            else:
+                code = '4' if after in tuple('AHKOQUX') and before not in ('S', 'Z') else '8'
+        elif c == 'X':
+            code = '8' if before in ('C', 'K', 'Q') else '48'
+        elif c == 'L':
+            code = '5'
+        elif c in 'MN':
+            code = '6'
+        elif c == 'R':
+            code = '7'
+        else:  # S, Z
+            code = '8'
+        digits.append(code)
+    collapsed = []
+    for code in ''.join(digits):
+        if not collapsed or collapsed[-1] != code:
+            collapsed.append(code)
+    return ''.join(code for i, code in enumerate(collapsed) if code != '0' or i == 0)
+
+
+def _map_distinct(values: pd.Series, func) -> pd.Series:
+    """func applied once per distinct value (names repeat a lot across records)."""
+    codes, uniques = pd.factorize(values)
+    mapped = np.array([func(u) for u in uniques] + [''], dtype=object)
+    return pd.Series(mapped[codes], index=values.index)
+
+
+def prepare(patients: pd.DataFrame) -> pd.DataFrame:
+    """Normalized names and their phonetic codes for linkage."""
+    df = patients[['patientKey', 'site', 'siteId', 'nachname', 'vorname', 'geburtsdatum', 'geschlecht']].copy()
+    df = df.reset_index(drop=True)
+    df['nachnameNorm'] = _map_distinct(df['nachname'], normalize_name)
+    df['vornameNorm'] = _map_distinct(df['vorname'], normalize_name)
+    df['nachnamePhon'] = _map_distinct(df['nachnameNorm'], koelner_phonetik)
+    df['vornamePhon'] = _map_distinct(df['vornameNorm'], koelner_phonetik)
+    return df
+
+
+def candidate_pairs(df: pd.DataFrame, columns: tuple) -> tuple:
+    """Row pairs (i < j) sharing the blocking key; returns (left, right, skipped blocks)."""
+    valid = df[list(columns)].notna().all(axis=1) & (df[columns[-1]] != '')
+    rows = np.flatnonzero(valid.to_numpy())
+    block = df.loc[valid, list(columns)].groupby(list(columns), sort=False).ngroup().to_numpy()
+    order = np.argsort(block, kind='stable')
+    rows, block = rows[order], block[order]
+    starts = np.flatnonzero(np.r_[True, block[1:] != block[:-1]]) if len(block) else np.empty(0, dtype=np.int64)
+    sizes = np.diff(np.r_[starts, len(block)])
+
+    left, right = [], []
+    # All blocks of one size at once: the same triangle of offsets for every block
+    for size in np.unique(sizes[(sizes > 1) & (sizes <= MAX_BLOCK_SIZE)]):
+        first, second = np.triu_indices(size, 1)
+        block_starts = starts[sizes == size][:, None]
+        left.append(rows[(block_starts + first).ravel()])
+        right.append(rows[(block_starts + second).ravel()])
+    if not left:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), int((sizes > MAX_BLOCK_SIZE).sum())
+    return np.concatenate(left), np.concatenate(right), int((sizes > MAX_BLOCK_SIZE).sum())
+
+
+class BigramIndex:
+    """Distinct names as padded rows of bigram ids for vectorized set similarity."""
+
+    def __init__(self, names: pd.Series):
+        self.codes, uniques = pd.factorize(names)
+        grams = [sorted({f' {u} '[k:k + 2] for k in range(len(u) + 1)}) for u in uniques]
+        vocabulary = {g: i for i, g in enumerate(sorted({g for row in grams for g in row}))}
+        width = max((len(row) for row in grams), default=1)
+        self.matrix = np.full((len(grams), width), -1, dtype=np.int32)
+        for i, row in enumerate(grams):
+            self.matrix[i, :len(row)] = [vocabulary[g] for g in row]
+        self.sizes = np.array([len(row) for row in grams], dtype=np.float64)
+
+    def cosine(self, left: np.ndarray, right: np.ndarray, chunk: int = 20000) -> np.ndarray:
+        """Cosine similarity of the bigram sets for the row pairs (left[k], right[k])."""
+        a, b = self.codes[left], self.codes[right]
+        result = np.zeros(len(a), dtype=np.float64)
+        # Identical names need no comparison; missing names (-1) score 0
+        same = (a == b) & (a >= 0)
+        result[same] = 1.0
+        todo = np.flatnonzero(~same & (a >= 0) & (b >= 0))
+        for start in range(0, len(todo), chunk):
+            pos = todo[start:start + chunk]
+            ga, gb = self.matrix[a[pos]], self.matrix[b[pos]]
+            common = ((ga[:, :, None] == gb[:, None, :]) & (ga[:, :, None] >= 0)).sum(axis=(1, 2))
+            result[pos] = common / np.sqrt(self.sizes[a[pos]] * self.sizes[b[pos]])
+        return result
+
+
+def connected_components(n: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Component label (smallest row number) per row, by label propagation with pointer jumping."""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        np.minimum.at(updated, left, low)
+        np.minimum.at(updated, right, low)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def link(patients: pd.DataFrame, previous: pd.DataFrame = None) -> tuple:
+    """Master key per patient record.
+
+    patients: patientKey, site, siteId, nachname, vorname, geburtsdatum, geschlecht
+    previous: an earlier mapping (patientKey, masterKey); members keep their
+              master key, and a merged cluster keeps the smallest earlier one
+    Returns (mapping DataFrame, statistics dict).
+    """
+    df = prepare(patients)
+    stats = {'records': len(df)}
+
+    pairs_left, pairs_right = [], []
+    for columns in BLOCKING_PASSES:
+        left, right, skipped = candidate_pairs(df, columns)
+        pairs_left.append(left)
+        pairs_right.append(right)
+        stats[f"pairs_{'_'.join(columns)}"] = len(left)
+        stats['skipped_blocks'] = stats.get('skipped_blocks', 0) + skipped
+    # A pair found by both passes is scored once
+    pairs = np.unique(np.stack([np.concatenate(pairs_left), np.concatenate(pairs_right)], axis=1), axis=0)
+    left, right = pairs[:, 0], pairs[:, 1]
+    stats['candidate_pairs'] = len(left)
+
+    surname = BigramIndex(df['nachnameNorm']).cosine(left, right)
+    first_name = BigramIndex(df['vornameNorm']).cosine(left, right)
+    sex = df['geschlecht'].astype('string').to_numpy(dtype=object, na_value=None)
+    sex_conflict = np.array([x is not None and y is not None and x != y for x, y in zip(sex[left], sex[right])],
+                            dtype=bool)
+    score = (surname + first_name) / 2
+    matched = ((score >= MATCH_THRESHOLD) & (np.minimum(surname, first_name) >= MIN_NAME_SIMILARITY)
+               & ~sex_conflict)
+    stats['matched_pairs'] = int(matched.sum())
+
+    labels = connected_components(len(df), left[matched], right[matched])
+    keys = df['patientKey'].to_numpy(dtype=np.int64)
+    master = pd.Series(keys).groupby(labels).transform('min').to_numpy()
+    if previous is not None and len(previous):
+        # Binary search in the sorted earlier keys; int64 throughout (a float
+        # round trip through NaN would corrupt the 64-bit keys)
+        earlier = previous.drop_duplicates('patientKey').sort_values('patientKey')
+        earlier_keys = earlier['patientKey'].to_numpy(dtype=np.int64)
+        pos = np.minimum(np.searchsorted(earlier_keys, keys), max(len(earlier_keys) - 1, 0))
+        found = earlier_keys[pos] == keys
+        kept = pd.Series(earlier['masterKey'].to_numpy(dtype=np.int64)[pos], dtype='Int64').where(found)
+        kept = kept.groupby(labels).transform('min')
+        master = np.where(kept.notna(), kept.fillna(0).to_numpy(dtype=np.int64), master)
+
+    mapping = pd.DataFrame({
+        'patientKey': keys,
+        'site': df['site'],
+        'siteId': df['siteId'],
+        'masterKey': master,
+    })
+    mapping['clusterSize'] = mapping.groupby('masterKey')['patientKey'].transform('size')
+    stats['clusters'] = int(mapping['masterKey'].nunique())
+    stats['linked_records'] = int((mapping['clusterSize'] > 1).sum())
+    return mapping, stats
+
+
+def load_patients(data_dir: str, workers: int = 1) -> pd.DataFrame:
+    """Master data of all sites (stammdaten files only), parsed like in the ETL."""
+    sites = discover_sites(data_dir)
+    tasks = {site: {'stammdaten': files['stammdaten']} for site, files in sites.items() if 'stammdaten' in files}
+    frames = [r['frame'] for r in sorted(parse_all(tasks, workers), key=lambda r: r['site'])]
+    patients = pd.concat(frames, ignore_index=True).rename(columns={'id': 'siteId'})
+    return patients[patients['siteId'].notna()].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Link patient records across sites to master patient keys.')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Directory with the <site>_stammdaten.csv files')
+    parser.add_argument('--output', default='master_patient_index.csv', help='Mapping CSV (patientKey;site;siteId;masterKey;clusterSize)')
+    parser.add_argument('--previous', default=None, help='Earlier mapping CSV whose master keys are kept')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Parser processes')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    patients = load_patients(args.data_dir, args.workers)
+    parsed = time.perf_counter()
+    previous = pd.read_csv(args.previous, sep=';', usecols=['patientKey', 'masterKey']) if args.previous else None
+    mapping, stats = link(patients, previous)
+    linked = time.perf_counter()
+    mapping.to_csv(args.output, sep=';', index=False)
+
+    print(f"Linked {stats['records']:,} records in {linked - parsed:.2f}s (parsing {parsed - start:.2f}s)")
+    print(f"  Candidate pairs: {stats['candidate_pairs']:,} "
+          f"(skipped blocks larger than {MAX_BLOCK_SIZE}: {stats['skipped_blocks']})")
+    print(f"  Matched pairs: {stats['matched_pairs']:,}")
+    print(f"  Master patients: {stats['clusters']:,}, linked records: {stats['linked_records']:,}")
+    print(f"Mapping written to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Generate synthetic SalesData.csv files for the ETL benchmarks.
+
+The files use the same layout as the real export: semicolon separated,
+decimal comma, dates as DD.MM.YY. A configurable share of rows carries the
+dirty values both pipelines have to handle: '€' / 'EURO' currencies,
+'GER' / 'USA' / 'DEU' country codes, impossible or wrongly formatted dates,
+non-numeric amounts and lines with an extra field.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    'OrderNumber', 'OrderItem', 'Date', 'Customer', 'CustDescr', 'City', 'SalesOrg', 'Country',
+    'Product', 'ProdDescr', 'ProdCat', 'CatDescr', 'Division', 'SalesQuantity', 'UnitOfMeasure',
+    'Revenue', 'Currency', 'Discount', 'RevenueUSD', 'DiscountUSD', 'CostsUSD',
+]
+
+SALES_ORGS = {'DN00': 'US', 'DS00': 'US', 'DE00': 'DE', 'DW00': 'DE'}
+CATEGORIES = {'BIK': 'Bikes', 'ACC': 'Accessories', 'PRT': 'Parts', 'CLO': 'Clothing'}
+CITIES = {'US': ['Dallas', 'Miami', 'Chicago', 'Denver', 'Boston'], 'DE': ['Heidelberg', 'Hamburg', 'Berlin', 'Munich']}
+
+DIRTY_CURRENCIES = np.array(['€', 'EURO', '$'])
+DIRTY_COUNTRIES = {'DE': np.array(['GER', 'DEU']), 'US': np.array(['USA', 'U.S.'])}
+DIRTY_DATES = np.array(['31.02.07', '2008-05-14', '', '00.13.09'])
+DIRTY_AMOUNTS = np.array(['n/a', '1.234,5,6', '-'])
+
+CHUNK_ROWS = 500_000
+
+
+def _amount(cents: np.ndarray) -> pd.Series:
+    """Format integer cents with a decimal comma."""
+    cents = pd.Series(cents)
+    return (cents // 100).astype(str) + ',' + (cents % 100).astype(str).str.zfill(2)
+
+
+def _masters(rng: np.random.Generator, customers: int, products: int):
+    """Customer and product master data the sales lines draw from."""
+    orgs = np.array(list(SALES_ORGS))
+    cust_org = rng.choice(orgs, customers)
+    cust_country = np.array([SALES_ORGS[o] for o in cust_org])
+    cust_city = np.array([rng.choice(CITIES[c]) for c in cust_country])
+    cust_ids = np.arange(1000, 1000 + customers * 10, 10).astype(str)
+
+    cats = np.array(list(CATEGORIES))
+    prod_cat = rng.choice(cats, products)
+    prod_ids = np.array([f'{c}{1000 + i}' for i, c in enumerate(prod_cat)])
+    prod_price = rng.integers(500, 500_000, products)
+    return {
+        'cust_id': cust_ids, 'cust_org': cust_org, 'cust_country': cust_country, 'cust_city': cust_city,
+        'prod_id': prod_ids, 'prod_cat': prod_cat, 'prod_price': prod_price,
+    }
+
+
+def _chunk(rng: np.random.Generator, masters: dict, first_line: int, rows: int, dirty_rate: float) -> str:
+    """Render `rows` sales lines starting at sales line number `first_line`."""
+    line_no = np.arange(first_line, first_line + rows)
+    # Orders have up to five items: 10, 20, ... 50
+    order_number = 100_000 + line_no // 5
+    order_item = (line_no % 5 + 1) * 10
+
+    # All items of one order share customer and date
+    order_idx = line_no // 5 - line_no[0] // 5
+    cust = rng.integers(0, len(masters['cust_id']), rows)[order_idx]
+    prod = rng.integers(0, len(masters['prod_id']), rows)
+
+    days = rng.integers(1, 29, rows)[order_idx]
+    months = rng.integers(1, 13, rows)[order_idx]
+    years = rng.integers(5, 16, rows)[order_idx]
+    date = (pd.Series(days).astype(str).str.zfill(2) + '.' + pd.Series(months).astype(str).str.zfill(2)
+            + '.' + pd.Series(years).astype(str).str.zfill(2))
+
+    country = masters['cust_country'][cust]
+    currency = np.where(country == 'US', 'USD', 'EUR').astype(object)
+    quantity = rng.integers(1, 50, rows)
+    revenue = masters['prod_price'][prod] * quantity
+    discount = (revenue * rng.integers(0, 15, rows)) // 100
+    costs = (revenue * rng.integers(40, 90, rows)) // 100
+    revenue_usd = np.where(currency == 'USD', revenue, revenue * 110 // 100)
+    discount_usd = np.where(currency == 'USD', discount, discount * 110 // 100)
+
+    frame = pd.DataFrame({
+        'OrderNumber': order_number.astype(str),
+        'OrderItem': order_item.astype(str),
+        'Date': date.to_numpy(dtype=object),
+        'Customer': masters['cust_id'][cust],
+        'CustDescr': np.char.add('Customer ', masters['cust_id'][cust]),
+        'City': masters['cust_city'][cust],
+        'SalesOrg': masters['cust_org'][cust],
+        'Country': country.astype(object),
+        'Product': masters['prod_id'][prod],
+        'ProdDescr': np.char.add('Product ', masters['prod_id'][prod]),
+        'ProdCat': masters['prod_cat'][prod],
+        'CatDescr': pd.Series(masters['prod_cat'][prod]).map(CATEGORIES).to_numpy(dtype=object),
+        'Division': np.where(masters['prod_cat'][prod] == 'BIK', 'BI', 'AC'),
+        'SalesQuantity': quantity.astype(str),
+        'UnitOfMeasure': 'ST',
+        'Revenue': _amount(revenue).to_numpy(dtype=object),
+        'Currency': currency,
+        'Discount': _amount(discount).to_numpy(dtype=object),
+        'RevenueUSD': _amount(revenue_usd).to_numpy(dtype=object),
+        'DiscountUSD': _amount(discount_usd).to_numpy(dtype=object),
+        'CostsUSD': _amount(costs).to_numpy(dtype=object),
+    }, columns=COLUMNS).astype(object)
+
+    # Inject the known dirty values, each kind in about dirty_rate of the rows
+    def pick(mask_rate=dirty_rate):
+        return rng.random(rows) < mask_rate
+
+    mask = pick()
+    frame.loc[mask, 'Currency'] = rng.choice(DIRTY_CURRENCIES, mask.sum())
+    for code, dirty in DIRTY_COUNTRIES.items():
+        mask = pick() & (country == code)
+        frame.loc[mask, 'Country'] = rng.choice(dirty, mask.sum())
+    mask = pick()
+    frame.loc[mask, 'Date'] = rng.choice(DIRTY_DATES, mask.sum())
+    mask = pick(dirty_rate / 4)
+    frame.loc[mask, 'Revenue'] = rng.choice(DIRTY_AMOUNTS, mask.sum())
+
+    lines = frame[COLUMNS[0]].str.cat([frame[c] for c in COLUMNS[1:]], sep=';')
+    extra = pick(dirty_rate / 10)
+    lines[extra] = lines[extra] + ';extra field'
+    return '\n'.join(lines) + '\n'
+
+
+def generate(path: str, rows: int, seed: int = 42, dirty_rate: float = 0.02,
+             customers: int = 2_000, products: int = 400) -> str:
+    """Write a synthetic SalesData CSV with `rows` sales lines and return its path."""
+    rng = np.random.default_rng(seed)
+    masters = _masters(rng, customers, products)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(';'.join(COLUMNS) + '\n')
+        for start in range(0, rows, CHUNK_ROWS):
+            f.write(_chunk(rng, masters, start, min(CHUNK_ROWS, rows - start), dirty_rate))
+    return path
+
+
+def dataset_path(data_dir: str, rows: int, seed: int, dirty_rate: float) -> str:
+    """Cached file name for one generator configuration."""
+    return os.path.join(data_dir, f'salesdata_{rows}_s{seed}_d{dirty_rate:g}.csv')
+
+
+def ensure_dataset(data_dir: str, rows: int, seed: int = 42, dirty_rate: float = 0.02) -> str:
+    """Generate the file unless it already exists for the same configuration."""
+    path = dataset_path(data_dir, rows, seed, dirty_rate)
+    if not os.path.exists(path):
+        generate(path, rows, seed, dirty_rate)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic SalesData.csv.')
+    parser.add_argument('path', help='Output CSV path')
+    parser.add_argument('--rows', type=int, default=100_000, help='Number of sales lines')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (same seed -> same file)')
+    parser.add_argument('--dirty-rate', type=float, default=0.02, help='Share of rows per kind of dirty value')
+    args = parser.parse_args()
+    generate(args.path, args.rows, args.seed, args.dirty_rate)
+    print(f'Wrote {args.rows:,} rows to {args.path}')
+
+
+if __name__ == '__main__':
+    main()
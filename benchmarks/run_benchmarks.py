@@ -0,0 +1,274 @@
+"""Stage timings for both ETL pipelines on synthetic SalesData files.
+
+Times extract, validate, dimension/hub build, links/sats build and DB write
+separately for Praktikum1 (etl_process) and Praktikum2 (etl_salesdata) and
+writes the results as JSON, so runs of different versions can be compared
+with --baseline.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(HERE)
+sys.path.insert(0, os.path.join(REPO, 'Praktikum1'))
+sys.path.insert(0, os.path.join(REPO, 'Praktikum2'))
+
+from generate_salesdata import ensure_dataset  # noqa: E402
+from storage_backend import duckdb_available  # noqa: E402
+
+DEFAULT_ROWS = [100_000, 1_000_000, 10_000_000]
+PIPELINES = ('praktikum1', 'praktikum2')
+LOCAL_BACKENDS = ('duckdb', 'sqlite')
+
+
+class StageTimer:
+    """Accumulates wall-clock seconds per stage."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    def add(self, stage: str, seconds: float):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def timed(self, stage: str, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _db_config(pg_dsn: str) -> dict:
+    """psycopg2 connection parameters (Praktikum1 DB_CONFIG) from an SQLAlchemy URL."""
+    from sqlalchemy.engine import make_url
+    url = make_url(pg_dsn)
+    return {
+        'host': url.host or 'localhost',
+        'database': url.database or 'postgres',
+        'user': url.username or 'postgres',
+        'password': url.password or '',
+        'port': url.port or 5432,
+    }
+
+
+def bench_praktikum1(csv_path: str, pg_dsn: str = None, batch_size: int = 0, database_url: str = None) -> dict:
+    """Drive the bonobo chain of etl_process node by node and time each node.
+
+    The tables are written to Postgres (pg_dsn) or to a DuckDB file (database_url).
+    """
+    import etl_process
+    etl = importlib.reload(etl_process)  # fresh module-level buffers
+    etl.CSV_PATH = csv_path
+    timer = StageTimer()
+
+    if batch_size:
+        source, validate = iter(etl.extract_csv_batches(batch_size)), etl.validate_and_transform_batch
+        load = etl.load_dimension_tables_batch
+    else:
+        source, validate = iter(etl.extract_csv()), etl.validate_and_transform
+        load = etl.load_dimension_tables
+
+    records = 0
+    while True:
+        item = timer.timed('extract', next, source, None)
+        if item is None:
+            break
+        validated = timer.timed('validate', lambda: list(validate(item)))
+        start = time.perf_counter()
+        for element in validated:
+            for _ in load(element):
+                pass
+            records += len(element) if batch_size else 1
+        timer.add('dimensions', time.perf_counter() - start)
+
+    note = None
+    if pg_dsn:
+        import psycopg2
+        etl.DB_CONFIG = _db_config(pg_dsn)
+        with psycopg2.connect(**etl.DB_CONFIG) as conn, conn.cursor() as cur:
+            with open(os.path.join(REPO, 'Praktikum1', 'crebas2.sql'), encoding='utf-8') as f:
+                cur.execute(f.read())
+        timer.timed('db_write', etl.write_to_database, bulk=True)
+    elif database_url:
+        etl.DB_CONFIG['url'] = database_url
+        etl.create_schema(os.path.join(REPO, 'Praktikum1', 'crebas2.sql'))
+        timer.timed('db_write', etl.write_to_database, bulk=True)
+    else:
+        note = 'db_write skipped: write_to_database needs Postgres (--pg-dsn) or DuckDB'
+
+    return {'records': records, 'errors': len(etl.errors), 'stages': timer.seconds, 'note': note}
+
+
+def bench_praktikum2(csv_path: str, engine, parser: str = 'c', chunksize: int = None, workers: int = 1) -> dict:
+    """Run etl_salesdata stage by stage (chunk by chunk if chunksize is set)."""
+    import etl_salesdata as etl
+    timer = StageTimer()
+    quarantine = etl.Quarantine(os.devnull, csv_path)
+    validation_errors = []
+    dedup = etl.ChunkDeduplicator() if chunksize else None
+    load_dt = date.today()
+
+    records = 0
+    for chunk in etl.iter_sales_csv(csv_path, parser, chunksize, quarantine,
+                                    validation_errors=validation_errors, timings=timer.seconds):
+        start = time.perf_counter()
+        keys = etl.KeyRegistry(chunk)
+        hubs = etl.build_hubs(chunk, keys)
+        timer.add('hubs', time.perf_counter() - start)
+        start = time.perf_counter()
+        links = etl.build_links(chunk, hubs, keys)
+        sats = etl.build_sats(chunk, hubs, load_dt, keys)
+        timer.add('links_sats', time.perf_counter() - start)
+        for tier in (hubs, links, sats):
+            if dedup is not None:
+                tier = {name: df if name == 'satfactsales' else dedup.filter(name, df) for name, df in tier.items()}
+            timer.timed('db_write', etl.write_tables, engine, tier, workers)
+        records += len(chunk)
+
+    return {'records': records, 'errors': len(validation_errors) + len(quarantine), 'stages': timer.seconds,
+            'note': None}
+
+
+def local_url(workdir: str, name: str) -> str:
+    """URL of a fresh DuckDB file in workdir."""
+    return f"duckdb:///{os.path.join(workdir, f'{name}_{time.time_ns()}.duckdb')}"
+
+
+def make_engine(pg_dsn: str, workdir: str, workers: int, backend: str = 'sqlite'):
+    """Postgres engine or DuckDB file with a fresh Data Vault schema, or an SQLite file as plain stand-in."""
+    from storage_backend import create_engine
+    if pg_dsn or backend == 'duckdb':
+        import etl_salesdata
+        if pg_dsn:
+            engine = create_engine(pg_dsn, pool_size=workers, max_overflow=0)
+        else:
+            engine = create_engine(local_url(workdir, 'vault'))
+        etl_salesdata.prepare_schema(engine, os.path.join(REPO, 'Praktikum2', 'crebas.sql'))
+        return engine
+    path = os.path.join(workdir, f'vault_{time.time_ns()}.sqlite')
+    return create_engine(f'sqlite:///{path}')
+
+
+def run(args) -> dict:
+    results = []
+    backend = 'postgresql' if args.pg_dsn else args.backend
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            csv_path = ensure_dataset(args.data_dir, rows, args.seed, args.dirty_rate)
+            for pipeline in args.pipelines:
+                print(f'{pipeline}: {rows:,} rows ...', flush=True)
+                started = time.perf_counter()
+                try:
+                    if pipeline == 'praktikum1':
+                        database_url = local_url(workdir, 'sales') if backend == 'duckdb' else None
+                        result = bench_praktikum1(csv_path, args.pg_dsn, args.batch_size, database_url)
+                    else:
+                        # SQLite allows one writer at a time
+                        workers = 1 if backend == 'sqlite' else args.workers
+                        engine = make_engine(args.pg_dsn, workdir, workers, backend)
+                        result = bench_praktikum2(csv_path, engine, args.parser, args.chunksize, workers)
+                        engine.dispose()
+                except ImportError as e:
+                    result = {'records': 0, 'errors': 0, 'stages': {}, 'note': f'skipped: {e}'}
+                total = time.perf_counter() - started
+                results.append({
+                    'pipeline': pipeline,
+                    'rows': rows,
+                    'backend': backend,
+                    **result,
+                    'total_seconds': total,
+                    'rows_per_second': rows / total if total and result['records'] else None,
+                })
+                stages = ', '.join(f'{k} {v:.2f}s' for k, v in result['stages'].items())
+                print(f"  {stages or result['note']}  (total {total:.2f}s)")
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': backend,
+            'seed': args.seed,
+            'dirty_rate': args.dirty_rate,
+            'parser': args.parser,
+            'chunksize': args.chunksize,
+            'batch_size': args.batch_size,
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Stages that got slower than baseline * (1 + tolerance)."""
+    previous = {(r['pipeline'], r['rows'], r['backend']): r for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        old = previous.get((result['pipeline'], result['rows'], result['backend']))
+        if old is None:
+            continue
+        for stage, seconds in result['stages'].items():
+            before = old['stages'].get(stage)
+            if not before:
+                continue
+            ratio = seconds / before
+            flag = ' REGRESSION' if ratio > 1 + tolerance else ''
+            print(f"  {result['pipeline']:<11}{result['rows']:>12,}  {stage:<11}{before:8.2f}s -> {seconds:8.2f}s"
+                  f"  x{ratio:.2f}{flag}")
+            if flag:
+                regressions.append((result['pipeline'], result['rows'], stage, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark both ETL pipelines on synthetic SalesData files.')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help='Dataset sizes (sales lines)')
+    parser.add_argument('--pipelines', nargs='+', choices=PIPELINES, default=list(PIPELINES))
+    parser.add_argument('--pg-dsn', default=None,
+                        help='SQLAlchemy URL of a scratch Postgres database (schemas are recreated!); '
+                             'default: temporary --backend file')
+    parser.add_argument('--backend', choices=LOCAL_BACKENDS, default='duckdb' if duckdb_available() else 'sqlite',
+                        help='Embedded database without --pg-dsn (default: duckdb if installed)')
+    parser.add_argument('--data-dir', default=os.path.join(HERE, 'data'), help='Where generated CSVs are cached')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--dirty-rate', type=float, default=0.02)
+    parser.add_argument('--parser', default='c', help='Praktikum2 CSV parser')
+    parser.add_argument('--chunksize', type=int, default=None, help='Praktikum2 chunk size (default: whole file)')
+    parser.add_argument('--workers', type=int, default=4, help='Praktikum2 writer threads (not with SQLite)')
+    parser.add_argument('--batch-size', type=int, default=0, help='Praktikum1 batch validation size (0 = per row)')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON result file')
+    parser.add_argument('--baseline', default=None, help='Earlier JSON result file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown per stage vs. baseline')
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to '{args.output}'")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"Compared with '{args.baseline}' (revision {baseline['meta'].get('revision')}):")
+        if compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()